@@ -15,7 +15,7 @@
 # Bootstrap charm-helpers, installing its dependencies if necessary using
 # only standard libraries.
 import functools
-import inspect
+import importlib
 import subprocess
 
 
@@ -58,6 +58,7 @@ def deprecate(warning, date=None, log=None):
 
         @functools.wraps(f)
         def wrapped_f(*args, **kwargs):
+            import inspect
             try:
                 module = inspect.getmodule(f)
                 file = inspect.getsourcefile(f)
@@ -82,3 +83,36 @@ def deprecate(warning, date=None, log=None):
             return f(*args, **kwargs)
         return wrapped_f
     return wrap
+
+
+def lazy_attributes(module_name, attributes):
+    """Return a module level ``__getattr__`` (PEP 562) importing attributes
+    on first access, to keep the import of the module itself cheap.
+
+    usage:
+
+    __getattr__ = lazy_attributes(__name__, {
+        'utils': 'charmhelpers.contrib.openstack.utils',
+        'apt_install': 'charmhelpers.fetch.ubuntu:apt_install',
+    })
+
+    Nothing is cached in the module namespace, so that the attributes can be
+    patched and unpatched like any other.
+
+    :param module_name: name of the module the ``__getattr__`` is for.
+    :param attributes: dict mapping attribute names to the module to import,
+                       optionally followed by ':' and the name of the
+                       attribute to take from it.
+    """
+    def __getattr__(name):
+        try:
+            target = attributes[name]
+        except KeyError:
+            raise AttributeError("module {!r} has no attribute {!r}".format(
+                module_name, name)) from None
+        target_module, _, target_name = target.partition(':')
+        value = importlib.import_module(target_module)
+        if target_name:
+            value = getattr(value, target_name)
+        return value
+    return __getattr__
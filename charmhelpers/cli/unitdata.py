@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+
 from . import cmdline
 from charmhelpers.core import unitdata
 
@@ -34,7 +36,22 @@ def unitdata_cmd(subparser):
     set_cmd.add_argument('value', help='Value to store')
     set_cmd.set_defaults(action='set')
 
-    def _unitdata_cmd(action, key, value):
+    compact_cmd = nested.add_parser(
+        'compact', help='Prune and compress the revision history')
+    compact_cmd.add_argument('--keep', type=int, default=None,
+                             help='Number of revisions to keep per key')
+    compact_cmd.add_argument('--max-age-days', type=float, default=None,
+                             help='Drop revisions older than this many days')
+    compact_cmd.add_argument('--no-delta', dest='delta', action='store_false',
+                             help='Do not delta-encode revisions')
+    compact_cmd.add_argument('--vacuum', action='store_true',
+                             help='VACUUM the database afterwards')
+    compact_cmd.set_defaults(action='compact', key=None, value=None)
+
+    subparser.set_defaults(keep=None, max_age_days=None, delta=True,
+                           vacuum=False)
+
+    def _unitdata_cmd(action, key, value, keep, max_age_days, delta, vacuum):
         if action == 'get':
             return unitdata.kv().get(key)
         elif action == 'getrange':
@@ -43,4 +60,12 @@ def unitdata_cmd(subparser):
             unitdata.kv().set(key, value)
             unitdata.kv().flush()
             return ''
+        elif action == 'compact':
+            max_age = None
+            if max_age_days is not None:
+                max_age = datetime.timedelta(days=max_age_days)
+            removed = unitdata.kv().compact(keep=keep, max_age=max_age,
+                                            delta=delta, vacuum=vacuum)
+            unitdata.kv().flush()
+            return removed
     return _unitdata_cmd
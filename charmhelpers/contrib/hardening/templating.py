@@ -19,6 +19,8 @@ from charmhelpers.core.hookenv import (
     DEBUG,
     WARNING,
 )
+from charmhelpers.core import profiling
+from charmhelpers.core.templating import bytecode_cache
 
 try:
     from jinja2 import FileSystemLoader, Environment
@@ -55,11 +57,13 @@ def render_and_write(template_dir, path, context):
     :param path: the path to write the templated contents to
     :param context: the parameters to pass to the rendering engine
     """
-    env = Environment(loader=FileSystemLoader(template_dir))
+    env = Environment(loader=FileSystemLoader(template_dir),
+                      bytecode_cache=bytecode_cache())
     template_file = os.path.basename(path)
     template = env.get_template(template_file)
     log('Rendering from template: %s' % template.name, level=DEBUG)
-    rendered_content = template.render(context)
+    with profiling.span('template', path):
+        rendered_content = template.render(context)
     if not rendered_content:
         log("Render returned None - skipping '%s'" % path,
             level=WARNING)
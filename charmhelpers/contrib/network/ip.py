@@ -12,16 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
 import glob
 import re
 import subprocess
 import socket
 import ssl
 
-from functools import partial
+from functools import lru_cache, partial
 
 from charmhelpers.fetch import apt_install, apt_update
 from charmhelpers.core.hookenv import (
+    cached,
     config,
     log,
     network_get_primary_address,
@@ -81,7 +83,136 @@ def _get_ipv6_network_from_address(address):
                                         netmask))
 
 
-def get_address_in_network(network, fallback=None, fatal=False):
+class AddressIndex(object):
+    """Index of the addresses configured on the host, built in one pass over
+    netifaces.
+
+    The addresses and networks are kept sorted by their integer value, per IP
+    version, and the networks are hashed per prefix length. When several
+    interfaces match, the one listed first by netifaces wins, as it would
+    when walking netifaces.interfaces().
+
+    The index is not updated when addresses change.  Pass it as the index
+    argument of get_address_in_network, get_iface_for_address,
+    get_netmask_for_address and get_iface_from_addr to answer many lookups
+    from one read of netifaces, see get_address_index.
+    """
+
+    def __init__(self):
+        # version: sorted [(address int, order, entry)]
+        self._addresses = {4: [], 6: []}
+        # version: {prefixlen: {network int: [entry]}}
+        self._networks = {4: {}, 6: {}}
+        # address string: interface
+        self._ifaces = {}
+        self._load()
+
+    def _load(self):
+        order = 0
+        for iface in netifaces.interfaces():
+            try:
+                addresses = netifaces.ifaddresses(iface)
+            except ValueError:
+                # If an instance was deleted between
+                # netifaces.interfaces() run and now, its interfaces are gone
+                continue
+            for inet_type in addresses:
+                for addr in addresses[inet_type]:
+                    if 'addr' not in addr:
+                        continue
+                    raw = re.match("(.+)%.*", addr['addr'])
+                    self._ifaces.setdefault(
+                        raw.group(1) if raw else addr['addr'], iface)
+            for i, addr in enumerate(addresses.get(netifaces.AF_INET, [])):
+                try:
+                    network = netaddr.IPNetwork(
+                        "%s/%s" % (addr['addr'], addr['netmask']))
+                except (KeyError, netaddr.core.AddrFormatError, ValueError):
+                    continue
+                self._add(order, iface, addr, network, primary=(i == 0))
+                order += 1
+            for addr in addresses.get(netifaces.AF_INET6, []):
+                try:
+                    network = _get_ipv6_network_from_address(addr)
+                except (KeyError, netaddr.core.AddrFormatError, ValueError):
+                    continue
+                if network:
+                    self._add(order, iface, addr, network, primary=True)
+                    order += 1
+        for addresses in self._addresses.values():
+            addresses.sort(key=lambda item: item[:2])
+
+    def _add(self, order, iface, addr, network, primary):
+        entry = {
+            'order': order,
+            'iface': iface,
+            'addr': addr,
+            'network': network,
+            # netifaces only returns the first IPv4 address of an interface
+            # to _get_for_address().
+            'primary': primary,
+        }
+        self._addresses[network.version].append(
+            (int(network.ip), order, entry))
+        self._networks[network.version].setdefault(
+            network.prefixlen, {}).setdefault(
+                network.first, []).append(entry)
+
+    def find_network(self, address):
+        """
+        :param address: IPv4 or IPv6 address
+        :returns: dict with the 'iface', netifaces 'addr' dict and 'network'
+                  of the first configured network containing address, or
+                  None.
+        """
+        address = netaddr.IPAddress(address)
+        value = int(address)
+        bits = 32 if address.version == 4 else 128
+        found = None
+        for prefixlen, networks in self._networks[address.version].items():
+            mask = ((1 << bits) - 1) ^ ((1 << (bits - prefixlen)) - 1)
+            for entry in networks.get(value & mask, ()):
+                if not entry['primary']:
+                    continue
+                if found is None or entry['order'] < found['order']:
+                    found = entry
+                break
+        return found
+
+    def find_address(self, network):
+        """
+        :param network: netaddr.IPNetwork
+        :returns: the first configured address, as a netaddr.IPNetwork with
+                  its netmask, whose network is within network, or None.
+        """
+        addresses = self._addresses[network.version]
+        start = bisect.bisect_left(addresses, (network.first,))
+        end = bisect.bisect_right(addresses, (network.last, float('inf')))
+        found = None
+        for _, order, entry in addresses[start:end]:
+            if entry['network'] in network and (
+                    found is None or order < found['order']):
+                found = entry
+        return found['network'] if found else None
+
+    def iface_for_address(self, address):
+        """:returns: interface on which address is configured, or None."""
+        return self._ifaces.get(address)
+
+
+@cached
+def get_address_index():
+    """An AddressIndex of the host, shared by its callers within a hook.
+
+    It reflects the addresses configured when it was first requested: call
+    get_address_index.cache_clear() after changing them.
+
+    :rtype: AddressIndex
+    """
+    return AddressIndex()
+
+
+def get_address_in_network(network, fallback=None, fatal=False, index=None):
     """Get an IPv4 or IPv6 address within the network from the host.
 
     :param network (str): CIDR presentation format. For example,
@@ -89,6 +220,8 @@ def get_address_in_network(network, fallback=None, fatal=False):
     :param fallback (str): If no address is found, return fallback.
     :param fatal (boolean): If no address is found, fallback is not
         set and fatal is True then exit(1).
+    :param index (AddressIndex): Look the addresses up in index instead of
+        reading them from netifaces.
     """
     if network is None:
         if fallback is not None:
@@ -103,6 +236,11 @@ def get_address_in_network(network, fallback=None, fatal=False):
     for network in networks:
         _validate_cidr(network)
         network = netaddr.IPNetwork(network)
+        if index is not None:
+            cidr = index.find_address(network)
+            if cidr is not None:
+                return str(cidr.ip)
+            continue
         for iface in netifaces.interfaces():
             try:
                 addresses = netifaces.ifaddresses(iface)
@@ -156,7 +294,7 @@ def is_address_in_network(network, address):
     :returns boolean: Flag indicating whether address is in network.
     """
     try:
-        network = netaddr.IPNetwork(network)
+        version, first, last = _network_range(network)
     except (netaddr.core.AddrFormatError, ValueError):
         raise ValueError("Network (%s) is not in CIDR presentation format" %
                          network)
@@ -167,13 +305,25 @@ def is_address_in_network(network, address):
         raise ValueError("Address (%s) is not in correct presentation format" %
                          address)
 
-    if address in network:
-        return True
-    else:
-        return False
+    return address.version == version and first <= int(address) <= last
+
 
+def _network_range(network):
+    """:returns: (version, first, last) of the network, as ints."""
+    if isinstance(network, str):
+        return _parsed_network_range(network)
+    # netaddr accepts more than strings, some of it unhashable.
+    network = netaddr.IPNetwork(network)
+    return network.version, network.first, network.last
 
-def _get_for_address(address, key):
+
+@lru_cache(maxsize=256)
+def _parsed_network_range(network):
+    network = netaddr.IPNetwork(network)
+    return network.version, network.first, network.last
+
+
+def _get_for_address(address, key, index=None):
     """Retrieve an attribute of or the physical interface that
     the IP address provided could be bound to.
 
@@ -181,8 +331,20 @@ def _get_for_address(address, key):
         mask or subnet prefix. For example, '192.168.1.1'.
     :param key: 'iface' for the physical interface name or an attribute
         of the configured interface, for example 'netmask'.
+    :param index (AddressIndex): Look the address up in index instead of
+        reading the addresses from netifaces.
     :returns str: Requested attribute or None if address is not bindable.
     """
+    if index is not None:
+        entry = index.find_network(address)
+        if entry is None:
+            return None
+        if key == 'iface':
+            return entry['iface']
+        if key == 'netmask' and entry['network'].version == 6:
+            return str(entry['network'].prefixlen)
+        return entry['addr'][key]
+
     address = netaddr.IPAddress(address)
     for iface in netifaces.interfaces():
         addresses = netifaces.ifaddresses(iface)
@@ -316,23 +478,33 @@ def get_iface_addr(iface='eth0', inet_type='AF_INET', inc_aliases=False,
 get_ipv4_addr = partial(get_iface_addr, inet_type='AF_INET')
 
 
-def get_iface_from_addr(addr):
-    """Work out on which interface the provided address is configured."""
-    for iface in netifaces.interfaces():
-        addresses = netifaces.ifaddresses(iface)
-        for inet_type in addresses:
-            for _addr in addresses[inet_type]:
-                _addr = _addr['addr']
-                # link local
-                ll_key = re.compile("(.+)%.*")
-                raw = re.match(ll_key, _addr)
-                if raw:
-                    _addr = raw.group(1)
-
-                if _addr == addr:
-                    log("Address '%s' is configured on iface '%s'" %
-                        (addr, iface))
-                    return iface
+def get_iface_from_addr(addr, index=None):
+    """Work out on which interface the provided address is configured.
+
+    :param index: Look the address up in this AddressIndex instead of
+                  reading the addresses from netifaces.
+    """
+    if index is not None:
+        iface = index.iface_for_address(addr)
+        if iface is not None:
+            log("Address '%s' is configured on iface '%s'" % (addr, iface))
+            return iface
+    else:
+        for iface in netifaces.interfaces():
+            addresses = netifaces.ifaddresses(iface)
+            for inet_type in addresses:
+                for _addr in addresses[inet_type]:
+                    _addr = _addr['addr']
+                    # link local
+                    ll_key = re.compile("(.+)%.*")
+                    raw = re.match(ll_key, _addr)
+                    if raw:
+                        _addr = raw.group(1)
+
+                    if _addr == addr:
+                        log("Address '%s' is configured on iface '%s'" %
+                            (addr, iface))
+                        return iface
 
     msg = "Unable to infer net iface on which '%s' is configured" % (addr)
     raise Exception(msg)
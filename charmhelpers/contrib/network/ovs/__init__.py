@@ -48,6 +48,106 @@ iface {linuxbridge_port} inet manual
 MAX_KERNEL_INTERFACE_NAME_LEN = 15
 
 
+class OVSTransaction(object):
+    """Collect the changes made by the helpers of this module and commit them
+    with a single ``ovs-vsctl`` invocation, that is one OVSDB transaction::
+
+        with OVSTransaction():
+            for bridge, ports in bridges.items():
+                add_bridge(bridge, brdata=brdata)
+                for port in ports:
+                    add_bridge_port(bridge, port)
+
+    The ``--may-exist``/``--if-exists`` semantics of each helper are kept,
+    but the transaction is atomic: if one command fails, none is applied.
+    The ``ip link`` commands of add_bridge_port() and del_bridge_port() run
+    after the commit.  Queries such as get_bridges() are not part of the
+    transaction and see the state before the commit.
+
+    Nested transactions are merged into the outermost one.  Nothing is
+    committed if the block raises.
+    """
+
+    def __init__(self):
+        self.commands = []
+        self.post_commands = []
+        self._symbols = 0
+
+    def add(self, command):
+        """Add an ``ovs-vsctl`` command to the transaction.
+
+        :param command: arguments of the command, without the leading
+                        'ovs-vsctl'. Several commands may be given separated
+                        by '--'.
+        :type command: List[str]
+        """
+        command = list(command)
+        if command[:1] != ['--']:
+            command.insert(0, '--')
+        self.commands.extend(command)
+
+    def add_post_command(self, cmd):
+        """Run cmd once the transaction is committed."""
+        self.post_commands.append(cmd)
+
+    def symbol(self, name):
+        """:returns: a row symbol, eg. '@i1', unique within the transaction"""
+        self._symbols += 1
+        return '@{}{}'.format(name, self._symbols)
+
+    def commit(self):
+        """Run the collected commands, then the post commands.
+
+        :raises: subprocess.CalledProcessError
+        """
+        commands, self.commands = self.commands, []
+        post_commands, self.post_commands = self.post_commands, []
+        if commands:
+            log('Committing {} ovs-vsctl commands'.format(
+                commands.count('--')), level=DEBUG)
+            subprocess.check_call(['ovs-vsctl'] + commands)
+            ch_ovsdb.invalidate_snapshots()
+        for cmd in post_commands:
+            subprocess.check_call(cmd)
+
+    def __enter__(self):
+        global _transaction
+        if _transaction is not None:
+            self._outer = _transaction
+            return _transaction
+        self._outer = None
+        _transaction = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _transaction
+        if self._outer is not None:
+            return
+        _transaction = None
+        if exc_type is None:
+            self.commit()
+
+
+_transaction = None
+
+
+def _vsctl(cmd):
+    """Run an ``ovs-vsctl`` command, or add it to the open OVSTransaction."""
+    if _transaction is not None:
+        _transaction.add(cmd[1:])
+    else:
+        subprocess.check_call(cmd)
+        ch_ovsdb.invalidate_snapshots()
+
+
+def _after_vsctl(cmd):
+    """Run cmd now, or after the open OVSTransaction is committed."""
+    if _transaction is not None:
+        _transaction.add_post_command(cmd)
+    else:
+        subprocess.check_call(cmd)
+
+
 def get_bridges():
     """Return list of the bridges on the default openvswitch
 
@@ -174,7 +274,7 @@ def add_bridge(name, datapath_type=None, brdata=None, exclusive=False):
             'please use the brdata keyword argument instead.')
         cmd += ['--', 'set', 'bridge', name,
                 'datapath_type={}'.format(datapath_type)]
-    subprocess.check_call(cmd)
+    _vsctl(cmd)
 
 
 def del_bridge(name):
@@ -185,7 +285,7 @@ def del_bridge(name):
     :raises: subprocess.CalledProcessError
     """
     log('Deleting bridge {}'.format(name))
-    subprocess.check_call(["ovs-vsctl", "--", "--if-exists", "del-br", name])
+    _vsctl(["ovs-vsctl", "--", "--if-exists", "del-br", name])
 
 
 def add_bridge_port(name, port, promisc=False, ifdata=None, exclusive=False,
@@ -238,16 +338,16 @@ def add_bridge_port(name, port, promisc=False, ifdata=None, exclusive=False,
                 cmd.extend(setcmd)
 
     log('Adding port {} to bridge {}'.format(port, name))
-    subprocess.check_call(cmd)
+    _vsctl(cmd)
     if linkup:
         # This is mostly a workaround for CI environments, in the real world
         # the bare metal provider would most likely have configured and brought
         # up the link for us.
-        subprocess.check_call(["ip", "link", "set", port, "up"])
+        _after_vsctl(["ip", "link", "set", port, "up"])
     if promisc:
-        subprocess.check_call(["ip", "link", "set", port, "promisc", "on"])
+        _after_vsctl(["ip", "link", "set", port, "promisc", "on"])
     elif promisc is False:
-        subprocess.check_call(["ip", "link", "set", port, "promisc", "off"])
+        _after_vsctl(["ip", "link", "set", port, "promisc", "off"])
 
 
 def del_bridge_port(name, port, linkdown=True):
@@ -262,11 +362,10 @@ def del_bridge_port(name, port, linkdown=True):
     :raises: subprocess.CalledProcessError
     """
     log('Deleting port {} from bridge {}'.format(port, name))
-    subprocess.check_call(["ovs-vsctl", "--", "--if-exists", "del-port",
-                           name, port])
+    _vsctl(["ovs-vsctl", "--", "--if-exists", "del-port", name, port])
     if linkdown:
-        subprocess.check_call(["ip", "link", "set", port, "down"])
-        subprocess.check_call(["ip", "link", "set", port, "promisc", "off"])
+        _after_vsctl(["ip", "link", "set", port, "down"])
+        _after_vsctl(["ip", "link", "set", port, "promisc", "off"])
 
 
 def add_bridge_bond(bridge, port, interfaces, portdata=None, ifdatamap=None,
@@ -319,7 +418,7 @@ def add_bridge_bond(bridge, port, interfaces, portdata=None, ifdatamap=None,
         for ifname, ifdata in ifdatamap.items():
             for setcmd in _dict_to_vsctl_set(ifdata, 'Interface', ifname):
                 cmd.extend(setcmd)
-    subprocess.check_call(cmd)
+    _vsctl(cmd)
 
 
 @deprecate('see lp:1877594', '2021-01', log=log)
@@ -447,8 +546,7 @@ def is_linuxbridge_interface(port):
 def set_manager(manager):
     ''' Set the controller for the local openvswitch '''
     log('Setting manager for local ovs to {}'.format(manager))
-    subprocess.check_call(['ovs-vsctl', 'set-manager',
-                           'ssl:{}'.format(manager)])
+    _vsctl(['ovs-vsctl', 'set-manager', 'ssl:{}'.format(manager)])
 
 
 def set_Open_vSwitch_column_value(column_value):
@@ -462,7 +560,7 @@ def set_Open_vSwitch_column_value(column_value):
     :raises CalledProcessException: possibly ovsdb-server is not running
     """
     log('Setting {} in the Open_vSwitch table'.format(column_value))
-    subprocess.check_call(['ovs-vsctl', 'set', 'Open_vSwitch', '.', column_value])
+    _vsctl(['ovs-vsctl', 'set', 'Open_vSwitch', '.', column_value])
 
 
 CERT_PATH = '/etc/openvswitch/ovsclient-cert.pem'
@@ -540,16 +638,18 @@ def enable_ipfix(bridge, target,
     :param sampling: The rate at which packets should be sampled and
                      sent to each target collector
     '''
+    # row symbols must be unique within a transaction.
+    symbol = _transaction.symbol('i') if _transaction is not None else '@i'
     cmd = [
-        'ovs-vsctl', 'set', 'Bridge', bridge, 'ipfix=@i', '--',
-        '--id=@i', 'create', 'IPFIX',
+        'ovs-vsctl', 'set', 'Bridge', bridge, 'ipfix={}'.format(symbol), '--',
+        '--id={}'.format(symbol), 'create', 'IPFIX',
         'targets="{}"'.format(target),
         'sampling={}'.format(sampling),
         'cache_active_timeout={}'.format(cache_active_timeout),
         'cache_max_flows={}'.format(cache_max_flows),
     ]
     log('Enabling IPfix on {}.'.format(bridge))
-    subprocess.check_call(cmd)
+    _vsctl(cmd)
 
 
 def disable_ipfix(bridge):
@@ -557,7 +657,7 @@ def disable_ipfix(bridge):
     :param bridge: Bridge to modify
     '''
     cmd = ['ovs-vsctl', 'clear', 'Bridge', bridge, 'ipfix']
-    subprocess.check_call(cmd)
+    _vsctl(cmd)
 
 
 def port_to_br(port):
@@ -622,6 +722,35 @@ def bridge_for_port(port_uuid):
             return bridge['name']
 
 
+def _uuid_for_port(ovsdb, port_name):
+    """Get UUID of named port from a snapshot.
+
+    :param ovsdb: Snapshot of the Open vSwitch database
+    :type ovsdb: ch_ovsdb.SimpleOVSDB.Snapshot
+    :param port_name: Name of port.
+    :type port_name: str
+    :rtype: Optional[uuid.UUID]
+    """
+    port = ovsdb.port.by_name(port_name)
+    if port:
+        return port['_uuid']
+
+
+def _bridge_for_port(ovsdb, port_uuid):
+    """Find which bridge a port is on from a snapshot.
+
+    :param ovsdb: Snapshot of the Open vSwitch database
+    :type ovsdb: ch_ovsdb.SimpleOVSDB.Snapshot
+    :param port_uuid: UUID of port.
+    :type port_uuid: uuid.UUID
+    :rtype: Optional[str]
+    """
+    # The index of the snapshot takes care of single member sets not being
+    # lists. ref: juju/charm-helpers#510
+    for bridge in ovsdb.bridge.lookup('ports', port_uuid):
+        return bridge['name']
+
+
 PatchPort = collections.namedtuple('PatchPort', ('bridge', 'port'))
 Patch = collections.namedtuple('Patch', ('this_end', 'other_end'))
 
@@ -638,15 +767,16 @@ def patch_ports_on_bridge(bridge):
     # On any given vSwitch there will be a small number of patch ports, so we
     # start by iterating over ports with type `patch` then look up which bridge
     # they belong to and act on any ports that match the criteria.
-    for interface in ch_ovsdb.SimpleOVSDB(
-            'ovs-vsctl').interface.find('type=patch'):
-        for port in ch_ovsdb.SimpleOVSDB(
-                'ovs-vsctl').port.find('name={}'.format(interface['name'])):
-            if bridge_for_port(port['_uuid']) == bridge:
+    #
+    # The tables are read once, into a snapshot local to this call.
+    ovsdb = ch_ovsdb.SimpleOVSDB('ovs-vsctl').snapshot()
+    for interface in ovsdb.interface.lookup('type', 'patch'):
+        for port in ovsdb.port.lookup('name', interface['name']):
+            if _bridge_for_port(ovsdb, port['_uuid']) == bridge:
                 this_end = PatchPort(bridge, port['name'])
-                other_end = PatchPort(bridge_for_port(
-                    uuid_for_port(
-                        interface['options']['peer'])),
+                other_end = PatchPort(_bridge_for_port(
+                    ovsdb, _uuid_for_port(
+                        ovsdb, interface['options']['peer'])),
                     interface['options']['peer'])
                 yield Patch(this_end, other_end)
             # We expect one result and it is ok if it turns out to be a port
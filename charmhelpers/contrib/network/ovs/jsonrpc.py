@@ -0,0 +1,434 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Minimal client for the OVSDB management protocol, RFC 7047.
+
+It talks JSON-RPC to ``ovsdb-server`` over a persistent connection, so that
+many queries can be made without running ``ovs-vsctl`` or ``ovn-sbctl`` for
+each of them.  It is meant to be used as a backend of ``SimpleOVSDB``::
+
+    client = OVSDBClient('unix:/var/run/ovn/ovnsb_db.sock')
+    sbdb = SimpleOVSDB('ovn-sbctl', client=client)
+    for chs in sbdb.chassis:
+        print(chs)
+
+Rows are exchanged in the RFC 7047 section 5.1 notation, the same as the
+JSON output of the command line tools.
+"""
+import codecs
+import collections
+import contextlib
+import json
+import re
+import select
+import socket
+
+# Default endpoints of the databases managed by the command line tools.
+ENDPOINTS = {
+    'Open_vSwitch': 'unix:/var/run/openvswitch/db.sock',
+    'OVN_Northbound': 'unix:/var/run/ovn/ovnnb_db.sock',
+    'OVN_Southbound': 'unix:/var/run/ovn/ovnsb_db.sock',
+}
+
+
+# Tokens changing the nesting of a JSON text: brackets, whole strings and
+# the start of a string not terminated yet.
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]|"', re.S)
+# Rest of a string, up to its closing quote.
+_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+
+
+class OVSDBError(Exception):
+    """Error returned by the OVSDB server."""
+
+
+class _Framer(object):
+    """Split the stream sent by the server into JSON messages.
+
+    Like the framing of ovs' own jsonrpc stream, this tracks the nesting
+    depth and string state of the data received so far, so each character
+    is looked at once and a message is only decoded when complete.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._partial = []
+        self._depth = 0
+        self._in_string = False
+        # Characters to skip at the start of the next chunk, after an
+        # escape at the end of the previous one.
+        self._skip = 0
+
+    def feed(self, data):
+        """Add received data.
+
+        :param data: Bytes read from the connection
+        :type data: bytes
+        :returns: Messages completed by data
+        :rtype: List[Dict[str, any]]
+        """
+        text = self._decoder.decode(data)
+        messages = []
+        start = 0
+        pos = self._skip
+        while pos < len(text):
+            if self._in_string:
+                end = _STRING_REST.match(text, pos).end()
+                if end == len(text):
+                    pos = end
+                    break
+                if text[end] == '\\':
+                    # The escaped character is in the next chunk.
+                    pos = end + 2
+                    break
+                self._in_string = False
+                pos = end + 1
+            for match in _TOKEN.finditer(text, pos):
+                token = match.group()
+                if token == '"':
+                    self._in_string = True
+                    pos = match.end()
+                    break
+                if token in '{[':
+                    self._depth += 1
+                elif token in '}]':
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._partial.append(text[start:match.end()])
+                        messages.append(json.loads(''.join(self._partial)))
+                        self._partial = []
+                        start = match.end()
+            else:
+                pos = len(text)
+        self._skip = max(pos - len(text), 0)
+        if self._depth or self._in_string:
+            self._partial.append(text[start:])
+        return messages
+
+
+def _atoms(value):
+    """Members of an OVSDB set or map value, in a comparable form.
+
+    :param value: Value in RFC 7047 5.1 notation
+    :type value: any
+    :rtype: List[str]
+    """
+    if isinstance(value, list) and value and value[0] in ('set', 'map'):
+        members = value[1]
+    else:
+        members = [value]
+    return sorted(json.dumps(member, sort_keys=True) for member in members)
+
+
+def _matches(row, where):
+    """Evaluate a where clause made of '==' conditions against a row.
+
+    :returns: True or False, or None if the clause can not be evaluated
+              locally.
+    :rtype: Optional[bool]
+    """
+    for column, function, value in where:
+        if function != '==' or column not in row:
+            return None
+        if _atoms(row[column]) != _atoms(value):
+            return False
+    return True
+
+
+class OVSDBClient(object):
+    """JSON-RPC connection to an OVSDB server.
+
+    The connection is made on first use and kept until ``close``.  Tables
+    can be monitored, after which selects on them are answered from a local
+    copy kept up to date by the server's ``update`` notifications.
+    """
+
+    def __init__(self, endpoint, timeout=30):
+        """OVSDBClient constructor.
+
+        :param endpoint: Where the server listens, 'unix:<path>' or
+                         'tcp:<host>:<port>'
+        :type endpoint: str
+        :param timeout: Seconds to wait for the server
+        :type timeout: float
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._sock = None
+        self._framer = None
+        self._messages = collections.deque()
+        self._next_id = 0
+        self._schemas = {}
+        self._monitors = {}
+        self._batch = None
+
+    def connect(self):
+        """Connect to the server, if not already connected.
+
+        :raises: ValueError, socket.error
+        """
+        if self._sock is not None:
+            return
+        kind, _, address = self.endpoint.partition(':')
+        if kind == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        elif kind == 'tcp':
+            host, _, port = address.rpartition(':')
+            address = (host.strip('[]'), int(port))
+            sock = socket.socket(
+                socket.AF_INET6 if ':' in host else socket.AF_INET,
+                socket.SOCK_STREAM)
+        else:
+            raise ValueError(
+                'unsupported OVSDB endpoint "{}"'.format(self.endpoint))
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(address)
+        except socket.error:
+            sock.close()
+            raise
+        self._sock = sock
+        self._framer = _Framer()
+        self._messages.clear()
+
+    def close(self):
+        """Close the connection, monitored tables are forgotten."""
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._monitors.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, message):
+        self._sock.sendall(json.dumps(message).encode('utf-8'))
+
+    def _receive(self, block=True):
+        """Read a message from the server.
+
+        :param block: Whether to wait for a message
+        :type block: bool
+        :returns: Message, or None if block is False and none is pending
+        :rtype: Optional[Dict[str, any]]
+        :raises: OVSDBError if the connection was closed
+        """
+        while not self._messages:
+            if not block and not select.select([self._sock], [], [], 0)[0]:
+                return None
+            data = self._sock.recv(65536)
+            if not data:
+                self.close()
+                raise OVSDBError('connection closed by the OVSDB server')
+            self._messages.extend(self._framer.feed(data))
+        return self._messages.popleft()
+
+    def _handle(self, message):
+        """Handle a request or notification sent by the server."""
+        method = message.get('method')
+        if method == 'echo':
+            self._send({'id': message['id'], 'result': message['params'],
+                        'error': None})
+        elif method == 'update':
+            monitor_id, updates = message['params'][:2]
+            self._update(monitor_id, updates)
+
+    def call(self, method, *params):
+        """Call a JSON-RPC method and wait for its result.
+
+        :param method: Name of the method, eg. 'transact'
+        :type method: str
+        :param params: Parameters of the method
+        :returns: Result of the call
+        :raises: OVSDBError
+        """
+        self.connect()
+        self._next_id += 1
+        request_id = self._next_id
+        self._send({'method': method, 'params': list(params),
+                    'id': request_id})
+        while True:
+            message = self._receive()
+            if message.get('method') is not None:
+                self._handle(message)
+            elif message.get('id') == request_id:
+                if message.get('error') is not None:
+                    raise OVSDBError(message['error'])
+                return message['result']
+
+    def poll(self):
+        """Process the notifications received so far, without waiting."""
+        while self._sock is not None:
+            message = self._receive(block=False)
+            if message is None:
+                return
+            if message.get('method') is not None:
+                self._handle(message)
+
+    def list_dbs(self):
+        """:returns: Names of the databases of the server.
+        :rtype: List[str]
+        """
+        return self.call('list_dbs')
+
+    def get_schema(self, db):
+        """Get the schema of a database, cached for the connection.
+
+        :param db: Name of the database, eg. 'OVN_Southbound'
+        :type db: str
+        :rtype: Dict[str, any]
+        """
+        if db not in self._schemas:
+            self._schemas[db] = self.call('get_schema', db)
+        return self._schemas[db]
+
+    def table_name(self, db, table):
+        """Get the name of a table as in the schema, eg. 'Port_Binding' for
+        'port_binding'.
+
+        :raises: KeyError
+        """
+        tables = self.get_schema(db)['tables']
+        if table in tables:
+            return table
+        for name in tables:
+            if name.lower() == table.lower():
+                return name
+        raise KeyError(table)
+
+    def transact(self, db, *operations):
+        """Run operations in one transaction.
+
+        Within ``transaction`` the operations are queued instead, and None is
+        returned.
+
+        :param db: Name of the database
+        :type db: str
+        :param operations: RFC 7047 5.2 operations
+        :type operations: Dict[str, any]
+        :returns: Result of each operation
+        :rtype: Optional[List[Dict[str, any]]]
+        :raises: OVSDBError if any operation failed, then none is applied.
+        """
+        if self._batch is not None and self._batch[0] == db:
+            self._batch[1].extend(operations)
+            return None
+        results = self.call('transact', db, *operations)
+        for result in results:
+            if result and 'error' in result:
+                raise OVSDBError(result)
+        return results
+
+    @contextlib.contextmanager
+    def transaction(self, db):
+        """Batch the operations on db made in the block in one transaction.
+
+        Nothing is sent if the block raises.  Nested transactions on the
+        same database are merged into the outermost one.
+
+        :param db: Name of the database
+        :type db: str
+        :raises: OVSDBError
+        """
+        if self._batch is not None:
+            if self._batch[0] != db:
+                raise ValueError('a transaction on {} is already open'
+                                 .format(self._batch[0]))
+            yield
+            return
+        self._batch = (db, [])
+        try:
+            yield
+        except Exception:
+            self._batch = None
+            raise
+        _, operations = self._batch
+        self._batch = None
+        if operations:
+            self.transact(db, *operations)
+
+    def select(self, db, table, where=None):
+        """Select rows, from the local copy if the table is monitored.
+
+        :param db: Name of the database
+        :type db: str
+        :param table: Name of the table, as in the schema
+        :type table: str
+        :param where: RFC 7047 5.1 conditions
+        :type where: Optional[List[List[any]]]
+        :returns: Rows, including their '_uuid' column
+        :rtype: List[Dict[str, any]]
+        """
+        where = where or []
+        rows = self._monitors.get(db, {}).get(table)
+        if rows is not None:
+            self.poll()
+            selected = []
+            for row in rows.values():
+                matches = _matches(row, where)
+                if matches is None:
+                    break
+                if matches:
+                    selected.append(row)
+            else:
+                return selected
+        result = self.call('transact', db, {
+            'op': 'select', 'table': table, 'where': where})
+        if 'error' in result[0]:
+            raise OVSDBError(result[0])
+        rows = result[0]['rows']
+        for row in rows:
+            row.pop('_version', None)
+        return rows
+
+    def monitor(self, db, tables):
+        """Keep a local copy of tables, see ``select``.
+
+        :param db: Name of the database
+        :type db: str
+        :param tables: Names of the tables, as in the schema
+        :type tables: Iterable[str]
+        """
+        tables = [table for table in tables
+                  if table not in self._monitors.get(db, {})]
+        if not tables:
+            return
+        monitor_id = [db, tables]
+        updates = self.call('monitor', db, monitor_id,
+                            {table: {} for table in tables})
+        monitored = self._monitors.setdefault(db, {})
+        for table in tables:
+            monitored[table] = {}
+        self._update(monitor_id, updates)
+
+    def _update(self, monitor_id, updates):
+        """Apply RFC 7047 4.1.6 table updates to the local copy."""
+        db = monitor_id[0] if isinstance(monitor_id, list) else None
+        monitored = self._monitors.get(db)
+        if monitored is None:
+            return
+        for table, rows in updates.items():
+            copy = monitored.get(table)
+            if copy is None:
+                continue
+            for row_uuid, change in rows.items():
+                if change.get('new') is None:
+                    copy.pop(row_uuid, None)
+                else:
+                    row = dict(change['new'])
+                    row['_uuid'] = ['uuid', row_uuid]
+                    copy[row_uuid] = row
@@ -11,9 +11,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import collections
 import os
 import subprocess
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from . import utils
 
@@ -21,6 +24,9 @@ from . import utils
 OVN_RUNDIR = '/var/run/ovn'
 OVN_SYSCONFDIR = '/etc/ovn'
 
+# Seconds for which collect_status() results are reused.
+STATUS_TTL = 10
+
 
 def ovn_appctl(target, args, rundir=None, use_ovs_appctl=False):
     """Run ovn/ovs-appctl for target with args and return output.
@@ -177,12 +183,24 @@ def cluster_status(target, schema=None, use_ovs_appctl=False, rundir=None):
     if schema and schema not in schema_map.keys():
         raise RuntimeError('Unknown schema provided: "{}"'.format(schema))
 
+    return _parse_cluster_status(
+        ovn_appctl(target,
+                   ('cluster/status', schema or schema_map[target]),
+                   rundir=rundir,
+                   use_ovs_appctl=use_ovs_appctl))
+
+
+def _parse_cluster_status(output):
+    """Parse the output of ``cluster/status``.
+
+    :param output: Output of ``ovn-appctl cluster/status``
+    :type output: str
+    :rtype: OVNClusterStatus
+    :raises: KeyError
+    """
     status = {}
     k = ''
-    for line in ovn_appctl(target,
-                           ('cluster/status', schema or schema_map[target]),
-                           rundir=rundir,
-                           use_ovs_appctl=use_ovs_appctl).splitlines():
+    for line in output.splitlines():
         if k and line.startswith(' '):
             # there is no key which means this is a instance of a multi-line/
             # multi-value item, populate the List which is already stored under
@@ -244,3 +262,54 @@ def is_northd_active():
     except subprocess.CalledProcessError:
         pass
     return False
+
+
+OVNStatus = collections.namedtuple('OVNStatus', ('nb', 'sb', 'northd_active'))
+
+_status_cache = {}
+
+
+def collect_status(use_ovs_appctl=False, rundir=None, northd=True,
+                   ttl=STATUS_TTL):
+    """Retrieve the status of the OVN databases and of ``ovn-northd``.
+
+    The ``ovn-appctl`` calls are made concurrently, and the result is reused
+    by the calls made within ``ttl`` seconds, so that checks made several
+    times in a hook only query the daemons once.  The cluster status objects
+    are shared between the callers and must not be modified.
+
+    :param use_ovs_appctl: The ``ovn-appctl`` command appeared in OVN 20.03,
+                           set this to True to use ``ovs-appctl`` instead.
+    :type use_ovs_appctl: bool
+    :param rundir: Override path to sockets
+    :type rundir: Optional[str]
+    :param northd: Whether to query ``ovn-northd``, ``northd_active`` is
+                   None otherwise.
+    :type northd: bool
+    :param ttl: Seconds for which a result is reused, 0 to not reuse any.
+    :type ttl: float
+    :returns: Cluster status of the Northbound and Southbound databases, and
+              whether the local ``ovn-northd`` is active.
+    :rtype: OVNStatus[OVNClusterStatus, OVNClusterStatus, Optional[bool]]
+    :raises: subprocess.CalledProcessError, KeyError
+    """
+    key = (use_ovs_appctl, rundir, northd)
+    now = time.monotonic()
+    cached = _status_cache.get(key)
+    if ttl and cached and now - cached[0] < ttl:
+        return cached[1]
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        nb = executor.submit(cluster_status, 'ovnnb_db', rundir=rundir,
+                             use_ovs_appctl=use_ovs_appctl)
+        sb = executor.submit(cluster_status, 'ovnsb_db', rundir=rundir,
+                             use_ovs_appctl=use_ovs_appctl)
+        active = executor.submit(is_northd_active) if northd else None
+        status = OVNStatus(nb.result(), sb.result(),
+                           active.result() if active else None)
+    _status_cache[key] = (now, status)
+    return status
+
+
+def invalidate_status():
+    """Make the next collect_status() call query the daemons again."""
+    _status_cache.clear()
@@ -37,6 +37,23 @@ class SimpleOVSDB(object):
         if br['name'] == 'br-test':
             ovsdb.bridge.set(br['uuid'], 'external_ids:charm', 'managed')
 
+    Each iteration or lookup on a table runs the tool again.  When many
+    lookups are made, use a snapshot, which reads each table once and
+    indexes it:
+
+    ports = snapshot('ovs-vsctl').port
+    port = ports.by_name('eth0')
+
+    Instead of the tools, the OVSDB server can be queried directly, over a
+    persistent connection, by passing a ``jsonrpc.OVSDBClient``:
+
+    sbdb = SimpleOVSDB('ovn-sbctl', client=OVSDBClient(
+        'unix:/var/run/ovn/ovnsb_db.sock'))
+    sbdb.monitor('chassis')
+    with sbdb.transaction():
+        for chs in sbdb.chassis:
+            sbdb.chassis.set(chs['_uuid'], 'external_ids:charm', 'managed')
+
     WARNING: If a list type field only have one item `ovs-vsctl` will present
     it as a single item. Since we do not know the schema we have no way of
     knowing what fields should be de-serialized as lists so the caller has
@@ -126,7 +143,14 @@ class SimpleOVSDB(object):
         ),
     }
 
-    def __init__(self, tool, args=None):
+    # Database managed by each tool.
+    _tool_db_map = {
+        'ovs-vsctl': 'Open_vSwitch',
+        'ovn-nbctl': 'OVN_Northbound',
+        'ovn-sbctl': 'OVN_Southbound',
+    }
+
+    def __init__(self, tool, args=None, client=None):
         """SimpleOVSDB constructor.
 
         :param tool: Which tool with database commands to operate on.
@@ -134,19 +158,189 @@ class SimpleOVSDB(object):
         :type tool: str
         :param args: Extra arguments to pass to the tool
         :type args: Optional[List[str]]
+        :param client: Connection to the database server to use instead of
+                       the tool
+        :type client: Optional[jsonrpc.OVSDBClient]
         """
         if tool not in self._tool_table_map:
             raise RuntimeError(
                 'tool must be one of "{}"'.format(self._tool_table_map.keys()))
         self._tool = tool
         self._args = args
+        self._client = client
 
     def __getattr__(self, table):
+        if table.startswith('_'):
+            raise AttributeError(table)
         if table not in self._tool_table_map[self._tool]:
             raise AttributeError(
                 'table "{}" not known for use with "{}"'
                 .format(table, self._tool))
-        return self.Table(self._tool, table, args=self._args)
+        return self.Table(self._tool, table, args=self._args,
+                          client=self._client)
+
+    def _get_client(self):
+        if self._client is None:
+            raise RuntimeError('only supported with an OVSDB client')
+        return self._client
+
+    def transaction(self):
+        """Make the changes in the block in a single transaction.
+
+        Requires an OVSDB client.
+
+        :raises: RuntimeError, jsonrpc.OVSDBError
+        """
+        return self._get_client().transaction(self._tool_db_map[self._tool])
+
+    def monitor(self, *tables):
+        """Have the server send the changes to tables, which are then read
+        locally.  Requires an OVSDB client.
+
+        :param tables: Names of the tables, eg. 'chassis'
+        :type tables: str
+        :raises: RuntimeError, jsonrpc.OVSDBError
+        """
+        client = self._get_client()
+        db = self._tool_db_map[self._tool]
+        client.monitor(db, [client.table_name(db, table) for table in tables])
+
+    def snapshot(self):
+        """Get a read only, indexed, view of the database.
+
+        Consider the ``snapshot`` function, which shares the snapshots
+        between callers.
+
+        :rtype: SimpleOVSDB.Snapshot
+        """
+        return self.Snapshot(self._tool, args=self._args,
+                             client=self._client)
+
+    class Snapshot(object):
+        """Read only view of the tables of a database.
+
+        Each table is read in full, with a single command, on first access
+        and the data kept for the lifetime of the snapshot.
+        """
+
+        def __init__(self, tool, args=None, client=None):
+            """Snapshot constructor.
+
+            :param tool: Which tool with database commands to operate on.
+            :type tool: str
+            :param args: Extra arguments to pass to the tool
+            :type args: Optional[List[str]]
+            :param client: Connection to the database server to use instead
+                           of the tool
+            :type client: Optional[jsonrpc.OVSDBClient]
+            """
+            self._tool = tool
+            self._args = args
+            self._client = client
+            self._tables = {}
+
+        def __getattr__(self, table):
+            if table.startswith('_'):
+                raise AttributeError(table)
+            if table not in self._tables:
+                if table not in SimpleOVSDB._tool_table_map[self._tool]:
+                    raise AttributeError(
+                        'table "{}" not known for use with "{}"'
+                        .format(table, self._tool))
+                self._tables[table] = SimpleOVSDB.TableSnapshot(
+                    SimpleOVSDB.Table(self._tool, table, args=self._args,
+                                      client=self._client))
+            return self._tables[table]
+
+        def refresh(self):
+            """Forget the tables read, they are read again on next access."""
+            self._tables.clear()
+
+    class TableSnapshot(object):
+        """Rows of a table, with indexes built on demand for lookups."""
+
+        def __init__(self, rows):
+            """TableSnapshot constructor.
+
+            :param rows: Deserialized rows of the table
+            :type rows: Iterable[Dict[str, any]]
+            """
+            self._rows = list(rows)
+            self._indexes = {}
+
+        def __iter__(self):
+            return iter(self._rows)
+
+        def __len__(self):
+            return len(self._rows)
+
+        def __getitem__(self, key):
+            """Get row by UUID.
+
+            :param key: UUID of the row
+            :type key: Union[uuid.UUID, str]
+            :raises: KeyError
+            """
+            if not isinstance(key, uuid.UUID):
+                key = uuid.UUID(key)
+            for row in self.lookup('_uuid', key):
+                return row
+            raise KeyError(key)
+
+        def _index(self, column):
+            index = self._indexes.get(column)
+            if index is None:
+                index = self._indexes[column] = {}
+                for row in self._rows:
+                    value = row.get(column)
+                    # sets with a single member are not presented as lists
+                    # by the tools, and maps are indexed by their items.
+                    if isinstance(value, dict):
+                        keys = value.items()
+                    elif isinstance(value, list):
+                        keys = value
+                    else:
+                        keys = (value,)
+                    for key in keys:
+                        try:
+                            index.setdefault(key, []).append(row)
+                        except TypeError:
+                            # unhashable, eg. a map of uuid references
+                            continue
+            return index
+
+        def lookup(self, column, value):
+            """Find rows by column value.
+
+            The first lookup on a column indexes it, later ones are O(1).
+
+            :param column: Name of column
+            :type column: str
+            :param value: Value to match.  For a set column the rows
+                          containing value are returned, for a map column
+                          value is a (key, value) tuple.
+            :type value: any
+            :returns: Matching rows, in table order
+            :rtype: List[Dict[str, any]]
+            """
+            return list(self._index(column).get(value, ()))
+
+        def by_name(self, name):
+            """Get row by name.
+
+            :param name: Value of the ``name`` column
+            :type name: str
+            :rtype: Optional[Dict[str, any]]
+            """
+            for row in self.lookup('name', name):
+                return row
+
+        def find_by_external_id(self, key, value):
+            """Find rows with ``external_ids:key=value``.
+
+            :rtype: List[Dict[str, any]]
+            """
+            return self.lookup('external_ids', (key, value))
 
     class Table(object):
         """Methods to interact with contents of OVSDB tables.
@@ -154,19 +348,28 @@ class SimpleOVSDB(object):
         NOTE: At the time of this writing ``find`` is the only command
         line argument to OVSDB manipulating tools that actually supports
         JSON output.
+
+        With an OVSDB client, conditions and values are limited to a
+        single ``column[:key]=value``, with value an atom rather than a set
+        or map.
         """
 
-        def __init__(self, tool, table, args=None):
+        def __init__(self, tool, table, args=None, client=None):
             """SimpleOVSDBTable constructor.
 
             :param table: Which table to operate on
             :type table: str
             :param args: Extra arguments to pass to the tool
             :type args: Optional[List[str]]
+            :param client: Connection to the database server to use instead
+                           of the tool
+            :type client: Optional[jsonrpc.OVSDBClient]
             """
             self._tool = tool
             self._table = table
             self._args = args
+            self._client = client
+            self._db = SimpleOVSDB._tool_db_map[tool]
 
         def _deserialize_ovsdb(self, data):
             """Deserialize OVSDB RFC7047 section 5.1 data.
@@ -224,13 +427,91 @@ class SimpleOVSDB(object):
             output = utils._run(*cmd)
             data = json.loads(output)
             for row in data['data']:
-                values = []
-                for col in row:
-                    if isinstance(col, list) and len(col) > 1:
-                        values.append(self._deserialize_ovsdb(col))
-                    else:
-                        values.append(col)
-                yield dict(zip(data['headings'], values))
+                yield dict(zip(data['headings'],
+                               map(self._deserialize_value, row)))
+
+        def _deserialize_value(self, col):
+            if isinstance(col, list) and len(col) > 1:
+                return self._deserialize_ovsdb(col)
+            return col
+
+        def _client_select(self, where):
+            """Select rows with the OVSDB client.
+
+            :rtype: Generator[Dict[str,any], None, None]
+            """
+            rows = self._client.select(
+                self._db, self._client.table_name(self._db, self._table),
+                where=where)
+            for row in rows:
+                yield {column: self._deserialize_value(value)
+                       for column, value in row.items()}
+
+        def _client_transact(self, operation):
+            operation['table'] = self._client.table_name(self._db,
+                                                         self._table)
+            self._client.transact(self._db, operation)
+            invalidate_snapshots()
+
+        def _column_type(self, column, part='key'):
+            """Get the atomic type of a column from the schema.
+
+            :param part: 'key' for the type of the values of a set, or keys
+                         of a map, 'value' for the values of a map.
+            :type part: str
+            :rtype: str
+            """
+            if column == '_uuid':
+                return 'uuid'
+            table = self._client.table_name(self._db, self._table)
+            column_type = (self._client.get_schema(self._db)
+                           ['tables'][table]['columns'][column]['type'])
+            if isinstance(column_type, dict):
+                column_type = column_type[part]
+            if isinstance(column_type, dict):
+                column_type = column_type['type']
+            return column_type
+
+        def _is_map(self, column):
+            table = self._client.table_name(self._db, self._table)
+            column_type = (self._client.get_schema(self._db)
+                           ['tables'][table]['columns'][column]['type'])
+            return isinstance(column_type, dict) and 'value' in column_type
+
+        def _atom(self, column, value, part='key'):
+            """Convert a value as given to the tool to RFC 7047 notation."""
+            column_type = self._column_type(column, part)
+            if column_type == 'integer':
+                return int(value)
+            if column_type == 'real':
+                return float(value)
+            if column_type == 'boolean':
+                return value is True or value == 'true'
+            if column_type == 'uuid':
+                return ['uuid', str(value)]
+            value = str(value)
+            if len(value) > 1 and value[0] == value[-1] == '"':
+                value = json.loads(value)
+            return value
+
+        def _where(self, condition):
+            """Convert a ``column[:key]=value`` condition to a where clause.
+
+            :rtype: List[List[any]]
+            """
+            column, _, value = condition.partition('=')
+            column, _, key = column.partition(':')
+            if key:
+                return [[column, 'includes',
+                         ['map', [[key, self._atom(column, value, 'value')]]]]]
+            return [[column, '==', self._atom(column, value)]]
+
+        def _record_where(self, record):
+            """Where clause selecting a record by UUID or name."""
+            try:
+                return [['_uuid', '==', ['uuid', str(uuid.UUID(str(record)))]]]
+            except ValueError:
+                return [['name', '==', record]]
 
         def _get_command(self):
             """Get base command.
@@ -251,6 +532,9 @@ class SimpleOVSDB(object):
             :returns: Dictionary with data
             :rtype: Generator[Dict[str, any], None, None]
             """
+            if self._client is not None:
+                return self._client_select(
+                    self._where(condition) if condition else None)
             cmd = self._get_command()
             cmd.extend(['find', self._table])
             if condition:
@@ -265,6 +549,10 @@ class SimpleOVSDB(object):
             :returns: Dictionary with data
             :rtype: Dict[str, any]
             """
+            if self._client is not None:
+                for row in self._client_select(self._record_where(record)):
+                    return row
+                raise KeyError(record)
             cmd = self._get_command()
             cmd.extend(['list', self._table, str(record)])
             return next(self._cmd_deserialize_data_generator(cmd))
@@ -276,14 +564,77 @@ class SimpleOVSDB(object):
             return self._list_tbl_record(key)
 
         def clear(self, rec, col):
+            if self._client is not None:
+                return self._client_transact({
+                    'op': 'update',
+                    'where': self._record_where(rec),
+                    'row': {col: ['map' if self._is_map(col) else 'set', []]},
+                })
             utils._run(self._tool, 'clear', self._table, rec, col)
+            invalidate_snapshots()
 
         def find(self, condition):
             return self._find_tbl(condition=condition)
 
         def remove(self, rec, col, value):
+            if self._client is not None:
+                # for a map, value is the key to remove.
+                return self._client_transact({
+                    'op': 'mutate',
+                    'where': self._record_where(rec),
+                    'mutations': [
+                        [col, 'delete', ['set', [self._atom(col, value)]]]],
+                })
             utils._run(self._tool, 'remove', self._table, rec, col, value)
+            invalidate_snapshots()
 
         def set(self, rec, col, value):
+            if self._client is not None:
+                column, _, key = col.partition(':')
+                if not key:
+                    return self._client_transact({
+                        'op': 'update',
+                        'where': self._record_where(rec),
+                        'row': {col: self._atom(col, value)},
+                    })
+                return self._client_transact({
+                    'op': 'mutate',
+                    'where': self._record_where(rec),
+                    'mutations': [
+                        [column, 'delete', ['set', [key]]],
+                        [column, 'insert', ['map', [
+                            [key, self._atom(column, value, 'value')]]]],
+                    ],
+                })
             utils._run(self._tool, 'set', self._table, rec,
                        '{}={}'.format(col, value))
+            invalidate_snapshots()
+
+
+_snapshots = {}
+
+
+def snapshot(tool, args=None):
+    """Get a snapshot of the database managed by tool, shared by callers.
+
+    The snapshots are only dropped when a change is made through this module
+    or the ``charmhelpers.contrib.network.ovs`` helpers, or by calling
+    ``invalidate_snapshots``; changes made by other processes are not seen
+    until then.  Nothing in charmhelpers uses them implicitly, callers opt in
+    where many lookups are made against data they know to be stable.
+
+    :param tool: Which tool with database commands to operate on.
+    :type tool: str
+    :param args: Extra arguments to pass to the tool
+    :type args: Optional[List[str]]
+    :rtype: SimpleOVSDB.Snapshot
+    """
+    key = (tool, tuple(args or ()))
+    if key not in _snapshots:
+        _snapshots[key] = SimpleOVSDB(tool, args=args).snapshot()
+    return _snapshots[key]
+
+
+def invalidate_snapshots():
+    """Drop the snapshots returned by ``snapshot``."""
+    _snapshots.clear()
@@ -11,3 +11,31 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+
+# Submodules are imported when first accessed as attributes of the package,
+# not when the package is.
+from charmhelpers import lazy_attributes
+
+_SUBMODULES = (
+    'alternatives',
+    'audits',
+    'cert_utils',
+    'context',
+    'deferred_events',
+    'exceptions',
+    'files',
+    'ha',
+    'ip',
+    'keystone',
+    'neutron',
+    'policy_rcd',
+    'policyd',
+    'ssh_migrations',
+    'templates',
+    'templating',
+    'utils',
+    'vaultlocker',
+)
+
+__getattr__ = lazy_attributes(
+    __name__, {name: '{}.{}'.format(__name__, name) for name in _SUBMODULES})
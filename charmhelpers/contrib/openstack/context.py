@@ -25,10 +25,6 @@ import socket
 import time
 
 from base64 import b64decode
-try:
-    from distutils.version import LooseVersion
-except ImportError:
-    from looseversion import LooseVersion
 from subprocess import (
     check_call,
     check_output,
@@ -162,6 +158,12 @@ class OSContextGenerator(object):
     related = False
     complete = False
     missing_data = []
+    # Unset only by contexts known to depend on nothing but Juju queries made
+    # through hookenv (config, relation and leadership data); anything
+    # reading local state (files, processes, NICs, ...) stays volatile, so
+    # OSConfigRenderer dependency tracking always re-evaluates it and renders
+    # every config file using it; local state is never recorded or replayed.
+    volatile = True
 
     def __call__(self):
         raise NotImplementedError
@@ -206,6 +208,8 @@ class OSContextGenerator(object):
 
 
 class KeystoneAuditMiddleware(OSContextGenerator):
+    volatile = False
+
     def __init__(self, service: str) -> None:
         self.service_name = service
 
@@ -367,6 +371,7 @@ def db_ssl(rdata, ctxt, ssl_dir):
 
 class OsloDBContext(OSContextGenerator):
     """Context for configuring Oslo database connection pooling options."""
+    volatile = False
 
     def __call__(self):
         ctxt = {}
@@ -752,6 +757,8 @@ class AMQPContext(OSContextGenerator):
     def __init__(self, ssl_dir=None, rel_name='amqp', relation_prefix=None,
                  relation_id=None):
         self.ssl_dir = ssl_dir
+        # the CA certificate is written to ssl_dir
+        self.volatile = bool(ssl_dir)
         self.rel_name = rel_name
         self.relation_prefix = relation_prefix
         self.interfaces = [rel_name]
@@ -1086,6 +1093,10 @@ class HAProxyContext(OSContextGenerator):
         #                 New bind will be created and a prometheus-exporter
         #                 will be used for path /metrics. At the same time,
         #                 prometheus-exporter avoids using auth.
+        try:
+            from distutils.version import LooseVersion
+        except ImportError:
+            from looseversion import LooseVersion
         haproxy_version = get_installed_version("haproxy")
         if (haproxy_version and
                 haproxy_version.ver_str >= LooseVersion("2.0.0") and
@@ -1111,6 +1122,7 @@ class HAProxyContext(OSContextGenerator):
 
 class ImageServiceContext(OSContextGenerator):
     interfaces = ['image-service']
+    volatile = False
 
     def __call__(self):
         """Obtains the glance API server from the image-service relation.
@@ -1538,6 +1550,7 @@ class OSConfigFlagContext(OSContextGenerator):
           key=value pairs and some Openstack config files support
           comma-separated lists as values.
     """
+    volatile = False
 
     def __init__(self, charm_flag='config-flags',
                  template_flag='user_config_flags'):
@@ -1564,6 +1577,8 @@ class LibvirtConfigFlagsContext(OSContextGenerator):
     This context provides support for extending
     the libvirt section through user-defined flags.
     """
+    volatile = False
+
     def __call__(self):
         ctxt = {}
         libvirt_flags = config('libvirt-flags')
@@ -1697,6 +1712,7 @@ class SubordinateConfigContext(OSContextGenerator):
 
 
 class LogLevelContext(OSContextGenerator):
+    volatile = False
 
     def __call__(self):
         ctxt = {}
@@ -1709,6 +1725,7 @@ class LogLevelContext(OSContextGenerator):
 
 
 class SyslogContext(OSContextGenerator):
+    volatile = False
 
     def __call__(self):
         ctxt = {'use_syslog': config('use-syslog')}
@@ -1855,6 +1872,7 @@ class WSGIWorkerConfigContext(WorkerConfigContext):
 
 class ZeroMQContext(OSContextGenerator):
     interfaces = ['zeromq-configuration']
+    volatile = False
 
     def __call__(self):
         ctxt = {}
@@ -1870,6 +1888,7 @@ class ZeroMQContext(OSContextGenerator):
 
 
 class NotificationDriverContext(OSContextGenerator):
+    volatile = False
 
     def __init__(self, zmq_relation='zeromq-configuration',
                  amqp_relation='amqp'):
@@ -2136,6 +2155,8 @@ class InternalEndpointContext(OSContextGenerator):
     endpoints by default so this allows admins to optionally use internal
     endpoints.
     """
+    volatile = False
+
     def __call__(self):
         return {'use_internal_endpoints': config('use-internal-endpoints')}
 
@@ -2157,6 +2178,9 @@ class VolumeAPIContext(InternalEndpointContext):
             configuration that consumes API endpoints from the keystone
             catalog. This is defined as the type:name:endpoint_type string.
     """
+    # the version comes from the installed packages
+    volatile = True
+
     # FIXME(wolsen) This implementation is based on the provider being able
     # to specify the package version to check but does not guarantee that the
     # volume service api version selected is available. In practice, it is
@@ -30,8 +30,6 @@ import charmhelpers.core.hookenv as hookenv
 import charmhelpers.core.host as host
 import charmhelpers.core.unitdata as unitdata
 
-import subprocess
-
 
 # Deferred events generated from the charm are stored along side those
 # generated from packaging.
@@ -335,19 +333,7 @@ def get_service_start_time(service):
     :param service: Services to check timetsamp of.
     :type service: str
     """
-    start_time = None
-    out = subprocess.check_output(
-        [
-            'systemctl',
-            'show',
-            service,
-            '--property=ActiveEnterTimestamp'])
-    str_time = out.decode().rstrip().replace('ActiveEnterTimestamp=', '')
-    if str_time:
-        start_time = datetime.datetime.strptime(
-            str_time,
-            '%a %Y-%m-%d %H:%M:%S %Z')
-    return start_time
+    return host.services_state([service])[service].active_enter_time
 
 
 def check_restart_timestamps():
@@ -356,8 +342,11 @@ def check_restart_timestamps():
     Check if a service has a deferred event and clear it if it has been
     subsequently restarted.
     """
-    for event in get_deferred_restarts():
-        start_time = get_service_start_time(event.service)
+    deferred_restarts = get_deferred_restarts()
+    states = host.services_state(
+        sorted(set(event.service for event in deferred_restarts)))
+    for event in deferred_restarts:
+        start_time = states[event.service].active_enter_time
         deferred_restart_time = datetime.datetime.fromtimestamp(
             event.timestamp)
         if start_time and start_time < deferred_restart_time:
@@ -12,11 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import importlib
+import json
 import os
+import stat
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from charmhelpers.fetch import apt_install, apt_update
+from charmhelpers.core import profiling, unitdata
+from charmhelpers.core.templating import bytecode_cache
 from charmhelpers.core.hookenv import (
     log,
+    record_inputs,
+    DEBUG,
     ERROR,
     INFO,
     TRACE
@@ -31,6 +43,10 @@ except ImportError:
     from jinja2 import FileSystemLoader, ChoiceLoader, Environment, exceptions
 
 
+# unitdata key prefix for the recorded inputs of each rendered config file.
+TEMPLATE_INPUTS_KV_PREFIX = 'charmhelpers.contrib.openstack.templating.inputs.'
+
+
 class OSConfigException(Exception):
     pass
 
@@ -83,13 +99,126 @@ def get_loader(templates_dir, os_release):
     return ChoiceLoader(loaders)
 
 
+def _write_if_changed(path, content):
+    """
+    Atomically replace path with content, unless it already holds exactly
+    that content.
+
+    The new content is written to a temporary file in the same directory
+    which is then renamed over the target, so readers never observe a
+    partially written file.  The mode and ownership of an existing target
+    are preserved.  A symlinked path is resolved first, so the file it
+    points to is replaced rather than the link.
+
+    :param path (str): file to write
+    :param content (bytes): the new content
+    :returns: True if the file was written, False if it was unchanged.
+    """
+    path = os.path.realpath(path)
+    try:
+        with open(path, 'rb') as existing:
+            if existing.read() == content:
+                return False
+        current = os.stat(path)
+    except OSError:
+        current = None
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix='.{}.'.format(os.path.basename(path)))
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(content)
+            out.flush()
+            os.fsync(out.fileno())
+            if current is None:
+                # mimic the permissions open(path, 'wb') would have used.
+                umask = os.umask(0)
+                os.umask(umask)
+                os.fchmod(out.fileno(), 0o666 & ~umask)
+            else:
+                os.fchmod(out.fileno(), stat.S_IMODE(current.st_mode))
+                if (current.st_uid, current.st_gid) != (os.geteuid(),
+                                                        os.getegid()):
+                    os.fchown(out.fileno(), current.st_uid, current.st_gid)
+        os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return True
+
+
+def _input_fingerprint(calls, results):
+    data = json.dumps([calls, results], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('UTF-8')).hexdigest()
+
+
+def _replay_input(call):
+    """Repeat a call recorded by hookenv.record_inputs and return its result.
+    """
+    module, name, args, kwargs = call
+    return getattr(importlib.import_module(module), name)(*args, **kwargs)
+
+
+def _generator_name(generator):
+    return getattr(generator, '__name__', type(generator).__name__)
+
+
+class ContextEvaluator(object):
+    """
+    Evaluates each distinct context generator only once, recording the Juju
+    queries (config, relation data, leadership data, ...) it made.
+
+    A single evaluator is shared by all the templates of an incremental
+    OSConfigRenderer, so a generator registered for several config files,
+    eg. an IdentityServiceContext used by nova.conf and api-paste.ini, is
+    only called once per hook.  It is safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self._generator_locks = {}
+
+    def __call__(self, generator):
+        """
+        :param generator: context generator to evaluate
+        :returns: tuple of the generated context and the list of inputs
+            recorded by hookenv.record_inputs.
+        """
+        with self._lock:
+            lock = self._generator_locks.setdefault(id(generator),
+                                                    threading.Lock())
+        with lock:
+            try:
+                return self._results[id(generator)][1:]
+            except KeyError:
+                pass
+            with record_inputs() as inputs, \
+                    profiling.span('context', _generator_name(generator)):
+                ctxt = generator()
+            # keep a reference to the generator so its id cannot be reused.
+            self._results[id(generator)] = (generator, ctxt, inputs)
+        return ctxt, inputs
+
+    def reset(self):
+        """Forget all results so generators are evaluated again."""
+        self._results.clear()
+
+
 class OSConfigTemplate(object):
     """
     Associates a config file template with a list of context generators.
     Responsible for constructing a template context based on those generators.
+
+    If memoize is set, the generators are only evaluated once and the
+    resulting context is reused until reset() is called.  If an evaluator
+    (see ContextEvaluator) is given, generators are called through it and
+    the Juju queries they made are collected in self.inputs.
     """
 
-    def __init__(self, config_file, contexts, config_template=None):
+    def __init__(self, config_file, contexts, config_template=None,
+                 memoize=False, evaluator=None):
         self.config_file = config_file
 
         if hasattr(contexts, '__call__'):
@@ -101,18 +230,47 @@ class OSConfigTemplate(object):
 
         self.config_template = config_template
 
+        self.memoize = memoize
+        self._ctxt = None
+
+        self.evaluator = evaluator
+        self.inputs = []
+        self.volatile = True
+
     def context(self):
+        if self.memoize and self._ctxt is not None:
+            return dict(self._ctxt)
         ctxt = {}
+        inputs = []
+        volatile = self.evaluator is None
         for context in self.contexts:
-            _ctxt = context()
+            if self.evaluator is None:
+                with profiling.span('context', _generator_name(context)):
+                    _ctxt = context()
+            else:
+                _ctxt, _inputs = self.evaluator(context)
+                inputs.extend(_inputs)
+                # generators are volatile unless they declare otherwise; one
+                # that made no Juju queries must depend on something else,
+                # which cannot be tracked.
+                volatile = (volatile or not _inputs or
+                            getattr(context, 'volatile', True))
             if _ctxt:
                 ctxt.update(_ctxt)
                 # track interfaces for every complete context.
                 [self._complete_contexts.append(interface)
                  for interface in context.interfaces
                  if interface not in self._complete_contexts]
+        self.inputs = inputs
+        self.volatile = volatile
+        if self.memoize:
+            self._ctxt = dict(ctxt)
         return ctxt
 
+    def reset(self):
+        """Forget a memoized context so the next call re-evaluates it."""
+        self._ctxt = None
+
     def complete_contexts(self):
         '''
         Return a list of interfaces that have satisfied contexts.
@@ -204,8 +362,48 @@ class OSConfigRenderer(object):
     of generators.  When a template is rendered and written, all context
     generates are called in a chain to generate the context dictionary
     passed to the jinja2 template. See context.py for more info.
+
+    **Incremental rendering**
+
+    With incremental=True each registered file's context is evaluated once
+    for the lifetime of the renderer (usually a single hook), and files are
+    only rewritten when the rendered content differs from what is on disk.
+    Writes go to a temporary file which is atomically renamed into place, so
+    unchanged files keep their mtime and never trigger spurious restarts::
+
+        configs = OSConfigRenderer(templates_dir='/tmp/templates',
+                                   openstack_release='folsom',
+                                   incremental=True)
+        ...
+        changed = configs.write_all()
+        if '/etc/nova/nova.conf' in changed:
+            service_restart('nova-api')
+
+    Call reset() if context data is known to have changed mid-hook.
+
+    **Dependency tracking**
+
+    track_dependencies=True (which implies incremental) additionally records
+    the Juju queries made by the context generators of each config file, and
+    stores them with a fingerprint of their results in unitdata.  On later
+    hooks the queries are replayed first and a file is only re-rendered when
+    their results, the templates, the release or the file on disk changed,
+    so the (often expensive) generators of an up-to-date file are never
+    called.
+
+    Local state (files, the hostname, NICs, processes, ...) is not recorded,
+    so skipping only applies to config files built purely from config,
+    relation and leadership data: every generator of the file must set
+    ``volatile = False`` (see context.OSContextGenerator).  A single
+    volatile generator, or one making no Juju queries at all, means the
+    file is always rendered.  Most of the stock contexts read local state,
+    eg. SharedDBContext, AMQPContext with an ssl_dir and HAProxyContext, so
+    the main service config files of a typical OpenStack charm are rendered
+    on every hook; the gain is limited to smaller files, eg. logging or
+    notification snippets, whose generators are all pure.
     """
-    def __init__(self, templates_dir, openstack_release):
+    def __init__(self, templates_dir, openstack_release, incremental=False,
+                 track_dependencies=False):
         if not os.path.isdir(templates_dir):
             log('Could not locate templates dir %s' % templates_dir,
                 level=ERROR)
@@ -213,8 +411,14 @@ class OSConfigRenderer(object):
 
         self.templates_dir = templates_dir
         self.openstack_release = openstack_release
+        self.incremental = incremental or track_dependencies
+        self.track_dependencies = track_dependencies
         self.templates = {}
         self._tmpl_env = None
+        self._evaluator = ContextEvaluator() if self.incremental else None
+        self._templates_digest = None
+        # seconds spent rendering and writing each file by write_all()
+        self.timings = {}
 
         if None in [Environment, ChoiceLoader, FileSystemLoader]:
             # if this code is running, the object is created pre-install hook.
@@ -235,7 +439,9 @@ class OSConfigRenderer(object):
         self.templates[config_file] = OSConfigTemplate(
             config_file=config_file,
             contexts=contexts,
-            config_template=config_template
+            config_template=config_template,
+            memoize=self.incremental,
+            evaluator=self._evaluator,
         )
         log('Registered config file: {}'.format(config_file),
             level=INFO)
@@ -243,7 +449,8 @@ class OSConfigRenderer(object):
     def _get_tmpl_env(self):
         if not self._tmpl_env:
             loader = get_loader(self.templates_dir, self.openstack_release)
-            self._tmpl_env = Environment(loader=loader)
+            self._tmpl_env = Environment(loader=loader,
+                                         bytecode_cache=bytecode_cache())
 
     def _get_template(self, template):
         self._get_tmpl_env()
@@ -300,29 +507,197 @@ class OSConfigRenderer(object):
 
             log('Rendering from template: {}'.format(config_file),
                 level=INFO)
-        return template.render(ctxt)
+        with profiling.span('template', config_file):
+            return template.render(ctxt)
 
     def write(self, config_file):
         """
         Write a single config file, raises if config file is not registered.
+
+        :returns: True if the file was written; in incremental mode, False
+            if the file already had the rendered content.
         """
         if config_file not in self.templates:
             log('Config not registered: %s' % config_file, level=ERROR)
             raise OSConfigException
 
-        _out = self.render(config_file).encode('UTF-8')
+        if self.track_dependencies and self._inputs_unchanged(config_file):
+            log('Inputs of %s unchanged, not rendering.' % config_file,
+                level=DEBUG)
+            return False
 
-        with open(config_file, 'wb') as out:
-            out.write(_out)
+        return self._write_rendered(
+            config_file, self.render(config_file).encode('UTF-8'))
+
+    def _write_rendered(self, config_file, _out):
+        if self.track_dependencies:
+            self._save_inputs(config_file, _out)
+
+        if self.incremental:
+            if not _write_if_changed(config_file, _out):
+                log('Template %s unchanged.' % config_file, level=DEBUG)
+                return False
+        else:
+            with open(config_file, 'wb') as out:
+                out.write(_out)
 
         log('Wrote template %s.' % config_file, level=INFO)
+        return True
 
-    def write_all(self):
+    def _source_digest(self, ostmpl):
+        """
+        Digest of everything besides the context that the rendered output of
+        ostmpl depends on: the release and the template sources.
+        """
+        if self._templates_digest is None:
+            digest = hashlib.sha256()
+            helper_templates = os.path.join(os.path.dirname(__file__),
+                                            'templates')
+            for templates_dir in (self.templates_dir, helper_templates):
+                for root, dirs, files in os.walk(templates_dir):
+                    dirs.sort()
+                    for name in sorted(files):
+                        path = os.path.join(root, name)
+                        st = os.stat(path)
+                        digest.update('{} {} {}\n'.format(
+                            path, st.st_mtime_ns, st.st_size).encode('UTF-8'))
+            self._templates_digest = digest.hexdigest()
+        data = json.dumps([self.openstack_release, self._templates_digest,
+                           ostmpl.config_template])
+        return hashlib.sha256(data.encode('UTF-8')).hexdigest()
+
+    def _inputs_unchanged(self, config_file):
+        """
+        Replay the inputs recorded when config_file was last rendered and
+        check whether anything it depends on changed since.
+        """
+        state = unitdata.kv().get(TEMPLATE_INPUTS_KV_PREFIX + config_file)
+        if not state:
+            return False
+        if state['source'] != self._source_digest(self.templates[config_file]):
+            return False
+        try:
+            with open(config_file, 'rb') as f:
+                if hashlib.sha256(f.read()).hexdigest() != state['digest']:
+                    return False
+        except OSError:
+            return False
+        try:
+            results = [_replay_input(call) for call in state['inputs']]
+        except Exception as e:
+            log('Unable to replay inputs of {}: {}'.format(config_file, e),
+                level=DEBUG)
+            return False
+        return _input_fingerprint(state['inputs'], results) == \
+            state['fingerprint']
+
+    def _save_inputs(self, config_file, content):
+        """
+        Store the inputs recorded while rendering config_file, so a later
+        hook can tell whether it needs rendering again.
+        """
+        key = TEMPLATE_INPUTS_KV_PREFIX + config_file
+        ostmpl = self.templates[config_file]
+        calls = []
+        results = []
+        for module, name, args, kwargs, result in ostmpl.inputs:
+            call = [module, name, list(args), kwargs]
+            if call not in calls:
+                calls.append(call)
+                results.append(result)
+        try:
+            # the calls are replayed from their JSON form.
+            portable = json.loads(json.dumps(calls)) == calls
+        except (TypeError, ValueError):
+            portable = False
+        if ostmpl.volatile or not portable:
+            unitdata.kv().unset(key)
+            return
+        unitdata.kv().set(key, {
+            'source': self._source_digest(ostmpl),
+            'digest': hashlib.sha256(content).hexdigest(),
+            'inputs': calls,
+            'fingerprint': _input_fingerprint(calls, results),
+        })
+
+    def write_all(self, parallel=None):
         """
         Write out all registered config files.
+
+        With parallel=N the contexts are evaluated and the templates
+        rendered by N threads; the files are still written one at a time in
+        registration order.  As when writing serially, the files preceding a
+        failing one are written and its exception is raised.  This requires
+        an incremental renderer, whose ContextEvaluator keeps the threads
+        from calling a generator shared by several files concurrently.
+        Generators may still call the same @cached hookenv functions from
+        several threads; the hookenv cache and its flush() index are
+        guarded by a lock for this.
+
+        The time spent on each file is logged and kept in self.timings.
+
+        :param parallel (int): number of threads rendering templates.
+        :returns: set of the config files that were written.
+        :raises: ValueError if parallel is set on a renderer that is not
+            incremental.
         """
+        if parallel and parallel > 1 and self._evaluator is None:
+            raise ValueError('write_all(parallel={}) requires an incremental '
+                             'OSConfigRenderer'.format(parallel))
+        self.timings = {}
+        if not parallel or parallel < 2:
+            changed = set()
+            for k in self.templates.keys():
+                start = time.monotonic()
+                if self.write(k):
+                    changed.add(k)
+                self._record_timing(k, start)
+            return changed
+
+        pending = []
         for k in self.templates.keys():
-            self.write(k)
+            if self.track_dependencies and self._inputs_unchanged(k):
+                log('Inputs of %s unchanged, not rendering.' % k,
+                    level=DEBUG)
+            else:
+                pending.append(k)
+        self._get_tmpl_env()
+        changed = set()
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            futures = [(k, executor.submit(self._timed_render, k))
+                       for k in pending]
+            try:
+                for k, future in futures:
+                    _out, elapsed = future.result()
+                    start = time.monotonic() - elapsed
+                    if self._write_rendered(k, _out):
+                        changed.add(k)
+                    self._record_timing(k, start)
+            except Exception:
+                for _, future in futures:
+                    future.cancel()
+                raise
+        return changed
+
+    def _timed_render(self, config_file):
+        start = time.monotonic()
+        _out = self.render(config_file).encode('UTF-8')
+        return _out, time.monotonic() - start
+
+    def _record_timing(self, config_file, start):
+        self.timings[config_file] = time.monotonic() - start
+        log('Processed {} in {:.3f}s.'.format(
+            config_file, self.timings[config_file]), level=DEBUG)
+
+    def reset(self):
+        """
+        Discard memoized contexts so that they are re-evaluated on the next
+        render.
+        """
+        for ostmpl in self.templates.values():
+            ostmpl.reset()
+        if self._evaluator is not None:
+            self._evaluator.reset()
 
     def set_release(self, openstack_release):
         """
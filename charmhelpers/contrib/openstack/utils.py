@@ -86,7 +86,7 @@ from charmhelpers.core.host import (
     lsb_release,
     mounts,
     umount,
-    service_running,
+    services_running,
     service_pause,
     service_resume,
     service_stop,
@@ -1305,8 +1305,8 @@ def _check_running_services(services):
     @returns [(service, boolean), ...], : results for checks
              [boolean]                  : just the result of the service checks
     """
-    services_running = [service_running(s) for s in services]
-    return list(zip(services, services_running)), services_running
+    running = services_running(services)
+    return list(zip(services, running)), running
 
 
 def _check_listening_on_services_ports(services, test=False,
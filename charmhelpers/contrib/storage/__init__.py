@@ -11,3 +11,14 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+
+# Submodules are imported when first accessed as attributes of the package,
+# not when the package is.
+from charmhelpers import lazy_attributes
+
+_SUBMODULES = (
+    'linux',
+)
+
+__getattr__ = lazy_attributes(
+    __name__, {name: '{}.{}'.format(__name__, name) for name in _SUBMODULES})
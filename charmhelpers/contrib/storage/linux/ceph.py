@@ -381,6 +381,7 @@ class BasePool(object):
         if not pool_exists(self.service, self.name):
             self.validate()
             self._create()
+            _cluster_changed(self.service)
             self._post_create()
             self.update()
 
@@ -457,6 +458,7 @@ class BasePool(object):
             'ceph', '--id', self.service,
             'osd', 'pool', 'set', cache_pool, 'hit_set_type', 'bloom',
         ])
+        _cluster_changed(self.service)
 
     def remove_cache_tier(self, cache_pool):
         """Removes a cache tier from Ceph.
@@ -497,6 +499,7 @@ class BasePool(object):
             check_call([
                 'ceph', '--id', self.service,
                 'osd', 'tier', 'remove', self.name, cache_pool])
+        _cluster_changed(self.service)
 
     def get_pgs(self, pool_size, percent_data=DEFAULT_POOL_WEIGHT,
                 device_class=None):
@@ -791,6 +794,12 @@ def enabled_manager_modules():
 
     :rtype: List[str]
     """
+    if _cluster_snapshot is not None:
+        return _cluster_snapshot.enabled_manager_modules()
+    return _enabled_manager_modules()
+
+
+def _enabled_manager_modules():
     cmd = ['ceph', 'mgr', 'module', 'ls']
     quincy_or_later = cmp_pkgrevno('ceph-common', '17.1.0') >= 0
     if quincy_or_later:
@@ -971,7 +980,10 @@ def get_erasure_profile(service, name):
     :returns: Dictionary with profile data.
     :rtype: Optional[Dict[str]]
     """
+    snapshot = _get_cluster_snapshot(service)
     try:
+        if snapshot is not None:
+            return snapshot.get_erasure_profile(name)
         out = check_output(['ceph', '--id', service,
                             'osd', 'erasure-code-profile', 'get',
                             name, '--format=json']).decode('utf-8')
@@ -1084,6 +1096,7 @@ def remove_erasure_profile(service, profile_name):
         'ceph', '--id', service,
         'osd', 'erasure-code-profile', 'rm', profile_name]
     check_call(cmd)
+    _cluster_changed(service)
 
 
 def create_erasure_profile(service, profile_name,
@@ -1241,6 +1254,7 @@ def create_erasure_profile(service, profile_name,
             cmd.append('scalar-mds={}'.format(scalar_mds))
 
     check_call(cmd)
+    _cluster_changed(service)
 
 
 def rename_pool(service, old_name, new_name):
@@ -1260,6 +1274,7 @@ def rename_pool(service, old_name, new_name):
         'ceph', '--id', service,
         'osd', 'pool', 'rename', old_name, new_name]
     check_call(cmd)
+    _cluster_changed(service)
 
 
 def erasure_profile_exists(service, name):
@@ -1273,7 +1288,10 @@ def erasure_profile_exists(service, name):
     :rtype: bool
     """
     validator(value=name, valid_type=str)
+    snapshot = _get_cluster_snapshot(service)
     try:
+        if snapshot is not None:
+            return snapshot.get_erasure_profile(name) is not None
         check_call(['ceph', '--id', service,
                     'osd', 'erasure-code-profile', 'get',
                     name])
@@ -1294,6 +1312,9 @@ def get_cache_mode(service, pool_name):
     """
     validator(value=service, valid_type=str)
     validator(value=pool_name, valid_type=str)
+    snapshot = _get_cluster_snapshot(service)
+    if snapshot is not None:
+        return snapshot.get_cache_mode(pool_name)
     out = check_output(['ceph', '--id', service,
                         'osd', 'dump', '--format=json']).decode('utf-8')
     try:
@@ -1308,7 +1329,10 @@ def get_cache_mode(service, pool_name):
 
 def pool_exists(service, name):
     """Check to see if a RADOS pool already exists."""
+    snapshot = _get_cluster_snapshot(service)
     try:
+        if snapshot is not None:
+            return snapshot.pool_exists(name)
         out = check_output(
             ['rados', '--id', service, 'lspools']).decode('utf-8')
     except CalledProcessError:
@@ -1324,6 +1348,13 @@ def get_osds(service, device_class=None):
     :param device_class: Class of storage device for OSD's
     :type device_class: str
     """
+    snapshot = _get_cluster_snapshot(service)
+    if snapshot is not None:
+        return snapshot.get_osds(device_class)
+    return _get_osds(service, device_class)
+
+
+def _get_osds(service, device_class=None):
     luminous_or_later = cmp_pkgrevno('ceph-common', '12.0.0') >= 0
     if luminous_or_later and device_class:
         out = check_output(['ceph', '--id', service,
@@ -1337,6 +1368,113 @@ def get_osds(service, device_class=None):
     return json.loads(out)
 
 
+class CephClusterSnapshot(object):
+    """State of the cluster, read once and shared by the helpers of this
+    module.
+
+    While a snapshot is active, ``pool_exists``, ``get_osds``,
+    ``get_cache_mode``, ``get_erasure_profile``, ``erasure_profile_exists``
+    and ``enabled_manager_modules`` answer from it instead of running
+    ``ceph`` or ``rados`` every time::
+
+        with CephClusterSnapshot(service):
+            for op in ops:
+                ReplicatedPool(service, op=op).create()
+
+    Each part of the state is read on first use: ``osd dump`` for the pools
+    and erasure code profiles, ``osd ls`` or ``osd crush class ls-osd`` for
+    the OSDs and ``mgr module ls`` for the manager modules.  Changes made
+    through the helpers of this module refresh the pools and profiles; call
+    ``refresh`` after changing the cluster by other means.
+
+    :param service: The Ceph user name to run the commands under.
+    :type service: str
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self._outer = None
+        self.refresh()
+
+    def refresh(self, osds=True):
+        """Forget the state read so far.
+
+        :param osds: Whether to also forget the OSD lists and the manager
+                     modules, which pool changes do not affect.
+        :type osds: bool
+        """
+        self._osd_dump = None
+        if osds:
+            self._osds = {}
+            self._manager_modules = None
+
+    def __enter__(self):
+        global _cluster_snapshot
+        self._outer = _cluster_snapshot
+        _cluster_snapshot = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _cluster_snapshot
+        _cluster_snapshot = self._outer
+        self._outer = None
+
+    @property
+    def osd_dump(self):
+        """:returns: Output of ``ceph osd dump``
+        :rtype: Dict[str, any]
+        """
+        if self._osd_dump is None:
+            self._osd_dump = json.loads(check_output([
+                'ceph', '--id', self.service,
+                'osd', 'dump', '--format=json']).decode('utf-8'))
+        return self._osd_dump
+
+    def get_pool(self, name):
+        """:returns: ``osd dump`` details of pool name, if it exists.
+        :rtype: Optional[Dict[str, any]]
+        """
+        for pool in self.osd_dump['pools']:
+            if pool['pool_name'] == name:
+                return pool
+
+    def pool_exists(self, name):
+        return self.get_pool(name) is not None
+
+    def get_cache_mode(self, pool_name):
+        pool = self.get_pool(pool_name)
+        if pool is not None:
+            return pool['cache_mode']
+
+    def get_erasure_profile(self, name):
+        return self.osd_dump.get('erasure_code_profiles', {}).get(name)
+
+    def get_osds(self, device_class=None):
+        if device_class not in self._osds:
+            self._osds[device_class] = _get_osds(self.service, device_class)
+        return self._osds[device_class]
+
+    def enabled_manager_modules(self):
+        if self._manager_modules is None:
+            self._manager_modules = _enabled_manager_modules()
+        return self._manager_modules
+
+
+_cluster_snapshot = None
+
+
+def _get_cluster_snapshot(service):
+    """:returns: The active CephClusterSnapshot, if it is for service."""
+    if _cluster_snapshot is not None and _cluster_snapshot.service == service:
+        return _cluster_snapshot
+
+
+def _cluster_changed(service):
+    """Refresh the pools and profiles of the active CephClusterSnapshot."""
+    if _cluster_snapshot is not None:
+        _cluster_snapshot.refresh(osds=False)
+
+
 def install():
     """Basic Ceph client installation."""
     ceph_dir = "/etc/ceph"
@@ -1418,6 +1556,7 @@ def create_pool(service, name, replicas=3, pg_num=None):
 
     cmd = ['ceph', '--id', service, 'osd', 'pool', 'create', name, str(pg_num)]
     check_call(cmd)
+    _cluster_changed(service)
 
     update_pool(service, name, settings={'size': str(replicas)})
 
@@ -1427,6 +1566,7 @@ def delete_pool(service, name):
     cmd = ['ceph', '--id', service, 'osd', 'pool', 'delete', name,
            '--yes-i-really-really-mean-it']
     check_call(cmd)
+    _cluster_changed(service)
 
 
 def _keyfile_path(service):
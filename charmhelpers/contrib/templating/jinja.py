@@ -15,6 +15,8 @@
 """
 Templating using the python3-jinja2 package.
 """
+from charmhelpers.core import profiling
+from charmhelpers.core.templating import bytecode_cache
 from charmhelpers.fetch import apt_install, apt_update
 try:
     import jinja2
@@ -37,11 +39,16 @@ def render(template_name, context, template_dir=DEFAULT_TEMPLATES_DIR,
     :param template_dir: directory in which the template file is located
     :param jinja_env_args: additional arguments passed to the
                            jinja2.Environment. Expected dict with format
-                           {'arg_name': 'arg_value'}
+                           {'arg_name': 'arg_value'}. Compiled templates
+                           are cached in the charm, per set of options,
+                           unless a bytecode_cache is given.
     :return: Rendered template as a string
     """
-    env_kwargs = jinja_env_args or {}
+    env_kwargs = dict(jinja_env_args or {})
+    if 'bytecode_cache' not in env_kwargs:
+        env_kwargs['bytecode_cache'] = bytecode_cache(env_args=env_kwargs)
     templates = jinja2.Environment(
         loader=jinja2.FileSystemLoader(template_dir), **env_kwargs)
     template = templates.get_template(template_name)
-    return template.render(context)
+    with profiling.span('template', template_name):
+        return template.render(context)
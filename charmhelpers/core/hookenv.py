@@ -18,13 +18,11 @@
 #  Charm Helpers Developers <juju@lists.ubuntu.com>
 
 import copy
-try:
-    from distutils.version import LooseVersion
-except ImportError:
-    from looseversion import LooseVersion
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from enum import Enum
 from functools import wraps
-from collections import namedtuple, UserDict
+from collections import namedtuple, OrderedDict, UserDict
 import glob
 import os
 import json
@@ -34,9 +32,11 @@ import subprocess
 import sys
 import errno
 import tempfile
+import threading
 from subprocess import CalledProcessError
 
 from charmhelpers import deprecate
+from charmhelpers.core import profiling
 
 
 CRITICAL = "CRITICAL"
@@ -61,10 +61,112 @@ class WORKLOAD_STATES(Enum):
     WAITING = 'waiting'
 
 
-cache = {}
+class _Cache(dict):
+    """Results of @cached functions, keyed by function and arguments.
 
+    clear() also resets the flush index and the recency order of bounded
+    functions, so that they stay in sync when the whole cache is dropped.
+    """
+
+    def clear(self):
+        with _cache_lock:
+            super(_Cache, self).clear()
+            _cache_index.clear()
+            _cache_key_tokens.clear()
+            for lru in _cache_lru.values():
+                lru.clear()
+
+
+cache = _Cache()
+# Maps each string argument and function name to the cache keys using it, so
+# flush() does not need to scan the whole cache.
+_cache_index = {}
+_cache_key_tokens = {}
+# Per function recency order of cache keys, only for bounded functions.
+_cache_lru = {}
+_KWARGS_MARK = object()
+# Guards the cache and its index, @cached functions are called from
+# worker threads by gather() and OSConfigRenderer.write_all(parallel=N).
+_cache_lock = threading.Lock()
+# Active record_inputs() lists, per thread.
+_input_recorders = threading.local()
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def _cache_key(func, args, kwargs):
+    """Build a hashable cache key for a call of func.
+
+    Falls back to a JSON encoding of the arguments when they are not
+    hashable (e.g. dicts or lists).
+    """
+    key = args
+    if kwargs:
+        key += (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+    try:
+        hash(key)
+    except TypeError:
+        key = json.dumps((args, kwargs), sort_keys=True, default=str)
+    return (func, key)
+
+
+def _cache_tokens(func, args, kwargs):
+    tokens = [func.__name__]
+    tokens.extend(a for a in args if isinstance(a, str))
+    tokens.extend(v for v in kwargs.values() if isinstance(v, str))
+    return tokens
+
+
+def _record_input(func, args, kwargs, result):
+    for recorder in _input_recorders.active:
+        recorder.append(
+            (func.__module__, func.__name__, args, kwargs, result))
+
+
+@contextmanager
+def record_inputs():
+    """Record the Juju queries made within the block.
 
-def cached(func):
+    Yields a list which receives a ``(module, function name, args, kwargs,
+    result)`` tuple for every call of a @cached function (relation_get,
+    relation_ids, related_units, ...), config, is_leader and leader_get,
+    whether or not the result came from the cache, in the current thread.
+    Replaying the calls
+    tells whether the inputs of a computation have changed::
+
+        with record_inputs() as inputs:
+            ctxt = generate_context()
+    """
+    recorded = []
+    if not hasattr(_input_recorders, 'active'):
+        _input_recorders.active = []
+    _input_recorders.active.append(recorded)
+    try:
+        yield recorded
+    finally:
+        # Remove by identity, list.remove() would match an equal recorder.
+        active = _input_recorders.active
+        for i in range(len(active) - 1, -1, -1):
+            if active[i] is recorded:
+                del active[i]
+                break
+
+
+def _cache_evict(key):
+    """Drop a cache entry, with _cache_lock held."""
+    cache.pop(key, None)
+    for token in _cache_key_tokens.pop(key, ()):
+        keys = _cache_index.get(token)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del _cache_index[token]
+    lru = _cache_lru.get(key[0])
+    if lru is not None:
+        lru.pop(key, None)
+
+
+def cached(func=None, maxsize=None):
     """Cache return values for multiple executions of func + args
 
     For example::
@@ -76,31 +178,92 @@ def cached(func):
         unit_get('test')
 
     will cache the result of unit_get + 'test' for future calls.
+
+    Passing maxsize bounds the number of entries kept for the function,
+    evicting the least recently used ones::
+
+        @cached(maxsize=128)
+        def network_get(endpoint):
+            pass
+
+    Hit and miss counters are available via ``unit_get.cache_info()``.
     """
+    if func is None:
+        return lambda f: cached(f, maxsize=maxsize)
+
+    stats = {'hits': 0, 'misses': 0}
+    if maxsize is not None:
+        _cache_lru[func] = OrderedDict()
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        global cache
-        key = json.dumps((func, args, kwargs), sort_keys=True, default=str)
-        try:
-            return cache[key]
-        except KeyError:
-            pass  # Drop out of the exception handler scope.
-        res = func(*args, **kwargs)
-        cache[key] = res
+        key = _cache_key(func, args, kwargs)
+        with _cache_lock:
+            hit = key in cache
+            if hit:
+                res = cache[key]
+                stats['hits'] += 1
+                if maxsize is not None:
+                    _cache_lru[func][key] = None
+                    _cache_lru[func].move_to_end(key)
+            else:
+                stats['misses'] += 1
+        if hit:
+            if getattr(_input_recorders, 'active', None):
+                _record_input(func, args, kwargs, res)
+            return res
+        profiler = profiling.active()
+        if profiler is None:
+            res = func(*args, **kwargs)
+        else:
+            with profiler.span('cached', func.__name__):
+                res = func(*args, **kwargs)
+        tokens = _cache_tokens(func, args, kwargs)
+        with _cache_lock:
+            cache[key] = res
+            _cache_key_tokens[key] = tokens
+            for token in tokens:
+                _cache_index.setdefault(token, set()).add(key)
+            if maxsize is not None:
+                lru = _cache_lru[func]
+                lru[key] = None
+                while len(lru) > maxsize:
+                    _cache_evict(next(iter(lru)))
+        if getattr(_input_recorders, 'active', None):
+            _record_input(func, args, kwargs, res)
         return res
+
+    def cache_info():
+        """Report hit/miss statistics for this function's cache."""
+        with _cache_lock:
+            currsize = sum(1 for key in cache
+                           if isinstance(key, tuple) and key[0] is func)
+            return CacheInfo(stats['hits'], stats['misses'], maxsize,
+                             currsize)
+
+    def cache_clear():
+        """Drop all cached results of this function."""
+        with _cache_lock:
+            for key in [k for k in cache
+                        if isinstance(k, tuple) and k[0] is func]:
+                _cache_evict(key)
+
     wrapper._wrapped = func
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
     return wrapper
 
 
 def flush(key):
-    """Flushes any entries from function cache where the
-    key is found in the function+args """
-    flush_list = []
-    for item in cache:
-        if key in item:
-            flush_list.append(item)
-    for item in flush_list:
-        del cache[item]
+    """Flushes any entries from function cache where key is the name of
+    the function or one of its string arguments.
+
+    key has to match a whole name or argument: flush('foo') no longer
+    flushes the entries for 'foo/0', as the former substring match of the
+    function and arguments did."""
+    with _cache_lock:
+        for item in list(_cache_index.get(key, ())):
+            _cache_evict(item)
 
 
 def log(message, level=None):
@@ -447,8 +610,12 @@ def config(scope=None):
                 subprocess.check_output(config_cmd_line).decode('UTF-8'))
             _cache_config = Config(config_data)
         if scope is not None:
-            return _cache_config.get(scope)
-        return _cache_config
+            value = _cache_config.get(scope)
+        else:
+            value = _cache_config
+        if getattr(_input_recorders, 'active', None):
+            _record_input(config, (scope,), {}, value)
+        return value
     except (json.decoder.JSONDecodeError, UnicodeDecodeError) as e:
         log('Unable to parse output from config-get: config_cmd_line="{}" '
             'message="{}"'
@@ -459,6 +626,16 @@ def config(scope=None):
 @cached
 def relation_get(attribute=None, unit=None, rid=None, app=None):
     """Get relation information"""
+    if _relation_snapshot is not None and app is None:
+        try:
+            return _relation_snapshot.relation_get(attribute, unit, rid)
+        except KeyError:
+            pass  # Not in the snapshot, ask juju directly.
+    return _relation_get(attribute=attribute, unit=unit, rid=rid, app=app)
+
+
+def _relation_get(attribute=None, unit=None, rid=None, app=None):
+    """Run relation-get, bypassing the function cache and snapshot."""
     _args = ['relation-get', '--format=json']
     if app is not None:
         if unit is not None:
@@ -531,6 +708,8 @@ def relation_set(relation_id=None, relation_settings=None, app=False, **kwargs):
         subprocess.check_call(relation_cmd_line)
     # Flush cache of any relation-gets for local unit
     flush(local_unit())
+    if _relation_snapshot is not None:
+        _relation_snapshot.invalidate(rid=relation_id, unit=local_unit())
 
 
 def relation_clear(r_id=None):
@@ -548,6 +727,16 @@ def relation_clear(r_id=None):
 def relation_ids(reltype=None):
     """A list of relation_ids"""
     reltype = reltype or relation_type()
+    if _relation_snapshot is not None:
+        try:
+            return _relation_snapshot.relation_ids(reltype)
+        except KeyError:
+            pass  # Not in the snapshot, ask juju directly.
+    return _relation_ids(reltype)
+
+
+def _relation_ids(reltype):
+    """Run relation-ids, bypassing the function cache and snapshot."""
     relid_cmd_line = ['relation-ids', '--format=json']
     if reltype is not None:
         relid_cmd_line.append(reltype)
@@ -560,6 +749,16 @@ def relation_ids(reltype=None):
 def related_units(relid=None):
     """A list of related units"""
     relid = relid or relation_id()
+    if _relation_snapshot is not None:
+        try:
+            return _relation_snapshot.related_units(relid)
+        except KeyError:
+            pass  # Not in the snapshot, ask juju directly.
+    return _related_units(relid)
+
+
+def _related_units(relid):
+    """Run relation-list, bypassing the function cache and snapshot."""
     units_cmd_line = ['relation-list', '--format=json']
     if relid is not None:
         units_cmd_line.extend(('-r', relid))
@@ -567,6 +766,134 @@ def related_units(relid=None):
         subprocess.check_output(units_cmd_line).decode('UTF-8')) or []
 
 
+class RelationSnapshot(object):
+    """An in-memory copy of all relation data visible to this unit.
+
+    Loading the snapshot runs relation-ids once per relation type,
+    relation-list once per relation id and relation-get once per unit
+    (including the local unit), using a thread pool to run the hook tools
+    concurrently.  Once installed with :func:`relation_snapshot`,
+    :func:`relation_get`, :func:`relation_ids` and :func:`related_units`
+    answer from the snapshot and only fall back to the hook tools for data
+    it does not hold (application data, departing units, etc.).
+
+    Example usage::
+
+        hookenv.atstart(hookenv.relation_snapshot)
+
+    :param reltypes: Relation types to load, defaults to all relation types
+                     declared in metadata.yaml.
+    :type reltypes: Optional[List[str]]
+    :param max_workers: Maximum number of concurrent hook tool invocations.
+    :type max_workers: int
+    """
+
+    def __init__(self, reltypes=None, max_workers=4):
+        self.reltypes = reltypes
+        self.max_workers = max_workers
+        self._relids = {}
+        self._units = {}
+        self._settings = {}
+
+    def load(self):
+        """(Re)load all relation data from juju.
+
+        :returns: self
+        :rtype: RelationSnapshot
+        """
+        reltypes = self.reltypes
+        if reltypes is None:
+            reltypes = relation_types()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            relids = dict(zip(reltypes,
+                              executor.map(_relation_ids, reltypes)))
+            rids = [rid for reltype in reltypes for rid in relids[reltype]]
+            units = dict(zip(rids, executor.map(_related_units, rids)))
+            keys = [(rid, unit)
+                    for rid in rids
+                    for unit in [local_unit()] + units[rid]]
+            settings = executor.map(
+                lambda key: _relation_get(unit=key[1], rid=key[0]), keys)
+            settings = dict(zip(keys, settings))
+        self._relids = relids
+        self._units = units
+        self._settings = settings
+        return self
+
+    def relation_ids(self, reltype):
+        """A list of relation ids for reltype.
+
+        :raises: KeyError if reltype is not in the snapshot.
+        """
+        return list(self._relids[reltype])
+
+    def related_units(self, relid):
+        """A list of units related on relid.
+
+        :raises: KeyError if relid is not in the snapshot.
+        """
+        return list(self._units[relid])
+
+    def relation_get(self, attribute=None, unit=None, rid=None):
+        """Get relation settings with the same semantics as relation-get.
+
+        :raises: KeyError if the unit's settings on rid are not in the
+                 snapshot.
+        """
+        unit = unit or remote_unit()
+        rid = rid or relation_id()
+        settings = self._settings[(rid, unit)]
+        if attribute is None or attribute == '-':
+            return copy.deepcopy(settings)
+        return copy.deepcopy(settings.get(attribute))
+
+    def invalidate(self, rid=None, unit=None):
+        """Drop cached settings so they are fetched from juju again.
+
+        :param rid: Only drop settings on this relation id.
+        :type rid: Optional[str]
+        :param unit: Only drop settings for this unit.
+        :type unit: Optional[str]
+        """
+        for key in list(self._settings):
+            if rid is not None and key[0] != rid:
+                continue
+            if unit is not None and key[1] != unit:
+                continue
+            del self._settings[key]
+
+
+_relation_snapshot = None
+
+
+def relation_snapshot(reltypes=None, max_workers=4):
+    """Load a :class:`RelationSnapshot` and use it for relation queries.
+
+    The snapshot stays in use until :func:`clear_relation_snapshot` is
+    called, so this should be used at most once per hook, typically via
+    :func:`atstart`.
+
+    :param reltypes: Relation types to load, defaults to all relation types
+                     declared in metadata.yaml.
+    :type reltypes: Optional[List[str]]
+    :param max_workers: Maximum number of concurrent hook tool invocations.
+    :type max_workers: int
+    :returns: The installed snapshot.
+    :rtype: RelationSnapshot
+    """
+    global _relation_snapshot
+    snapshot = RelationSnapshot(reltypes=reltypes,
+                                max_workers=max_workers).load()
+    _relation_snapshot = snapshot
+    return snapshot
+
+
+def clear_relation_snapshot():
+    """Stop answering relation queries from the installed snapshot."""
+    global _relation_snapshot
+    _relation_snapshot = None
+
+
 def expected_peer_units():
     """Get a generator for units we expect to join peer relation based on
     goal-state.
@@ -1218,14 +1545,20 @@ def is_leader():
     Uses juju to determine whether the current unit is the leader of its peers
     """
     cmd = ['is-leader', '--format=json']
-    return json.loads(subprocess.check_output(cmd).decode('UTF-8'))
+    leader = json.loads(subprocess.check_output(cmd).decode('UTF-8'))
+    if getattr(_input_recorders, 'active', None):
+        _record_input(is_leader, (), {}, leader)
+    return leader
 
 
 @translate_exc(from_exc=OSError, to_exc=NotImplementedError)
 def leader_get(attribute=None):
     """Juju leader get value(s)"""
     cmd = ['leader-get', '--format=json'] + [attribute or '-']
-    return json.loads(subprocess.check_output(cmd).decode('UTF-8'))
+    value = json.loads(subprocess.check_output(cmd).decode('UTF-8'))
+    if getattr(_input_recorders, 'active', None):
+        _record_input(leader_get, (attribute,), {}, value)
+    return value
 
 
 @translate_exc(from_exc=OSError, to_exc=NotImplementedError)
@@ -1307,9 +1640,48 @@ def juju_version():
 
 def has_juju_version(minimum_version):
     """Return True if the Juju version is at least the provided version"""
+    # distutils takes longer to import than the rest of hookenv.
+    try:
+        from distutils.version import LooseVersion
+    except ImportError:
+        from looseversion import LooseVersion
     return LooseVersion(juju_version()) >= LooseVersion(minimum_version)
 
 
+def gather(*calls, max_workers=4):
+    """Run independent hook tool queries concurrently.
+
+    Each call is a callable taking no arguments, usually a hook tool helper
+    bound to its arguments with :func:`functools.partial`.  The calls run
+    on a thread pool of at most max_workers threads and their results are
+    returned in the order the calls were given.
+
+    Example usage::
+
+        conf, db_password, leader_settings = hookenv.gather(
+            hookenv.config,
+            functools.partial(hookenv.relation_get, 'password',
+                              rid='shared-db:3', unit='mysql/0'),
+            hookenv.leader_get)
+
+    All calls are allowed to complete; if any of them raised, the exception
+    of the first failed call (in argument order) is re-raised.
+
+    :param calls: Callables to run.
+    :type calls: Callable[[], Any]
+    :param max_workers: Maximum number of concurrent hook tool invocations.
+    :type max_workers: int
+    :returns: The result of each call.
+    :rtype: List[Any]
+    """
+    if not calls:
+        return []
+    with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(calls))) as executor:
+        futures = [executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
+
+
 _atexit = []
 _atstart = []
 
@@ -1637,3 +2009,8 @@ def is_subordinate():
     :rtype: bool
     """
     return metadata().get('subordinate') is True
+
+
+# Opt-in hook profiling, see charmhelpers.core.profiling.
+if os.environ.get('CHARMHELPERS_PROFILE', '').lower() in ('yes', 'true', '1'):
+    profiling.enable()
@@ -19,6 +19,7 @@
 #  Nick Moffitt <nick.moffitt@canonical.com>
 #  Matthew Wedgwood <matthew.wedgwood@canonical.com>
 
+import datetime
 import errno
 import os
 import re
@@ -29,12 +30,14 @@ import random
 import string
 import subprocess
 import hashlib
+import time
 import functools
 import itertools
 
 from contextlib import contextmanager
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, namedtuple
 from .hookenv import log, INFO, DEBUG, local_unit, charm_name
+from . import unitdata
 from .fstab import Fstab
 from charmhelpers.osplatform import get_platform
 
@@ -341,6 +344,95 @@ def service_running(service_name, **kwargs):
         return False
 
 
+ServiceState = namedtuple('ServiceState', [
+    'active_state', 'sub_state', 'active_enter_time', 'main_start_time'])
+ServiceState.__doc__ = """State of a systemd unit, see systemd.unit(5).
+
+:param active_state: eg. 'active', 'inactive', 'failed'
+:param sub_state: eg. 'running', 'exited', 'dead'
+:param active_enter_time: datetime at which the unit last became active,
+                          or None if unknown
+:param main_start_time: datetime at which the main process of the unit was
+                        last started, or None if unknown
+"""
+
+_SYSTEMD_STATE_PROPERTIES = ('ActiveState', 'SubState',
+                             'ActiveEnterTimestamp', 'ExecMainStartTimestamp')
+
+
+def _systemd_timestamp(value):
+    """Parse a systemd timestamp, eg. 'Tue 2021-02-02 13:19:54 UTC'.
+
+    :returns: the datetime, or None if value is empty or not understood (eg.
+              'n/a', or a time zone name unknown to strptime)
+    :rtype: Optional[datetime.datetime]
+    """
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%a %Y-%m-%d %H:%M:%S %Z')
+    except ValueError:
+        return None
+
+
+def services_state(service_names):
+    """Query the state of several systemd services with a single
+    ``systemctl show`` call.
+
+    :param service_names: names of the services
+    :type service_names: List[str]
+    :returns: OrderedDict of service name to ServiceState, in the order of
+              service_names. Unknown services are reported 'inactive'.
+    :rtype: OrderedDict[str, ServiceState]
+    """
+    service_names = list(service_names)
+    states = OrderedDict()
+    if not service_names:
+        return states
+    output = subprocess.check_output(
+        ['systemctl', 'show',
+         '--property={}'.format(','.join(_SYSTEMD_STATE_PROPERTIES))] +
+        service_names, universal_newlines=True)
+    # one block of properties per unit, separated by blank lines, in the
+    # order the units were given.
+    blocks = output.strip('\n').split('\n\n')
+    for name, block in zip(service_names, blocks):
+        properties = dict(line.split('=', 1)
+                          for line in block.splitlines() if '=' in line)
+        states[name] = ServiceState(
+            active_state=properties.get('ActiveState', 'inactive'),
+            sub_state=properties.get('SubState', 'dead'),
+            active_enter_time=_systemd_timestamp(
+                properties.get('ActiveEnterTimestamp')),
+            main_start_time=_systemd_timestamp(
+                properties.get('ExecMainStartTimestamp')))
+    return states
+
+
+def services_running(service_names):
+    """Determine whether several system services are running.
+
+    The systemd services are all queried with a single ``systemctl show``
+    call, the others with service_running().
+
+    :param service_names: names of the services
+    :type service_names: List[str]
+    :returns: a boolean per service, in the order of service_names
+    :rtype: List[bool]
+    """
+    service_names = list(service_names)
+    systemd = [name for name in service_names
+               if init_is_systemd(service_name=name)]
+    try:
+        states = services_state(systemd)
+    except subprocess.CalledProcessError:
+        # eg. an invalid unit name, fall back to one query per service.
+        states = {}
+    return [states[name].active_state in ('active', 'reloading')
+            if name in states else service_running(name)
+            for name in service_names]
+
+
 SYSTEMD_SYSTEM = '/run/systemd/system'
 
 
@@ -679,31 +771,87 @@ def fstab_mount(mountpoint):
     return True
 
 
+HASH_CHUNK_SIZE = 64 * 1024
+# Digest used to detect changes to restart_on_change() files; it is never
+# exposed so it can be chosen purely for speed.
+RESTART_HASH_TYPE = 'blake2b'
+FILE_HASH_KV_PREFIX = 'charmhelpers.host.file-hash.'
+# Files modified this recently are hashed but not fingerprinted, as a second
+# write within the filesystem's timestamp granularity would go unnoticed.
+FILE_HASH_RACY_NS = 2 * 10 ** 9
+
+
 def file_hash(path, hash_type='md5'):
     """Generate a hash checksum of the contents of 'path' or None if not found.
 
+    The file is read in chunks of HASH_CHUNK_SIZE bytes so large files are
+    never held in memory.
+
     :param str hash_type: Any hash alrgorithm supported by :mod:`hashlib`,
-                          such as md5, sha1, sha256, sha512, etc.
+                          such as md5, sha1, sha256, sha512, blake2b, etc.
     """
     if os.path.exists(path):
         h = getattr(hashlib, hash_type)()
         with open(path, 'rb') as source:
-            h.update(source.read())
+            # read() may return less than asked for before EOF, eg. on
+            # network filesystems, so only stop on an empty read.
+            for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+                h.update(chunk)
         return h.hexdigest()
     else:
         return None
 
 
-def path_hash(path):
+def fingerprinted_file_hash(path, hash_type='md5'):
+    """Generate a hash checksum of 'path', skipping unchanged files.
+
+    The stat fingerprint (mtime, ctime, size, inode and device) of each
+    hashed file is stored alongside its checksum in :mod:`unitdata`, and the
+    stored checksum is returned without reading the file while the
+    fingerprint is unchanged.  The fingerprints are persisted with the rest
+    of the unit's kv data when it is flushed.
+
+    :param str path: File to hash.
+    :param str hash_type: Any hash algorithm supported by :mod:`hashlib`.
+    :returns: The checksum, or None if the file does not exist.
+    :rtype: Optional[str]
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return file_hash(path, hash_type)
+    fingerprint = [st.st_mtime_ns, st.st_ctime_ns, st.st_size,
+                   st.st_ino, st.st_dev]
+    db = unitdata.kv()
+    key = FILE_HASH_KV_PREFIX + path
+    record = db.get(key)
+    if (record and record['fingerprint'] == fingerprint and
+            record['hash_type'] == hash_type):
+        return record['checksum']
+    checksum = file_hash(path, hash_type)
+    if time.time_ns() - st.st_mtime_ns > FILE_HASH_RACY_NS:
+        db.set(key, {'fingerprint': fingerprint,
+                     'hash_type': hash_type,
+                     'checksum': checksum})
+    else:
+        db.unset(key)
+    return checksum
+
+
+def path_hash(path, hash_type='md5', fingerprint=False):
     """Generate a hash checksum of all files matching 'path'. Standard
     wildcards like '*' and '?' are supported, see documentation for the 'glob'
     module for more information.
 
+    :param str hash_type: Any hash algorithm supported by :mod:`hashlib`.
+    :param bool fingerprint: Skip hashing files whose stat fingerprint is
+                             unchanged, see :func:`fingerprinted_file_hash`.
     :return: dict: A { filename: hash } dictionary for all matched files.
                    Empty if none found.
     """
+    hash_f = fingerprinted_file_hash if fingerprint else file_hash
     return {
-        filename: file_hash(filename)
+        filename: hash_f(filename, hash_type)
         for filename in glob.iglob(path)
     }
 
@@ -742,11 +890,15 @@ class restart_on_change(object):
        with restart_on_change(restart_map, ...):
            do_stuff_that_might_trigger_a_restart()
            ...
+
+    With fingerprint=True the files are only read when their stat
+    fingerprint changed, see :func:`fingerprinted_file_hash`; this stores a
+    record per file in the unit's kv data (:mod:`unitdata`).
     """
 
     def __init__(self, restart_map, stopstart=False, restart_functions=None,
                  can_restart_now_f=None, post_svc_restart_f=None,
-                 pre_restarts_wait_f=None):
+                 pre_restarts_wait_f=None, fingerprint=False):
         """
         :param restart_map: {file: [service, ...]}
         :type restart_map: Dict[str, List[str,]]
@@ -763,6 +915,9 @@ class restart_on_change(object):
         :type post_svc_restart_f: Callable[[str], None]
         :param pre_restarts_wait_f: A function called before any restarts.
         :type pre_restarts_wait_f: Callable[None, None]
+        :param fingerprint: Skip reading files whose stat fingerprint, kept
+                            in unitdata, is unchanged.
+        :type fingerprint: bool
         """
         self.restart_map = restart_map
         self.stopstart = stopstart
@@ -770,6 +925,7 @@ class restart_on_change(object):
         self.can_restart_now_f = can_restart_now_f
         self.post_svc_restart_f = post_svc_restart_f
         self.pre_restarts_wait_f = pre_restarts_wait_f
+        self.fingerprint = fingerprint
 
     def __call__(self, f):
         """Work like a decorator.
@@ -790,12 +946,14 @@ class restart_on_change(object):
                 restart_functions=self.restart_functions,
                 can_restart_now_f=self.can_restart_now_f,
                 post_svc_restart_f=self.post_svc_restart_f,
-                pre_restarts_wait_f=self.pre_restarts_wait_f)
+                pre_restarts_wait_f=self.pre_restarts_wait_f,
+                fingerprint=self.fingerprint)
         return wrapped_f
 
     def __enter__(self):
         """Enter the runtime context related to this object. """
-        self.checksums = _pre_restart_on_change_helper(self.restart_map)
+        self.checksums = _pre_restart_on_change_helper(
+            self.restart_map, fingerprint=self.fingerprint)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit the runtime context related to this object.
@@ -812,7 +970,8 @@ class restart_on_change(object):
                 restart_functions=self.restart_functions,
                 can_restart_now_f=self.can_restart_now_f,
                 post_svc_restart_f=self.post_svc_restart_f,
-                pre_restarts_wait_f=self.pre_restarts_wait_f)
+                pre_restarts_wait_f=self.pre_restarts_wait_f,
+                fingerprint=self.fingerprint)
         # All is good, so return False; any exceptions will propagate.
         return False
 
@@ -821,7 +980,8 @@ def restart_on_change_helper(lambda_f, restart_map, stopstart=False,
                              restart_functions=None,
                              can_restart_now_f=None,
                              post_svc_restart_f=None,
-                             pre_restarts_wait_f=None):
+                             pre_restarts_wait_f=None,
+                             fingerprint=False):
     """Helper function to perform the restart_on_change function.
 
     This is provided for decorators to restart services if files described
@@ -864,10 +1024,14 @@ def restart_on_change_helper(lambda_f, restart_map, stopstart=False,
     :type post_svc_restart_f: Callable[[str], None]
     :param pre_restarts_wait_f: A function called before any restarts.
     :type pre_restarts_wait_f: Callable[None, None]
+    :param fingerprint: Skip reading files whose stat fingerprint, kept in
+                        unitdata, is unchanged.
+    :type fingerprint: bool
     :returns: result of lambda_f()
     :rtype: ANY
     """
-    checksums = _pre_restart_on_change_helper(restart_map)
+    checksums = _pre_restart_on_change_helper(restart_map,
+                                              fingerprint=fingerprint)
     r = lambda_f()
     _post_restart_on_change_helper(checksums,
                                    restart_map,
@@ -875,19 +1039,23 @@ def restart_on_change_helper(lambda_f, restart_map, stopstart=False,
                                    restart_functions,
                                    can_restart_now_f,
                                    post_svc_restart_f,
-                                   pre_restarts_wait_f)
+                                   pre_restarts_wait_f,
+                                   fingerprint=fingerprint)
     return r
 
 
-def _pre_restart_on_change_helper(restart_map):
+def _pre_restart_on_change_helper(restart_map, fingerprint=False):
     """Take a snapshot of file hashes.
 
     :param restart_map: {file: [service, ...]}
     :type restart_map: Dict[str, List[str,]]
+    :param fingerprint: Use fingerprinted_file_hash.
+    :type fingerprint: bool
     :returns: Dictionary of file paths and the files checksum.
     :rtype: Dict[str, str]
     """
-    return {path: path_hash(path) for path in restart_map}
+    return {path: path_hash(path, RESTART_HASH_TYPE, fingerprint=fingerprint)
+            for path in restart_map}
 
 
 def _post_restart_on_change_helper(checksums,
@@ -896,7 +1064,8 @@ def _post_restart_on_change_helper(checksums,
                                    restart_functions=None,
                                    can_restart_now_f=None,
                                    post_svc_restart_f=None,
-                                   pre_restarts_wait_f=None):
+                                   pre_restarts_wait_f=None,
+                                   fingerprint=False):
     """Check whether files have changed.
 
     :param checksums: Dictionary of file paths and the files checksum.
@@ -916,6 +1085,8 @@ def _post_restart_on_change_helper(checksums,
     :type post_svc_restart_f: Callable[[str], None]
     :param pre_restarts_wait_f: A function called before any restarts.
     :type pre_restarts_wait_f: Callable[None, None]
+    :param fingerprint: Use fingerprinted_file_hash.
+    :type fingerprint: bool
     """
     if restart_functions is None:
         restart_functions = {}
@@ -923,7 +1094,8 @@ def _post_restart_on_change_helper(checksums,
     restarts = []
     # create a list of lists of the services to restart
     for path, services in restart_map.items():
-        if path_hash(path) != checksums[path]:
+        if (path_hash(path, RESTART_HASH_TYPE, fingerprint=fingerprint) !=
+                checksums[path]):
             restarts.append(services)
             for svc in services:
                 changed_files[svc].append(path)
@@ -963,83 +1135,203 @@ def pwgen(length=None):
     return ''.join(random_chars)
 
 
-def is_phy_iface(interface):
-    """Returns True if interface is not virtual, otherwise False."""
-    if interface:
-        sys_net = '/sys/class/net'
-        if os.path.isdir(sys_net):
-            for iface in glob.glob(os.path.join(sys_net, '*')):
-                if '/virtual/' in os.path.realpath(iface):
-                    continue
+SYS_CLASS_NET = '/sys/class/net'
 
-                if interface == os.path.basename(iface):
-                    return True
+# ARPHRD_ETHER, see include/uapi/linux/if_arp.h
+_ARPHRD_ETHER = 1
+
+NetworkInterface = namedtuple('NetworkInterface', [
+    'name', 'ifindex', 'mtu', 'hwaddr', 'virtual', 'bond_master',
+    'is_bond', 'bridge', 'is_bridge', 'lower'])
+NetworkInterface.__doc__ = """A network interface as seen in /sys/class/net.
+
+:param name: name of the interface, eg. 'eth0'
+:param ifindex: kernel index of the interface
+:param mtu: Maximum Transmission Unit, int
+:param hwaddr: MAC address of Ethernet interfaces, '' for the others
+:param virtual: False for interfaces backed by a device, eg. a PCI NIC
+:param bond_master: name of the bond the interface is a slave of, or None
+:param is_bond: True for bond masters
+:param bridge: name of the bridge the interface is a port of, or None
+:param is_bridge: True for Linux bridges
+:param lower: names of the interfaces below this one, eg. for a VLAN
+"""
 
+
+class NetworkInventory(object):
+    """Snapshot of the network interfaces of the host, read from sysfs
+    without running any process.
+
+    Interfaces are read on first use and not refreshed, so create a new
+    inventory to see later changes::
+
+        inventory = NetworkInventory()
+        for nic in inventory:
+            if not nic.virtual:
+                print(nic.name, nic.hwaddr, nic.bond_master)
+        inventory.by_hwaddr('e4:11:5b:ab:a7:3c').name
+
+    :param sys_class_net: path of the sysfs network class directory
+    """
+
+    def __init__(self, sys_class_net=None):
+        self.sys_class_net = sys_class_net or SYS_CLASS_NET
+        try:
+            self._names = set(os.listdir(self.sys_class_net))
+        except OSError:
+            self._names = set()
+        self._interfaces = {}
+        self._by_hwaddr = None
+
+    def _read(self, name, attribute):
+        try:
+            with open(os.path.join(self.sys_class_net, name, attribute)) as f:
+                return f.read().strip()
+        except (IOError, OSError):
+            return ''
+
+    def _link(self, name, link):
+        path = os.path.join(self.sys_class_net, name, link)
+        if os.path.islink(path):
+            return os.path.realpath(path)
+        return None
+
+    def _load(self, name):
+        path = os.path.join(self.sys_class_net, name)
+        bond_master = None
+        master = self._link(name, 'master')
+        if master and os.path.isdir(os.path.join(master, 'bonding')):
+            bond_master = os.path.basename(master)
+        bridge = self._link(name, os.path.join('brport', 'bridge'))
+        hwaddr = ''
+        if self._read(name, 'type') == str(_ARPHRD_ETHER):
+            hwaddr = self._read(name, 'address')
+        try:
+            entries = os.listdir(path)
+        except OSError:
+            entries = []
+        return NetworkInterface(
+            name=name,
+            ifindex=int(self._read(name, 'ifindex') or 0),
+            mtu=int(self._read(name, 'mtu') or 0),
+            hwaddr=hwaddr,
+            virtual='/virtual/' in os.path.realpath(path),
+            bond_master=bond_master,
+            is_bond=os.path.isdir(os.path.join(path, 'bonding')),
+            bridge=os.path.basename(bridge) if bridge else None,
+            is_bridge=os.path.isdir(os.path.join(path, 'bridge')),
+            lower=sorted(entry[len('lower_'):] for entry in entries
+                         if entry.startswith('lower_')))
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __getitem__(self, name):
+        """
+        :returns: the interface called name
+        :rtype: NetworkInterface
+        :raises: KeyError if there is no such interface
+        """
+        if name not in self._names:
+            raise KeyError(name)
+        if name not in self._interfaces:
+            self._interfaces[name] = self._load(name)
+        return self._interfaces[name]
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        """Iterate over the interfaces, in ifindex order like ``ip link``."""
+        return iter(sorted((self[name] for name in self._names),
+                           key=lambda nic: (nic.ifindex, nic.name)))
+
+    def __len__(self):
+        return len(self._names)
+
+    def by_hwaddr(self, hwaddr):
+        """
+        :returns: the interface with MAC address hwaddr. A bond and its
+                  slaves may share an address, the bond is returned then.
+        :rtype: NetworkInterface
+        :raises: KeyError if there is no such interface
+        """
+        if self._by_hwaddr is None:
+            self._by_hwaddr = {}
+            for nic in self:
+                if nic.hwaddr and (nic.hwaddr not in self._by_hwaddr or
+                                   nic.is_bond):
+                    self._by_hwaddr[nic.hwaddr] = nic
+        return self._by_hwaddr[hwaddr.lower()]
+
+
+def _inventory(inventory):
+    return inventory if inventory is not None else NetworkInventory()
+
+
+def is_phy_iface(interface, inventory=None):
+    """Returns True if interface is not virtual, otherwise False.
+
+    :param inventory: NetworkInventory to use, to share one between calls
+    """
+    if interface:
+        nic = _inventory(inventory).get(interface)
+        return nic is not None and not nic.virtual
     return False
 
 
-def get_bond_master(interface):
+def get_bond_master(interface, inventory=None):
     """Returns bond master if interface is bond slave otherwise None.
 
     NOTE: the provided interface is expected to be physical
+
+    :param inventory: NetworkInventory to use, to share one between calls
     """
     if interface:
-        iface_path = '/sys/class/net/%s' % (interface)
-        if os.path.exists(iface_path):
-            if '/virtual/' in os.path.realpath(iface_path):
-                return None
-
-            master = os.path.join(iface_path, 'master')
-            if os.path.exists(master):
-                master = os.path.realpath(master)
-                # make sure it is a bond master
-                if os.path.exists(os.path.join(master, 'bonding')):
-                    return os.path.basename(master)
-
+        nic = _inventory(inventory).get(interface)
+        if nic is not None and not nic.virtual:
+            return nic.bond_master
     return None
 
 
-def list_nics(nic_type=None):
-    """Return a list of nics of given type(s)"""
+def list_nics(nic_type=None, inventory=None):
+    """Return a list of nics of given type(s)
+
+    :param nic_type: type, or list of types, of the nics to list, eg. 'eth'
+                     or ['eth', 'bond']: the nics with an IPv4 address whose
+                     label starts with one of them, as listed by
+                     ``ip addr show label <type>*``. All nics are listed,
+                     from sysfs, by default.
+    :param inventory: NetworkInventory to use, to share one between calls
+    """
     if isinstance(nic_type, str):
         int_types = [nic_type]
     else:
         int_types = nic_type
 
+    if not nic_type:
+        return [nic.name for nic in _inventory(inventory)]
     interfaces = []
-    if nic_type:
-        for int_type in int_types:
-            cmd = ['ip', 'addr', 'show', 'label', int_type + '*']
-            ip_output = subprocess.check_output(
-                cmd).decode('UTF-8', errors='replace')
-            ip_output = ip_output.split('\n')
-            ip_output = (line for line in ip_output if line)
-            for line in ip_output:
-                if line.split()[1].startswith(int_type):
-                    matched = re.search('.*: (' + int_type +
-                                        r'[0-9]+\.[0-9]+)@.*', line)
-                    if matched:
-                        iface = matched.groups()[0]
-                    else:
-                        iface = line.split()[1].replace(":", "")
-
-                    if iface not in interfaces:
-                        interfaces.append(iface)
-    else:
-        cmd = ['ip', 'a']
+    for int_type in int_types:
+        cmd = ['ip', 'addr', 'show', 'label', int_type + '*']
         ip_output = subprocess.check_output(
-            cmd).decode('UTF-8', errors='replace').split('\n')
-        ip_output = (line.strip() for line in ip_output if line)
-
-        key = re.compile(r'^[0-9]+:\s+(.+):')
+            cmd).decode('UTF-8', errors='replace')
+        ip_output = ip_output.split('\n')
+        ip_output = (line for line in ip_output if line)
         for line in ip_output:
-            matched = re.search(key, line)
-            if matched:
-                iface = matched.group(1)
-                iface = iface.partition("@")[0]
+            if line.split()[1].startswith(int_type):
+                matched = re.search('.*: (' + int_type +
+                                    r'[0-9]+\.[0-9]+)@.*', line)
+                if matched:
+                    iface = matched.groups()[0]
+                else:
+                    iface = line.split()[1].replace(":", "")
+
                 if iface not in interfaces:
                     interfaces.append(iface)
-
     return interfaces
 
 
@@ -1049,28 +1341,22 @@ def set_nic_mtu(nic, mtu):
     subprocess.check_call(cmd)
 
 
-def get_nic_mtu(nic):
-    """Return the Maximum Transmission Unit (MTU) for a network interface."""
-    cmd = ['ip', 'addr', 'show', nic]
-    ip_output = subprocess.check_output(
-        cmd).decode('UTF-8', errors='replace').split('\n')
-    mtu = ""
-    for line in ip_output:
-        words = line.split()
-        if 'mtu' in words:
-            mtu = words[words.index("mtu") + 1]
-    return mtu
-
-
-def get_nic_hwaddr(nic):
-    """Return the Media Access Control (MAC) for a network interface."""
-    cmd = ['ip', '-o', '-0', 'addr', 'show', nic]
-    ip_output = subprocess.check_output(cmd).decode('UTF-8', errors='replace')
-    hwaddr = ""
-    words = ip_output.split()
-    if 'link/ether' in words:
-        hwaddr = words[words.index('link/ether') + 1]
-    return hwaddr
+def get_nic_mtu(nic, inventory=None):
+    """Return the Maximum Transmission Unit (MTU) for a network interface.
+
+    :param inventory: NetworkInventory to use, to share one between calls
+    """
+    nic = _inventory(inventory).get(nic)
+    return str(nic.mtu) if nic is not None else ""
+
+
+def get_nic_hwaddr(nic, inventory=None):
+    """Return the Media Access Control (MAC) for a network interface.
+
+    :param inventory: NetworkInventory to use, to share one between calls
+    """
+    nic = _inventory(inventory).get(nic)
+    return nic.hwaddr if nic is not None else ""
 
 
 @contextmanager
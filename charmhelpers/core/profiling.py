@@ -0,0 +1,256 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Opt-in profiling of where a hook spends its time.
+
+Once enabled, the profiler records:
+
+- every subprocess started through the subprocess module, with its argv,
+  duration and exit code;
+- every call of a ``hookenv.cached`` function which missed the cache;
+- every context generator evaluated and every template rendered by the
+  templating helpers.
+
+Enable it for a hook by setting ``CHARMHELPERS_PROFILE=1`` in the
+environment, or from charm code::
+
+    from charmhelpers.core import hookenv, profiling
+
+    hookenv.atstart(profiling.enable, trace_file='/tmp/hook-trace.json')
+
+A summary is sent to juju-log when the hook completes (see
+``hookenv.atexit``), and if a trace file is given, via ``trace_file`` or
+``CHARMHELPERS_PROFILE_TRACE``, all the recorded events are written to it
+in the Chrome trace event format, viewable in chrome://tracing or
+https://ui.perfetto.dev.
+
+This module does not import the rest of charmhelpers until it is enabled,
+so that hookenv can use it.
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+Event = namedtuple('Event', ['category', 'name', 'start', 'duration',
+                             'thread', 'args'])
+
+# Number of names per category listed in the summary.
+SUMMARY_TOP = 10
+
+_profiler = None
+_original_popen = subprocess.Popen
+
+
+class Profiler(object):
+    """Collects timed events, from any thread."""
+
+    def __init__(self):
+        self.events = []
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, category, name, start, duration, **args):
+        """
+        Record an event.
+
+        :param category: kind of event, eg. 'subprocess'
+        :param name: name of the event, eg. the command run
+        :param start: time.monotonic() at the start of the event
+        :param duration: duration of the event, in seconds
+        :param args: any extra details to include in the trace
+        """
+        event = Event(category, name, start - self.started, duration,
+                      threading.get_ident(), args)
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, category, name, **args):
+        """Record the time spent in the block as an event."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(category, name, start, time.monotonic() - start,
+                        **args)
+
+    def summary(self, top=SUMMARY_TOP):
+        """
+        Summarise the recorded events.
+
+        :param top: number of names to list per category
+        :returns: str with the call count and total time per category and
+            for its most expensive names.
+        """
+        totals = {}
+        for event in list(self.events):
+            names = totals.setdefault(event.category, {})
+            count, duration = names.get(event.name, (0, 0.0))
+            names[event.name] = (count + 1, duration + event.duration)
+        lines = ['Hook profile: {:.3f}s wall time'.format(
+            time.monotonic() - self.started)]
+        for category in sorted(totals):
+            names = totals[category]
+            lines.append('{}: {} calls, {:.3f}s'.format(
+                category,
+                sum(count for count, _ in names.values()),
+                sum(duration for _, duration in names.values())))
+            ranked = sorted(names.items(), key=lambda item: -item[1][1])
+            for name, (count, duration) in ranked[:top]:
+                lines.append('    {}: {} calls, {:.3f}s'.format(
+                    name, count, duration))
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        """
+        :returns: the recorded events as a Chrome trace event document.
+        """
+        pid = os.getpid()
+        return {
+            'traceEvents': [{
+                'name': event.name,
+                'cat': event.category,
+                'ph': 'X',
+                'ts': int(event.start * 1e6),
+                'dur': int(event.duration * 1e6),
+                'pid': pid,
+                'tid': event.thread,
+                'args': event.args,
+            } for event in list(self.events)],
+            'displayTimeUnit': 'ms',
+        }
+
+    def write_trace(self, path):
+        """Write the recorded events to path as a Chrome trace."""
+        with open(path, 'w') as f:
+            json.dump(self.trace_events(), f, default=str)
+
+
+class _ProfiledPopen(_original_popen):
+    """subprocess.Popen recording each process with the active profiler."""
+
+    def __init__(self, args, *popenargs, **kwargs):
+        self._profile_args = args
+        self._profile_start = time.monotonic()
+        self._profile_done = False
+        try:
+            super(_ProfiledPopen, self).__init__(args, *popenargs, **kwargs)
+        except OSError as e:
+            self._profile_record(error=str(e))
+            raise
+
+    def _profile_record(self, **details):
+        if self._profile_done:
+            return
+        self._profile_done = True
+        profiler = _profiler
+        if profiler is None:
+            return
+        args = self._profile_args
+        if isinstance(args, (str, bytes)):
+            argv = [args]
+        else:
+            argv = [str(arg) for arg in args]
+        name = os.path.basename(argv[0].split()[0]) if argv[0] else ''
+        profiler.record('subprocess', name, self._profile_start,
+                        time.monotonic() - self._profile_start,
+                        argv=argv, **details)
+
+    def poll(self):
+        returncode = super(_ProfiledPopen, self).poll()
+        if returncode is not None:
+            self._profile_record(returncode=returncode)
+        return returncode
+
+    def wait(self, timeout=None):
+        returncode = super(_ProfiledPopen, self).wait(timeout=timeout)
+        self._profile_record(returncode=returncode)
+        return returncode
+
+
+def active():
+    """:returns: the running Profiler, or None if profiling is disabled."""
+    return _profiler
+
+
+@contextmanager
+def span(category, name, **args):
+    """
+    Record the time spent in the block if profiling is enabled::
+
+        with profiling.span('template', '/etc/nova/nova.conf'):
+            render()
+    """
+    profiler = _profiler
+    if profiler is None:
+        yield
+    else:
+        with profiler.span(category, name, **args):
+            yield
+
+
+def enable(trace_file=None, report_atexit=True):
+    """
+    Start profiling, and report the results when the hook completes.
+
+    :param trace_file: path to write a Chrome trace to, defaults to
+        $CHARMHELPERS_PROFILE_TRACE
+    :param report_atexit: if False nothing is reported, and the caller
+        should inspect the returned Profiler and call disable().
+    :returns: the Profiler
+    """
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    _profiler = Profiler()
+    subprocess.Popen = _ProfiledPopen
+    if report_atexit:
+        from charmhelpers.core import hookenv
+        hookenv.atexit(
+            report, _profiler,
+            trace_file or os.environ.get('CHARMHELPERS_PROFILE_TRACE'))
+    return _profiler
+
+
+def disable():
+    """Stop profiling; nothing is reported."""
+    global _profiler
+    _profiler = None
+    if subprocess.Popen is _ProfiledPopen:
+        subprocess.Popen = _original_popen
+
+
+def report(profiler, trace_file=None):
+    """
+    Log a summary of profiler's events to juju-log and optionally write a
+    trace file.
+    """
+    from charmhelpers.core import hookenv
+    # stop recording first, as juju-log is a subprocess too.
+    if profiler is _profiler:
+        disable()
+    hookenv.log(profiler.summary(), level=hookenv.INFO)
+    if trace_file:
+        try:
+            profiler.write_trace(trace_file)
+        except (IOError, OSError) as e:
+            hookenv.log('Unable to write profile trace to {}: {}'.format(
+                trace_file, e), level=hookenv.WARNING)
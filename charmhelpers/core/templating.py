@@ -12,10 +12,81 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
 import os
 
 from charmhelpers.core import host
 from charmhelpers.core import hookenv
+from charmhelpers.core import profiling
+
+# Directory in the charm holding compiled templates, see bytecode_cache().
+BYTECODE_CACHE_DIR = '.jinja2-bytecode'
+_bytecode_caches = {}
+# jinja2.Environment arguments changing the code templates compile to.
+_COMPILE_OPTIONS = (
+    'block_start_string', 'block_end_string', 'variable_start_string',
+    'variable_end_string', 'comment_start_string', 'comment_end_string',
+    'line_statement_prefix', 'line_comment_prefix', 'trim_blocks',
+    'lstrip_blocks', 'newline_sequence', 'keep_trailing_newline',
+    'extensions', 'optimized', 'autoescape', 'finalize', 'enable_async',
+)
+
+
+def bytecode_cache(cache_dir=None, env_args=None):
+    """
+    Return a jinja2 bytecode cache which persists compiled templates across
+    hooks.
+
+    Jinja2 compiles every template to Python code before rendering it, which
+    is most of the cost of rendering large templates.  All the jinja2 based
+    renderers in charmhelpers share this cache, stored below
+    ``$CHARM_DIR/.jinja2-bytecode``.  Entries are keyed by template name and
+    path and are checked against the checksum of the template source, so
+    edited or upgraded templates are compiled again.
+
+    The key does not cover the Environment options, so environments created
+    with options changing the compiled code (delimiters, trim_blocks,
+    extensions, ...) must pass them as env_args to get a cache of their own.
+
+    The compiled code is not checked against the jinja2 version either: clear
+    the cache directory when upgrading jinja2 in the charm.
+
+    :param cache_dir: directory to store the compiled templates in, defaults
+        to BYTECODE_CACHE_DIR in the charm directory.
+    :param env_args: keyword arguments the jinja2.Environment is created with.
+    :returns: jinja2.FileSystemBytecodeCache, or None when not running in a
+        charm, if the directory cannot be created or if env_args cannot be
+        part of a cache key (e.g. a finalize function).
+    """
+    options = {name: value for name, value in (env_args or {}).items()
+               if name in _COMPILE_OPTIONS}
+    if options:
+        try:
+            options_key = json.dumps(options, sort_keys=True)
+        except TypeError:
+            return None
+    if cache_dir is None:
+        charm_dir = hookenv.charm_dir()
+        if not charm_dir:
+            return None
+        cache_dir = os.path.join(charm_dir, BYTECODE_CACHE_DIR)
+    if options:
+        cache_dir = os.path.join(cache_dir, hashlib.sha256(
+            options_key.encode('utf-8')).hexdigest()[:16])
+    try:
+        return _bytecode_caches[cache_dir]
+    except KeyError:
+        pass
+    try:
+        from jinja2 import FileSystemBytecodeCache
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    except (ImportError, OSError) as e:
+        hookenv.log('Not caching compiled templates in {}: {}'
+                    .format(cache_dir, e), level=hookenv.DEBUG)
+        return None
+    cache = _bytecode_caches[cache_dir] = FileSystemBytecodeCache(cache_dir)
+    return cache
 
 
 def render(source, target, context, owner='root', group='root',
@@ -59,11 +130,13 @@ def render(source, target, context, owner='root', group='root',
         from jinja2 import FileSystemLoader, Environment, exceptions
 
     if template_loader:
-        template_env = Environment(loader=template_loader)
+        template_env = Environment(loader=template_loader,
+                                   bytecode_cache=bytecode_cache())
     else:
         if templates_dir is None:
             templates_dir = os.path.join(hookenv.charm_dir(), 'templates')
-        template_env = Environment(loader=FileSystemLoader(templates_dir))
+        template_env = Environment(loader=FileSystemLoader(templates_dir),
+                                   bytecode_cache=bytecode_cache())
 
     # load from a string if provided explicitly
     if config_template is not None:
@@ -77,7 +150,8 @@ def render(source, target, context, owner='root', group='root',
                         (source, templates_dir),
                         level=hookenv.ERROR)
             raise e
-    content = template.render(context)
+    with profiling.span('template', target or source):
+        content = template.render(context)
     if target is not None:
         target_dir = os.path.dirname(target)
         if not os.path.exists(target_dir):
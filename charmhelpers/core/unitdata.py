@@ -148,6 +148,7 @@ associated to the hookname.
 
 import collections
 import contextlib
+import copy
 import datetime
 import itertools
 import json
@@ -171,8 +172,31 @@ class Storage(object):
     Note: to facilitate unit testing, ':memory:' can be passed as the
     path parameter which causes sqlite3 to only build the db in memory.
     This should only be used for testing purposes.
+
+    Passing wal=True (or setting UNIT_STATE_DB_WAL=yes in the environment)
+    switches the database to write-ahead logging with synchronous=NORMAL,
+    which makes commits considerably cheaper at the cost of possibly
+    losing the last transaction on power loss.  Note that sqlite persists
+    the WAL journal mode in the database file itself.
+
+    Passing cache=True (or setting UNIT_STATE_DB_CACHE=yes) keeps decoded
+    values read with :meth:`get` in memory, so repeated reads of the same
+    key do not query sqlite.  The cache is updated by writes through this
+    object and dropped on rollback; it is not suitable if other processes
+    write to the database concurrently.
+
+    :attr:`stats` counts the cache hits and misses.  With stats=True, the
+    default when the cache is enabled, it also counts the sqlite statements
+    run; this installs a trace callback on the connection, which is called
+    for every statement.
     """
-    def __init__(self, path=None, keep_revisions=False):
+
+    # Keep well below SQLITE_MAX_VARIABLE_NUMBER, which is 999 on older
+    # sqlite releases.
+    MAX_SQL_VARIABLES = 500
+
+    def __init__(self, path=None, keep_revisions=False, wal=None,
+                 cache=None, stats=None):
         self.db_path = path
         self.keep_revisions = keep_revisions
         if path is None:
@@ -184,8 +208,21 @@ class Storage(object):
         if self.db_path != ':memory:':
             with open(self.db_path, 'a') as f:
                 os.fchmod(f.fileno(), 0o600)
+        self.stats = collections.Counter()
         self.conn = sqlite3.connect('%s' % self.db_path)
         self.cursor = self.conn.cursor()
+        if cache is None:
+            cache = _env_flag('UNIT_STATE_DB_CACHE')
+        self._cache = {} if cache else None
+        if stats is None:
+            stats = bool(cache)
+        if stats:
+            self.conn.set_trace_callback(self._count_statement)
+        if wal is None:
+            wal = _env_flag('UNIT_STATE_DB_WAL')
+        if wal and self.db_path != ':memory:':
+            self.cursor.execute('pragma journal_mode=wal')
+            self.cursor.execute('pragma synchronous=normal')
         self.revision = None
         self._closed = False
         self._init()
@@ -198,14 +235,40 @@ class Storage(object):
         self.conn.close()
         self._closed = True
 
+    def _count_statement(self, statement):
+        self.stats['statements'] += 1
+
+    def _uncache(self, keys=None, prefix=None):
+        if self._cache is None:
+            return
+        if keys is None and prefix is None:
+            self._cache.clear()
+        for key in keys or ():
+            self._cache.pop(key, None)
+        if prefix is not None:
+            for key in [k for k in self._cache if k.startswith(prefix)]:
+                del self._cache[key]
+
     def get(self, key, default=None, record=False):
-        self.cursor.execute('select data from kv where key=?', [key])
-        result = self.cursor.fetchone()
-        if not result:
-            return default
+        if self._cache is not None and key in self._cache:
+            self.stats['cache_hits'] += 1
+            value = self._cache[key]
+            if value is _MISSING:
+                return default
+            value = _copy_value(value)
+        else:
+            self.cursor.execute('select data from kv where key=?', [key])
+            result = self.cursor.fetchone()
+            if self._cache is not None:
+                self.stats['cache_misses'] += 1
+                self._cache[key] = (json.loads(result[0]) if result
+                                    else _MISSING)
+            if not result:
+                return default
+            value = json.loads(result[0])
         if record:
-            return Record(json.loads(result[0]))
-        return json.loads(result[0])
+            return Record(value)
+        return value
 
     def getrange(self, key_prefix, strip=False):
         """
@@ -217,32 +280,75 @@ class Storage(object):
             names in the returned dict
         :return dict: A (possibly empty) dict of key-value mappings
         """
-        self.cursor.execute("select key, data from kv where key like ?",
-                            ['%s%%' % key_prefix])
-        result = self.cursor.fetchall()
+        return dict(self.iterrange(key_prefix, strip=strip))
 
-        if not result:
-            return {}
-        if not strip:
-            key_prefix = ''
-        return dict([
-            (k[len(key_prefix):], json.loads(v)) for k, v in result])
+    def iterrange(self, key_prefix, strip=False):
+        """
+        Iterate over the keys starting with a common prefix, in key order.
+
+        Rows are fetched and decoded as the iterator is consumed, so large
+        ranges are never held in memory at once.
+
+        :param str key_prefix: Common prefix among all keys
+        :param bool strip: Optionally strip the common prefix from the key
+            names
+        :return: Iterator of (key, value) tuples
+        """
+        where, params = _prefix_bounds(key_prefix)
+        # Use a dedicated cursor so that other operations can run while the
+        # range is being consumed.
+        cursor = self.conn.execute(
+            'select key, data from kv%s order by key' % where, params)
+        offset = len(key_prefix) if strip else 0
+        for k, v in cursor:
+            yield k[offset:], json.loads(v)
+
+    def _select(self, keys):
+        """Fetch the serialized data of many keys, in batches.
+
+        :param list keys: Keys to fetch
+        :return dict: Mapping of the keys found to their serialized data
+        """
+        found = {}
+        for i in range(0, len(keys), self.MAX_SQL_VARIABLES):
+            batch = keys[i:i + self.MAX_SQL_VARIABLES]
+            self.cursor.execute(
+                'select key, data from kv where key in (%s)' %
+                ','.join(['?'] * len(batch)), batch)
+            found.update(self.cursor.fetchall())
+        return found
 
     def update(self, mapping, prefix=""):
         """
         Set the values of multiple keys at once.
 
+        As with :meth:`set`, keys whose value is unchanged are skipped; the
+        remaining keys are written with a single batched statement.
+
         :param dict mapping: Mapping of keys to values
         :param str prefix: Optional prefix to apply to all keys in `mapping`
             before setting
         """
-        for k, v in mapping.items():
-            self.set("%s%s" % (prefix, k), v)
+        items = [("%s%s" % (prefix, k), json.dumps(v))
+                 for k, v in mapping.items()]
+        current = self._select([k for k, _ in items])
+        changed = [(k, data) for k, data in items if current.get(k) != data]
+        if not changed:
+            return
+        self._uncache(keys=[k for k, _ in changed])
+        self.cursor.executemany(
+            'insert or replace into kv (key, data) values (?, ?)', changed)
+        if self.keep_revisions and self.revision:
+            self.cursor.executemany(
+                '''insert or replace into kv_revisions (
+                key, revision, data) values (?, ?, ?)''',
+                [(k, self.revision, data) for k, data in changed])
 
     def unset(self, key):
         """
         Remove a key from the database entirely.
         """
+        self._uncache(keys=[key])
         self.cursor.execute('delete from kv where key=?', [key])
         if self.keep_revisions and self.revision and self.cursor.rowcount:
             self.cursor.execute(
@@ -260,14 +366,18 @@ class Storage(object):
         """
         if keys is not None:
             keys = ['%s%s' % (prefix, key) for key in keys]
-            self.cursor.execute('delete from kv where key in (%s)' % ','.join(['?'] * len(keys)), keys)
+            self._uncache(keys=keys)
+            self.cursor.executemany('delete from kv where key=?',
+                                    [(key,) for key in keys])
             if self.keep_revisions and self.revision and self.cursor.rowcount:
-                self.cursor.execute(
-                    'insert into kv_revisions values %s' % ','.join(['(?, ?, ?)'] * len(keys)),
-                    list(itertools.chain.from_iterable((key, self.revision, json.dumps('DELETED')) for key in keys)))
+                deleted = json.dumps('DELETED')
+                self.cursor.executemany(
+                    'insert or replace into kv_revisions values (?, ?, ?)',
+                    [(key, self.revision, deleted) for key in keys])
         else:
-            self.cursor.execute('delete from kv where key like ?',
-                                ['%s%%' % prefix])
+            self._uncache(prefix=prefix)
+            where, params = _prefix_bounds(prefix)
+            self.cursor.execute('delete from kv%s' % where, params)
             if self.keep_revisions and self.revision and self.cursor.rowcount:
                 self.cursor.execute(
                     'insert into kv_revisions values (?, ?, ?)',
@@ -290,6 +400,7 @@ class Storage(object):
             if exists[0] == serialized:
                 return value
 
+        self._uncache(keys=[key])
         if not exists:
             self.cursor.execute(
                 'insert into kv (key, data) values (?, ?)',
@@ -381,6 +492,7 @@ class Storage(object):
             return
         else:
             self.conn.rollback()
+            self._uncache()
 
     def _init(self):
         self.cursor.execute('''
@@ -412,10 +524,79 @@ class Storage(object):
                  hooks h
             where kv.key=?
              and kv.revision = h.version
+            order by kv.revision
             ''', [key])
+        rows = self.cursor.fetchall()
+        values = _decode_revisions([row[2] for row in rows])
+        rows = [row[:2] + (value,) + row[3:]
+                for row, value in zip(rows, values)]
         if deserialize is False:
-            return self.cursor.fetchall()
-        return map(_parse_history, self.cursor.fetchall())
+            return rows
+        return map(_parse_history, rows)
+
+    def compact(self, keep=None, max_age=None, delta=True, vacuum=False):
+        """Apply a retention policy to the revision history and shrink it.
+
+        Revisions beyond the ``keep`` most recent of each key, and those
+        recorded by hooks older than ``max_age``, are removed.  When
+        ``delta`` is set, the remaining revisions of dict values are stored
+        as the difference from the previous revision of the same key
+        whenever that is smaller; :meth:`gethistory` transparently restores
+        the full values.
+
+        :param int keep: Number of revisions to keep per key, None for all
+        :param datetime.timedelta max_age: Drop revisions older than this
+        :param bool delta: Delta-encode dict revisions
+        :param bool vacuum: Commit and VACUUM the database afterwards, to
+            return the freed space to the filesystem.  Note that this
+            commits any pending changes.
+        :return int: The number of revisions removed
+        """
+        cutoff = None
+        if max_age is not None:
+            cutoff = (datetime.datetime.utcnow() - max_age).isoformat()
+        rows = self.conn.execute('''
+            select kv.key, kv.revision, kv.data, h.date
+            from kv_revisions kv
+            left join hooks h on kv.revision = h.version
+            order by kv.key, kv.revision''')
+        removed = []
+        rewritten = []
+        for key, revisions in itertools.groupby(rows, lambda row: row[0]):
+            revisions = list(revisions)
+            values = _decode_revisions([r[2] for r in revisions])
+            kept = range(len(revisions))
+            if keep is not None:
+                kept = kept[max(0, len(kept) - keep):] if keep else []
+            if cutoff is not None:
+                kept = [i for i in kept
+                        if revisions[i][3] is None or revisions[i][3] >= cutoff]
+            kept = set(kept)
+            previous = None
+            for i, (_, revision, data, _) in enumerate(revisions):
+                if i not in kept:
+                    removed.append((key, revision))
+                    continue
+                encoded = values[i]
+                if delta and previous is not None:
+                    encoded = _encode_delta(previous, values[i])
+                if encoded != data:
+                    rewritten.append((encoded, key, revision))
+                previous = values[i]
+        self.cursor.executemany(
+            'delete from kv_revisions where key=? and revision=?', removed)
+        self.cursor.executemany(
+            'update kv_revisions set data=? where key=? and revision=?',
+            rewritten)
+        if cutoff is not None:
+            self.cursor.execute(
+                '''delete from hooks where date < ?
+                and version not in (select revision from kv_revisions)''',
+                [cutoff])
+        if vacuum:
+            self.conn.commit()
+            self.conn.execute('vacuum')
+        return len(removed)
 
     def debug(self, fh=sys.stderr):
         self.cursor.execute('select * from kv')
@@ -424,6 +605,77 @@ class Storage(object):
         pprint.pprint(self.cursor.fetchall(), stream=fh)
 
 
+_MISSING = object()
+# Revision data starting with this character is a delta against the
+# previous revision; JSON text never starts with it.
+_DELTA_MARK = '~'
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').lower() in ('yes', 'true', '1')
+
+
+def _copy_value(value):
+    """Copy a cached value so callers cannot mutate the cache."""
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    return copy.deepcopy(value)
+
+
+def _prefix_bounds(prefix):
+    """Build a where clause matching the keys starting with prefix.
+
+    Unlike ``key like 'prefix%'``, the half-open range ``key >= prefix and
+    key < successor`` can be answered from the primary key index, and does
+    not treat ``_`` and ``%`` in the prefix as wildcards.
+
+    :param str prefix: Common prefix of the keys
+    :return: (where clause, parameters) tuple
+    """
+    # The successor is the smallest string greater than every string
+    # starting with prefix: drop trailing maximal characters and increment
+    # the last remaining one.
+    successor = prefix.rstrip(chr(sys.maxunicode))
+    if not successor:
+        if not prefix:
+            return '', []
+        return ' where key >= ?', [prefix]
+    last = ord(successor[-1]) + 1
+    if 0xD800 <= last <= 0xDFFF:
+        # Surrogates cannot be encoded; skip to the next valid character.
+        last = 0xE000
+    successor = successor[:-1] + chr(last)
+    return ' where key >= ? and key < ?', [prefix, successor]
+
+
+def _encode_delta(previous, current):
+    """Encode serialized value current relative to previous, if smaller."""
+    old, new = json.loads(previous), json.loads(current)
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return current
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    encoded = _DELTA_MARK + json.dumps([changed, removed])
+    return encoded if len(encoded) < len(current) else current
+
+
+def _decode_revisions(revisions):
+    """Restore the full serialized values of a key's revisions, in order."""
+    values = []
+    previous = None
+    for data in revisions:
+        if data.startswith(_DELTA_MARK) and previous is not None:
+            value = json.loads(previous)
+            changed, removed = json.loads(data[1:])
+            value.update(changed)
+            for k in removed:
+                value.pop(k, None)
+            data = json.dumps(value)
+        values.append(data)
+        previous = data
+    return values
+
+
 def _parse_history(d):
     return (d[0], d[1], json.loads(d[2]), d[3],
             datetime.datetime.strptime(d[-1], "%Y-%m-%dT%H:%M:%S.%f"))
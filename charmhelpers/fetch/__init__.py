@@ -13,6 +13,9 @@
 # limitations under the License.
 
 import importlib
+import sys
+
+from charmhelpers import lazy_attributes
 from charmhelpers.osplatform import get_platform
 from yaml import safe_load
 from charmhelpers.core.hookenv import (
@@ -77,35 +80,51 @@ class BaseFetchHandler(object):
 
 __platform__ = get_platform()
 module = "charmhelpers.fetch.%s" % __platform__
-fetch = importlib.import_module(module)
 
-filter_installed_packages = fetch.filter_installed_packages
-filter_missing_packages = fetch.filter_missing_packages
-install = fetch.apt_install
-upgrade = fetch.apt_upgrade
-update = _fetch_update = fetch.apt_update
-purge = fetch.apt_purge
-add_source = fetch.add_source
+# The platform module and its helpers are only imported when first used,
+# as they pull in most of charmhelpers.core.
+_PLATFORM_ATTRIBUTES = {
+    'filter_installed_packages': 'filter_installed_packages',
+    'filter_missing_packages': 'filter_missing_packages',
+    'install': 'apt_install',
+    'upgrade': 'apt_upgrade',
+    'update': 'apt_update',
+    '_fetch_update': 'apt_update',
+    'purge': 'apt_purge',
+    'add_source': 'add_source',
+}
 
 if __platform__ == "ubuntu":
-    apt_cache = fetch.apt_cache
-    apt_install = fetch.apt_install
-    apt_update = fetch.apt_update
-    apt_upgrade = fetch.apt_upgrade
-    apt_purge = fetch.apt_purge
-    apt_autoremove = fetch.apt_autoremove
-    apt_mark = fetch.apt_mark
-    apt_hold = fetch.apt_hold
-    apt_unhold = fetch.apt_unhold
-    import_key = fetch.import_key
-    get_upstream_version = fetch.get_upstream_version
-    apt_pkg = fetch.ubuntu_apt_pkg
-    get_apt_dpkg_env = fetch.get_apt_dpkg_env
-    get_installed_version = fetch.get_installed_version
-    OPENSTACK_RELEASES = fetch.OPENSTACK_RELEASES
-    UBUNTU_OPENSTACK_RELEASE = fetch.UBUNTU_OPENSTACK_RELEASE
+    _PLATFORM_ATTRIBUTES.update({
+        'apt_cache': 'apt_cache',
+        'apt_install': 'apt_install',
+        'apt_update': 'apt_update',
+        'apt_upgrade': 'apt_upgrade',
+        'apt_purge': 'apt_purge',
+        'apt_autoremove': 'apt_autoremove',
+        'apt_mark': 'apt_mark',
+        'apt_hold': 'apt_hold',
+        'apt_unhold': 'apt_unhold',
+        'import_key': 'import_key',
+        'get_upstream_version': 'get_upstream_version',
+        'apt_pkg': 'ubuntu_apt_pkg',
+        'get_apt_dpkg_env': 'get_apt_dpkg_env',
+        'get_installed_version': 'get_installed_version',
+        'OPENSTACK_RELEASES': 'OPENSTACK_RELEASES',
+        'UBUNTU_OPENSTACK_RELEASE': 'UBUNTU_OPENSTACK_RELEASE',
+    })
 elif __platform__ == "centos":
-    yum_search = fetch.yum_search
+    _PLATFORM_ATTRIBUTES['yum_search'] = 'yum_search'
+
+_lazy_attributes = {name: '{}:{}'.format(module, attribute)
+                    for name, attribute in _PLATFORM_ATTRIBUTES.items()}
+_lazy_attributes['fetch'] = module
+__getattr__ = lazy_attributes(__name__, _lazy_attributes)
+
+
+def _platform(name):
+    """Look up name on this module, so that patches of it are honoured."""
+    return getattr(sys.modules[__name__], name)
 
 
 def configure_sources(update=False,
@@ -133,6 +152,7 @@ def configure_sources(update=False,
     if isinstance(sources, str):
         sources = [sources]
 
+    add_source = _platform('add_source')
     if keys is None:
         for source in sources:
             add_source(source, None)
@@ -146,7 +166,7 @@ def configure_sources(update=False,
         for source, key in zip(sources, keys):
             add_source(source, key)
     if update:
-        _fetch_update(fatal=True)
+        _platform('_fetch_update')(fatal=True)
 
 
 def install_remote(source, *args, **kwargs):
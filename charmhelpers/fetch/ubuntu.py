@@ -369,6 +369,7 @@ CMD_RETRY_COUNT = 10  # Retry a failing fatal command X times.
 def filter_installed_packages(packages):
     """Return a list of packages that require installation."""
     cache = apt_cache()
+    cache.prefetch(packages)
     _pkgs = []
     for package in packages:
         try:
@@ -1041,16 +1042,20 @@ def _run_apt_command(cmd, fatal=False, quiet=False):
         stderr
     :type quiet: bool
     """
-    if fatal:
-        _run_with_retries(
-            cmd, retry_exitcodes=(1, APT_ERROR_CODE,),
-            quiet=quiet)
-    else:
-        kwargs = {}
-        if quiet:
-            kwargs['stdout'] = subprocess.DEVNULL
-            kwargs['stderr'] = subprocess.DEVNULL
-        subprocess.call(cmd, env=get_apt_dpkg_env(), **kwargs)
+    try:
+        if fatal:
+            _run_with_retries(
+                cmd, retry_exitcodes=(1, APT_ERROR_CODE,),
+                quiet=quiet)
+        else:
+            kwargs = {}
+            if quiet:
+                kwargs['stdout'] = subprocess.DEVNULL
+                kwargs['stderr'] = subprocess.DEVNULL
+            subprocess.call(cmd, env=get_apt_dpkg_env(), **kwargs)
+    finally:
+        # Installed and available packages may have changed.
+        ubuntu_apt_pkg.invalidate_package_index()
 
 
 def get_upstream_version(package):
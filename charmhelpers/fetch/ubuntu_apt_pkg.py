@@ -15,7 +15,8 @@
 """Provide a subset of the ``python-apt`` module API.
 
 Data collection is done through subprocess calls to ``apt-cache`` and
-``dpkg-query`` commands.
+``dpkg-query`` commands, installed packages are read from the dpkg status
+file directly when possible.
 
 The main purpose for this module is to avoid dependency on the
 ``python-apt`` python module.
@@ -35,10 +36,12 @@ so with this we get rid of the dependency.
 2: https://bugs.debian.org/cgi-bin/bugreport.cgi?bug=845330#10
 """
 
+import fnmatch
+import glob
 import locale
+import mmap
 import os
 import subprocess
-import sys
 
 from charmhelpers import deprecate
 from charmhelpers.core.hookenv import log
@@ -58,11 +61,80 @@ class Version(_container):
     """Simple container for version attributes."""
 
 
+DPKG_STATUS = '/var/lib/dpkg/status'
+APT_LISTS = '/var/lib/apt/lists'
+
+# Package data collected by ``Cache.prefetch``, shared by all ``Cache``
+# instances in this process.  Maps package name to a tuple of the
+# ``apt-cache show`` and ``dpkg-query`` results, or to None for packages
+# unknown to apt.
+_package_index = {}
+_package_index_fingerprint = None
+
+
+def _dpkg_fingerprint():
+    """Return a value that changes whenever the dpkg or apt state changes."""
+    fingerprint = []
+    for path in (DPKG_STATUS, APT_LISTS):
+        try:
+            st = os.stat(path)
+            fingerprint.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except OSError:
+            fingerprint.append(None)
+    return fingerprint
+
+
+def invalidate_package_index():
+    """Drop package data collected by ``Cache.prefetch``.
+
+    This is called by the ``charmhelpers.fetch`` helpers that change the
+    set of installed or available packages.  Changes made by other means
+    are detected from the modification time of the dpkg status file and
+    the apt lists directory.
+    """
+    global _package_index_fingerprint
+    _package_index.clear()
+    _package_index_fingerprint = None
+
+
+def _check_package_index():
+    global _package_index_fingerprint
+    fingerprint = _dpkg_fingerprint()
+    if fingerprint != _package_index_fingerprint:
+        _package_index.clear()
+        _package_index_fingerprint = fingerprint
+
+
 class Cache(object):
     """Simulation of ``apt_pkg`` Cache object."""
     def __init__(self, progress=None):
         pass
 
+    def prefetch(self, packages):
+        """Collect data for many packages with one call to each tool.
+
+        Runs a single ``apt-cache show`` and a single ``dpkg-query`` for all
+        packages not already indexed, so that subsequent lookups of those
+        packages do not spawn any processes.
+
+        :param packages: Names of packages to look up
+        :type packages: List[str]
+        :raises: subprocess.CalledProcessError
+        """
+        _check_package_index()
+        missing = [p for p in packages if p not in _package_index]
+        if not missing:
+            return
+        apt_results = self._apt_cache_show(missing)
+        known = [p for p in missing if p in apt_results]
+        dpkg_results = self.dpkg_list(known) if known else {}
+        for package in missing:
+            if package in apt_results:
+                _package_index[package] = (apt_results[package],
+                                           dpkg_results.get(package, {}))
+            else:
+                _package_index[package] = None
+
     def __contains__(self, package):
         try:
             pkg = self.__getitem__(package)
@@ -79,10 +151,18 @@ class Cache(object):
         :rtype: object
         :raises: KeyError, subprocess.CalledProcessError
         """
-        apt_result = self._apt_cache_show([package])[package]
+        if _package_index:
+            _check_package_index()
+        if package in _package_index:
+            if _package_index[package] is None:
+                raise KeyError(package)
+            apt_result, dpkg_result = _package_index[package]
+            apt_result = dict(apt_result)
+        else:
+            apt_result = self._apt_cache_show([package])[package]
+            dpkg_result = self.dpkg_list([package]).get(package, {})
         apt_result['name'] = apt_result.pop('package')
         pkg = Package(apt_result)
-        dpkg_result = self.dpkg_list([package]).get(package, {})
         current_ver = None
         installed_version = dpkg_result.get('version')
         if installed_version:
@@ -98,6 +178,9 @@ class Cache(object):
     def dpkg_list(self, packages):
         """Get data from system dpkg database for package.
 
+        The data is read from the dpkg status file, see :class:`DpkgStatus`,
+        unless it cannot be used, in which case ``dpkg-query`` is run.
+
         Note that this method is also useful for querying package names
         containing wildcards, for example
 
@@ -121,6 +204,19 @@ class Cache(object):
         :rtype: dict
         :raises: subprocess.CalledProcessError
         """
+        status = dpkg_status()
+        if status.readable():
+            return status.dpkg_list(packages)
+        return self._dpkg_query(packages)
+
+    def _dpkg_query(self, packages):
+        """Get data for installed packages with ``dpkg-query``.
+
+        :param packages: Packages to get data from
+        :type packages: List[str]
+        :rtype: dict
+        :raises: subprocess.CalledProcessError
+        """
         pkgs = {}
         cmd = [
             'dpkg-query', '--show',
@@ -201,6 +297,244 @@ class Cache(object):
         return pkgs
 
 
+class DebControlFile(object):
+    """Read-only access to a file of deb822 stanzas keyed by package name.
+
+    This is the format of ``/var/lib/dpkg/status`` and of the
+    ``/var/lib/apt/lists/*_Packages`` files.  The file is mmapped and a
+    single pass over it records the offsets of each stanza by package name;
+    stanzas are only parsed when looked up, and the file is re-read when its
+    stat changes.
+
+    Parsed stanzas use the same lower-cased keys as
+    :meth:`Cache._apt_cache_show`.
+
+    :param path: Path of the file to read
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fingerprint = None
+        self._data = b''
+        self._offsets = {}
+        self._parsed = {}
+
+    def refresh(self):
+        """Re-index the file if it changed since it was last indexed."""
+        try:
+            st = os.stat(self.path)
+            fingerprint = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            fingerprint = None
+        if fingerprint == self._fingerprint:
+            return
+        self._fingerprint = fingerprint
+        self._data = b''
+        self._offsets = {}
+        self._parsed = {}
+        if fingerprint is None or not fingerprint[1]:
+            return
+        with open(self.path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index()
+
+    def _index(self):
+        data = self._data
+        size = len(data)
+        pos = 0
+        while pos < size:
+            end = data.find(b'\n\n', pos)
+            if end == -1:
+                end = size
+            if data[pos:pos + 8] == b'Package:':
+                start = pos
+            else:
+                start = data.find(b'\nPackage:', pos, end)
+                if start != -1:
+                    start += 1
+            if start != -1:
+                name_end = data.find(b'\n', start, end)
+                if name_end == -1:
+                    name_end = end
+                name = data[start + 8:name_end].strip().decode('UTF-8')
+                self._offsets.setdefault(name, []).append((pos, end))
+            pos = end + 1
+            while data[pos:pos + 1] == b'\n':
+                pos += 1
+
+    def _parse(self, offsets):
+        try:
+            return self._parsed[offsets]
+        except KeyError:
+            pass  # Drop out of the exception handler scope.
+        start, end = offsets
+        stanza = {}
+        previous = None
+        text = self._data[start:end].decode('UTF-8', errors='replace')
+        for line in text.splitlines():
+            if line.startswith((' ', '\t')):
+                if previous:
+                    stanza[previous] += os.linesep + line.lstrip()
+                continue
+            if ':' in line:
+                key, value = line.split(':', 1)
+                previous = key.lower()
+                stanza[previous] = value.lstrip()
+        self._parsed[offsets] = stanza
+        return stanza
+
+    def names(self):
+        """Names of all packages in the file.
+
+        :rtype: List[str]
+        """
+        self.refresh()
+        return list(self._offsets)
+
+    def __contains__(self, package):
+        self.refresh()
+        return package in self._offsets
+
+    def stanzas(self, package):
+        """All stanzas for package, one per architecture or version.
+
+        :param package: Name of package
+        :type package: str
+        :returns: Parsed stanzas, empty if the package is not in the file.
+        :rtype: List[Dict[str, str]]
+        """
+        self.refresh()
+        return [self._parse(o) for o in self._offsets.get(package, ())]
+
+    def get(self, package):
+        """First stanza for package, or None if not in the file.
+
+        :rtype: Optional[Dict[str, str]]
+        """
+        stanzas = self.stanzas(package)
+        return stanzas[0] if stanzas else None
+
+
+class DpkgStatus(DebControlFile):
+    """Reader for the dpkg status database.
+
+    :meth:`dpkg_list` answers the same queries as :meth:`Cache.dpkg_list`
+    without running ``dpkg-query``.  Note that unlike ``dpkg-query`` it does
+    not replay journal entries left in ``/var/lib/dpkg/updates`` by an
+    interrupted dpkg run, see :meth:`readable`.
+
+    :param path: Path of the dpkg status file
+    :type path: str
+    """
+
+    # The ``${db:Status-Abbrev}`` codes ``Cache.dpkg_list`` accepts.
+    INSTALLED = ('install ok installed', 'hold ok installed')
+
+    def __init__(self, path=DPKG_STATUS):
+        super(DpkgStatus, self).__init__(path)
+        self._updates = os.path.join(os.path.dirname(path), 'updates')
+
+    def readable(self):
+        """Whether the status file can answer queries.
+
+        :returns: False if the file could not be read, or if dpkg left
+                  journal entries which only ``dpkg-query`` takes into
+                  account.
+        :rtype: bool
+        """
+        try:
+            self.refresh()
+        except (OSError, ValueError):
+            return False
+        if not self._data:
+            return False
+        try:
+            entries = os.listdir(self._updates)
+        except OSError:
+            return True
+        return not any(entry.isdigit() for entry in entries)
+
+    def dpkg_list(self, packages):
+        """Get data for installed packages, see :meth:`Cache.dpkg_list`.
+
+        :param packages: Packages to get data from, may contain wildcards
+                         and an architecture qualifier, eg. 'libc6:i386'
+        :type packages: List[str]
+        :returns: Structured data about installed packages
+        :rtype: dict
+        """
+        self.refresh()
+        names = []
+        for package in packages:
+            package, _, arch = package.partition(':')
+            if any(c in package for c in '*?['):
+                names.extend((name, arch) for name in
+                             fnmatch.filter(self._offsets, package))
+            else:
+                names.append((package, arch))
+        pkgs = {}
+        for name, arch in names:
+            for stanza in self.stanzas(name):
+                if stanza.get('status') not in self.INSTALLED:
+                    continue
+                if arch and stanza.get('architecture') not in (arch, 'all'):
+                    continue
+                pkgs[name] = {
+                    'name': name,
+                    'version': stanza.get('version'),
+                    'architecture': stanza.get('architecture'),
+                    'description': stanza.get(
+                        'description', '').split(os.linesep, 1)[0],
+                }
+        return pkgs
+
+
+class AptPackagesLists(object):
+    """Reader for the package indexes downloaded by ``apt-get update``.
+
+    :param pattern: Glob matching the uncompressed Packages files
+    :type pattern: str
+    """
+
+    def __init__(self, pattern=os.path.join(APT_LISTS, '*_Packages')):
+        self.pattern = pattern
+        self._files = {}
+
+    def _refresh(self):
+        paths = sorted(glob.glob(self.pattern))
+        self._files = {path: self._files.get(path) or DebControlFile(path)
+                       for path in paths}
+
+    def stanzas(self, package):
+        """All stanzas for package across all Packages files.
+
+        :param package: Name of package
+        :type package: str
+        :rtype: List[Dict[str, str]]
+        """
+        self._refresh()
+        stanzas = []
+        for control in self._files.values():
+            stanzas.extend(control.stanzas(package))
+        return stanzas
+
+
+_dpkg_status = None
+
+
+def dpkg_status():
+    """Return the process-wide :class:`DpkgStatus` reader, used by
+    :meth:`Cache.dpkg_list`.
+
+    :rtype: DpkgStatus
+    """
+    global _dpkg_status
+    if _dpkg_status is None:
+        _dpkg_status = DpkgStatus()
+    return _dpkg_status
+
+
 class Config(_container):
     def __init__(self):
         super(Config, self).__init__(self._populate())
@@ -219,8 +553,15 @@ class Config(_container):
         return cfgs
 
 
-# Backwards compatibility with old apt_pkg module
-sys.modules[__name__].config = Config()
+def __getattr__(name):
+    # Backwards compatibility with old apt_pkg module, ``apt-config dump`` is
+    # only run when the configuration is first used rather than on import.
+    global config
+    if name == 'config':
+        config = Config()
+        return config
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
 
 
 def init():
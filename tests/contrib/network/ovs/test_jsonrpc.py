@@ -0,0 +1,321 @@
+import copy
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import unittest
+import uuid
+
+from mock import patch
+
+import charmhelpers.contrib.network.ovs.jsonrpc as jsonrpc
+import charmhelpers.contrib.network.ovs.ovsdb as ovsdb
+
+
+CHASSIS_1 = '8f9b2b0e-6b0e-4a67-a0f8-1f0ab2cde3a1'
+CHASSIS_2 = '3b0a6c0d-7f3b-4a8e-8f0e-8c7b3ad53c52'
+ENCAP_1 = 'b5e3c1de-1a1b-4e5c-9d3e-7f6a5b4c3d21'
+
+SCHEMA = {
+    'name': 'OVN_Southbound',
+    'tables': {
+        'Chassis': {
+            'columns': {
+                'name': {'type': 'string'},
+                'hostname': {'type': 'string'},
+                'nb_cfg': {'type': 'integer'},
+                'encaps': {'type': {
+                    'key': {'type': 'uuid', 'refTable': 'Encap'},
+                    'min': 1, 'max': 'unlimited'}},
+                'external_ids': {'type': {
+                    'key': 'string', 'value': 'string',
+                    'min': 0, 'max': 'unlimited'}},
+            },
+        },
+    },
+}
+
+ROWS = {
+    'Chassis': {
+        CHASSIS_1: {
+            'name': 'chassis-1',
+            'hostname': 'host-1',
+            'nb_cfg': 0,
+            'encaps': ['uuid', ENCAP_1],
+            'external_ids': ['map', [['charm', 'managed']]],
+        },
+        CHASSIS_2: {
+            'name': 'chassis-2',
+            'hostname': 'host-2',
+            'nb_cfg': 0,
+            'encaps': ['set', []],
+            'external_ids': ['map', []],
+        },
+    },
+}
+
+
+def _members(value):
+    if isinstance(value, list) and value and value[0] in ('set', 'map'):
+        return value[1]
+    return [value]
+
+
+def _satisfies(row, condition):
+    column, function, value = condition
+    if function == '==':
+        return (sorted(map(json.dumps, _members(row[column]))) ==
+                sorted(map(json.dumps, _members(value))))
+    if function == 'includes':
+        return all(member in _members(row[column])
+                   for member in _members(value))
+    raise NotImplementedError(function)
+
+
+class FakeOVSDBServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+    """Stand-in ovsdb-server answering the methods OVSDBClient uses."""
+
+    daemon_threads = True
+
+    def __init__(self, path):
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        self.rows = copy.deepcopy(ROWS)
+        # Size of the writes of the replies, None for one write.
+        self.chunk_size = None
+        self.requests = []
+        self.monitors = []
+        self.lock = threading.Lock()
+
+    def transact(self, operations):
+        results = []
+        updates = {}
+        for op in operations:
+            table = self.rows[op['table']]
+            selected = [
+                (row_uuid, row) for row_uuid, row in table.items()
+                if all(_satisfies(dict(row, _uuid=['uuid', row_uuid]), c)
+                       for c in op['where'])]
+            if op['op'] == 'select':
+                results.append({'rows': [
+                    dict(row, _uuid=['uuid', row_uuid], _version=['uuid', ''])
+                    for row_uuid, row in selected]})
+                continue
+            for row_uuid, row in selected:
+                if op['op'] == 'update':
+                    row.update(op['row'])
+                elif op['op'] == 'mutate':
+                    for column, mutator, value in op['mutations']:
+                        pairs = row[column][1]
+                        if mutator == 'delete':
+                            pairs[:] = [p for p in pairs
+                                        if p[0] not in _members(value)]
+                        else:
+                            pairs.extend(value[1])
+                updates.setdefault(op['table'], {})[row_uuid] = {
+                    'new': copy.deepcopy(row)}
+            results.append({'count': len(selected)})
+        return results, updates
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def send(self, message):
+        data = json.dumps(message).encode('utf-8')
+        size = self.server.chunk_size or len(data)
+        for i in range(0, len(data), size):
+            self.request.sendall(data[i:i + size])
+
+    def handle(self):
+        decoder = json.JSONDecoder()
+        buf = ''
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            buf += data.decode('utf-8')
+            while buf.strip():
+                try:
+                    message, end = decoder.raw_decode(buf.strip())
+                except ValueError:
+                    break
+                buf = buf.strip()[end:]
+                self.dispatch(message)
+
+    def dispatch(self, message):
+        server = self.server
+        method, params = message.get('method'), message.get('params')
+        if method is None:
+            # reply to our echo request
+            server.requests.append(('echo-reply', message['result']))
+            return
+        server.requests.append((method, params))
+        result = None
+        with server.lock:
+            if method == 'list_dbs':
+                self.send({'method': 'echo', 'params': ['ping'],
+                           'id': 'echo'})
+                result = ['OVN_Southbound']
+            elif method == 'get_schema':
+                result = SCHEMA
+            elif method == 'monitor':
+                db, monitor_id, requests = params
+                server.monitors.append((self, monitor_id))
+                result = {
+                    table: {row_uuid: {'new': row}
+                            for row_uuid, row in server.rows[table].items()}
+                    for table in requests}
+            elif method == 'transact':
+                result, updates = server.transact(params[1:])
+                for handler, monitor_id in server.monitors:
+                    if updates:
+                        handler.send({'method': 'update', 'id': None,
+                                      'params': [monitor_id, updates]})
+        self.send({'id': message['id'], 'result': result, 'error': None})
+
+
+class TestFramer(unittest.TestCase):
+
+    def test_feed(self):
+        messages = [
+            {'id': 1, 'result': ['a}b', 'c\\"{[', '\u00e9\u2603']},
+            {'method': 'echo', 'params': [], 'id': 'echo'},
+        ]
+        data = '\n'.join(json.dumps(m, ensure_ascii=False)
+                          for m in messages).encode('utf-8')
+        framer = jsonrpc._Framer()
+        received = []
+        with patch.object(jsonrpc.json, 'loads',
+                          wraps=jsonrpc.json.loads) as loads:
+            for i in range(len(data)):
+                received.extend(framer.feed(data[i:i + 1]))
+        self.assertEqual(received, messages)
+        self.assertEqual(loads.call_count, 2)
+
+
+class TestOVSDBClient(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'ovnsb_db.sock')
+        self.server = FakeOVSDBServer(path)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = jsonrpc.OVSDBClient('unix:' + path, timeout=5)
+        self.addCleanup(self.client.close)
+        self.sbdb = ovsdb.SimpleOVSDB('ovn-sbctl', client=self.client)
+
+    def methods(self):
+        return [method for method, _ in self.server.requests]
+
+    def test_call(self):
+        self.assertEqual(self.client.list_dbs(), ['OVN_Southbound'])
+        self.assertEqual(self.client.table_name('OVN_Southbound', 'chassis'),
+                         'Chassis')
+        self.assertEqual(self.client.call('echo', 'x'), None)
+        # the echo request of the server was answered
+        self.assertIn(('echo-reply', ['ping']), self.server.requests)
+        with self.assertRaises(ValueError):
+            jsonrpc.OVSDBClient('ssl:127.0.0.1:6642').connect()
+
+    def test_large_reply(self):
+        rows = self.server.rows['Chassis']
+        for i in range(2000):
+            rows[str(uuid.uuid4())] = {
+                'name': 'chassis-{}'.format(i + 3),
+                'hostname': 'host-"{}\\'.format(i),
+                'nb_cfg': i,
+                'encaps': ['set', []],
+                'external_ids': ['map', [['k}', 'v{\u00e9']]],
+            }
+        self.server.chunk_size = 1000
+        chassis = list(self.sbdb.chassis)
+        self.assertEqual(len(chassis), 2002)
+        self.assertIn({'k}': 'v{\u00e9'},
+                      [c['external_ids'] for c in chassis])
+
+    def test_table(self):
+        chassis = sorted(self.sbdb.chassis, key=lambda c: c['name'])
+        self.assertEqual(chassis[0], {
+            '_uuid': uuid.UUID(CHASSIS_1),
+            'name': 'chassis-1',
+            'hostname': 'host-1',
+            'nb_cfg': 0,
+            'encaps': uuid.UUID(ENCAP_1),
+            'external_ids': {'charm': 'managed'},
+        })
+        self.assertEqual(chassis[1]['encaps'], [])
+        self.assertEqual(
+            [c['name'] for c in self.sbdb.chassis.find('hostname=host-2')],
+            ['chassis-2'])
+        self.assertEqual(
+            [c['name'] for c in self.sbdb.chassis.find(
+                'external_ids:charm=managed')],
+            ['chassis-1'])
+        self.assertEqual(
+            [c['name'] for c in self.sbdb.chassis.find('nb_cfg=0')],
+            ['chassis-1', 'chassis-2'])
+        self.assertEqual(self.sbdb.chassis[CHASSIS_2]['name'], 'chassis-2')
+        with self.assertRaises(KeyError):
+            self.sbdb.chassis[uuid.uuid4()]
+        # one persistent connection
+        self.assertEqual(self.methods().count('get_schema'), 1)
+
+    def test_changes(self):
+        self.sbdb.chassis.set(CHASSIS_1, 'external_ids:charm', 'other')
+        self.sbdb.chassis.set('chassis-2', 'nb_cfg', '3')
+        self.sbdb.chassis.remove(CHASSIS_1, 'external_ids', 'charm')
+        self.sbdb.chassis.set(CHASSIS_2, 'external_ids:a', 'b')
+        self.sbdb.chassis.clear(CHASSIS_2, 'encaps')
+        rows = self.server.rows['Chassis']
+        self.assertEqual(rows[CHASSIS_1]['external_ids'], ['map', []])
+        self.assertEqual(rows[CHASSIS_2]['nb_cfg'], 3)
+        self.assertEqual(rows[CHASSIS_2]['external_ids'],
+                         ['map', [['a', 'b']]])
+        self.assertEqual(rows[CHASSIS_2]['encaps'], ['set', []])
+
+    def test_transaction(self):
+        with self.sbdb.transaction():
+            for chs in self.sbdb.chassis:
+                self.sbdb.chassis.set(chs['_uuid'], 'hostname', 'new')
+        self.assertEqual(self.methods().count('transact'), 2)
+        self.assertEqual(len(self.server.requests[-1][1]), 3)
+        self.assertEqual(
+            [row['hostname'] for row in self.server.rows['Chassis'].values()],
+            ['new', 'new'])
+        with self.assertRaises(RuntimeError):
+            with self.sbdb.transaction():
+                self.sbdb.chassis.set(CHASSIS_1, 'hostname', 'newer')
+                raise RuntimeError()
+        self.assertEqual(self.server.rows['Chassis'][CHASSIS_1]['hostname'],
+                         'new')
+        with self.assertRaises(RuntimeError):
+            ovsdb.SimpleOVSDB('ovn-sbctl').transaction()
+
+    def test_monitor(self):
+        self.sbdb.monitor('chassis')
+        transacts = self.methods().count('transact')
+        self.assertEqual(
+            [c['name'] for c in self.sbdb.chassis.find('hostname=host-1')],
+            ['chassis-1'])
+        self.assertEqual(self.methods().count('transact'), transacts)
+        self.sbdb.chassis.set(CHASSIS_1, 'hostname', 'host-3')
+        self.assertEqual(
+            [c['name'] for c in self.sbdb.chassis.find('hostname=host-3')],
+            ['chassis-1'])
+        self.assertEqual(self.sbdb.chassis[CHASSIS_1]['hostname'], 'host-3')
+        # only the change was sent
+        self.assertEqual(self.methods().count('transact'), transacts + 1)
+        # conditions which can not be evaluated locally go to the server
+        self.assertEqual(
+            [c['name'] for c in self.sbdb.chassis.find(
+                'external_ids:charm=managed')],
+            ['chassis-1'])
+        self.assertEqual(self.methods().count('transact'), transacts + 2)
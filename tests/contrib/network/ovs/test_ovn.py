@@ -1,3 +1,4 @@
+import mock
 import textwrap
 import uuid
 import yaml
@@ -147,3 +148,45 @@ class TestOVN(test_utils.BaseTestCase):
         self.ovn_appctl.assert_called_once_with('ovn-northd', ('status',))
         self.ovn_appctl.return_value = NORTHD_STATUS_STANDBY
         self.assertFalse(ovn.is_northd_active())
+
+    def test_collect_status(self):
+        self.patch_object(ovn, 'ovn_appctl')
+        self.patch_object(ovn.time, 'monotonic')
+        self.addCleanup(ovn.invalidate_status)
+        self.monotonic.return_value = 100
+
+        def fake_appctl(target, args, rundir=None, use_ovs_appctl=False):
+            if target == 'ovn-northd':
+                return NORTHD_STATUS_ACTIVE
+            return CLUSTER_STATUS.replace(
+                'OVN_Northbound', args[1])
+        self.ovn_appctl.side_effect = fake_appctl
+
+        status = ovn.collect_status()
+        self.assertEqual(status.nb.name, 'OVN_Northbound')
+        self.assertEqual(status.nb.leader, '22dd')
+        self.assertEqual(status.sb.name, 'OVN_Southbound')
+        self.assertTrue(status.northd_active)
+        self.ovn_appctl.assert_has_calls([
+            mock.call('ovnnb_db', ('cluster/status', 'OVN_Northbound'),
+                      rundir=None, use_ovs_appctl=False),
+            mock.call('ovnsb_db', ('cluster/status', 'OVN_Southbound'),
+                      rundir=None, use_ovs_appctl=False),
+            mock.call('ovn-northd', ('status',)),
+        ], any_order=True)
+        self.assertEqual(self.ovn_appctl.call_count, 3)
+
+        # reused within the TTL
+        self.monotonic.return_value = 100 + ovn.STATUS_TTL - 1
+        self.assertIs(ovn.collect_status(), status)
+        self.assertEqual(self.ovn_appctl.call_count, 3)
+        self.monotonic.return_value = 100 + ovn.STATUS_TTL
+        self.assertIsNot(ovn.collect_status(), status)
+        self.assertEqual(self.ovn_appctl.call_count, 6)
+
+        ovn.invalidate_status()
+        status = ovn.collect_status(northd=False)
+        self.assertIsNone(status.northd_active)
+        self.assertEqual(self.ovn_appctl.call_count, 8)
+        ovn.collect_status(northd=False, ttl=0)
+        self.assertEqual(self.ovn_appctl.call_count, 10)
@@ -144,6 +144,70 @@ class TestOVS(test_utils.BaseTestCase):
         self.check_call.assert_called_once_with(
             ['ovs-vsctl', '--', '--if-exists', 'del-port', 'test', 'eth1'])
 
+    def test_transaction(self):
+        self.patch_object(ovs.subprocess, 'check_call')
+        self.patch_object(ovs, 'log')
+        with ovs.OVSTransaction() as txn:
+            ovs.add_bridge('br-ex', datapath_type='netdev')
+            ovs.add_bridge_port('br-ex', 'eth1')
+            ovs.del_bridge_port('br-int', 'eth2', linkdown=False)
+            ovs.del_bridge('br-old')
+            self.assertFalse(self.check_call.called)
+            # nested transactions are merged into the outer one
+            with ovs.OVSTransaction() as nested:
+                self.assertIs(nested, txn)
+                ovs.set_Open_vSwitch_column_value('external_ids:a=b')
+            self.assertFalse(self.check_call.called)
+        self.assertEqual(self.check_call.call_args_list, [
+            mock.call([
+                'ovs-vsctl',
+                '--', '--may-exist', 'add-br', 'br-ex',
+                '--', 'set', 'bridge', 'br-ex', 'datapath_type=netdev',
+                '--', '--may-exist', 'add-port', 'br-ex', 'eth1',
+                '--', '--if-exists', 'del-port', 'br-int', 'eth2',
+                '--', '--if-exists', 'del-br', 'br-old',
+                '--', 'set', 'Open_vSwitch', '.', 'external_ids:a=b']),
+            mock.call(['ip', 'link', 'set', 'eth1', 'up']),
+            mock.call(['ip', 'link', 'set', 'eth1', 'promisc', 'off']),
+        ])
+        self.assertIsNone(ovs._transaction)
+
+    def test_changes_invalidate_snapshots(self):
+        self.patch_object(ovs.subprocess, 'check_call')
+        self.patch_object(ovs, 'log')
+        self.patch_object(ovs.ch_ovsdb, 'invalidate_snapshots')
+        with ovs.OVSTransaction():
+            ovs.add_bridge('br-ex')
+            self.assertFalse(self.invalidate_snapshots.called)
+        self.invalidate_snapshots.assert_called_once_with()
+        ovs.del_bridge('br-ex')
+        self.assertEqual(self.invalidate_snapshots.call_count, 2)
+
+    def test_transaction_ipfix(self):
+        self.patch_object(ovs.subprocess, 'check_call')
+        self.patch_object(ovs, 'log')
+        with ovs.OVSTransaction():
+            ovs.enable_ipfix('br-ex', '10.0.0.1:4739')
+            ovs.enable_ipfix('br-int', '10.0.0.1:4739')
+        cmd = self.check_call.call_args[0][0]
+        self.assertIn('ipfix=@i1', cmd)
+        self.assertIn('--id=@i1', cmd)
+        self.assertIn('ipfix=@i2', cmd)
+        self.assertIn('--id=@i2', cmd)
+
+    def test_transaction_exception(self):
+        self.patch_object(ovs.subprocess, 'check_call')
+        self.patch_object(ovs, 'log')
+        with self.assertRaises(ValueError):
+            with ovs.OVSTransaction():
+                ovs.add_bridge('br-ex')
+                raise ValueError()
+        self.assertFalse(self.check_call.called)
+        self.assertIsNone(ovs._transaction)
+        ovs.add_bridge('br-ex')
+        self.check_call.assert_called_once_with([
+            'ovs-vsctl', '--', '--may-exist', 'add-br', 'br-ex'])
+
     def test_ovs_appctl(self):
         self.patch_object(ovs.subprocess, 'check_output')
         ovs.ovs_appctl('ovs-vswitchd', ('ofproto/list',))
@@ -226,57 +290,83 @@ class TestOVS(test_utils.BaseTestCase):
         self.assertEqual(ovs.bridge_for_port(fake_uuid), 'fake-bridge')
 
     def test_patch_ports_on_bridge(self):
-        self.patch_object(ovs.ch_ovsdb, 'SimpleOVSDB')
-        self.patch_object(ovs, 'bridge_for_port')
-        self.patch_object(ovs, 'uuid_for_port')
-        ovsdb = mock.MagicMock()
-        ovsdb.interface.find.return_value = [
-            {
-                'name': 'fake-interface-with-port-for-other-bridge',
-                'options': {
-                    'peer': 'fake-peer'
+        port_uuid = uuid.UUID('0d43905b-f80e-4eaa-9feb-a9017da8c6bc')
+        other_uuid = uuid.UUID('5c3e6b3a-4f0e-4b8a-9d51-8d2f0c6f1e7a')
+        peer_uuid = uuid.UUID('a1b7f3e2-0c4d-4e5f-8a9b-0c1d2e3f4a5b')
+        tables = {
+            'interface': [
+                {
+                    'name': 'port-on-other-bridge',
+                    'type': 'patch',
+                    'options': {
+                        'peer': 'fake-peer'
+                    },
                 },
-            },
-            {
-                'name': 'fake-interface',
-                'options': {
-                    'peer': 'fake-peer'
+                {
+                    'name': 'fake-port',
+                    'type': 'patch',
+                    'options': {
+                        'peer': 'fake-peer'
+                    },
                 },
-            },
-        ]
-        port_uuid = uuid.UUID('0d43905b-f80e-4eaa-9feb-a9017da8c6bc')
-        ovsdb.port.find.side_effect = [
-            [{
-                '_uuid': port_uuid,
-                'name': 'port-on-other-bridge',
-            }],
-            [{
-                '_uuid': port_uuid,
-                'name': 'fake-port',
-            }],
-        ]
-        self.SimpleOVSDB.return_value = ovsdb
-        self.bridge_for_port.side_effect = ['some-other-bridge', 'fake-bridge', 'fake-peer-bridge']
-        for patch in ovs.patch_ports_on_bridge('fake-bridge'):
-            self.assertEqual(
-                patch,
-                ovs.Patch(
-                    this_end=ovs.PatchPort(
-                        bridge='fake-bridge',
-                        port='fake-port'),
-                    other_end=ovs.PatchPort(
-                        bridge='fake-peer-bridge',
-                        port='fake-peer'))
-            )
-            break
-        else:
-            assert 0, 'Expected generator to provide output'
-        ovsdb.port.find.side_effect = None
-        ovsdb.port.find.return_value = []
+                {
+                    'name': 'eth0',
+                    'type': '',
+                    'options': {},
+                },
+            ],
+            'port': [
+                {
+                    '_uuid': other_uuid,
+                    'name': 'port-on-other-bridge',
+                },
+                {
+                    '_uuid': port_uuid,
+                    'name': 'fake-port',
+                },
+                {
+                    '_uuid': peer_uuid,
+                    'name': 'fake-peer',
+                },
+            ],
+            'bridge': [
+                {
+                    'name': 'some-other-bridge',
+                    'ports': [other_uuid],
+                },
+                {
+                    'name': 'fake-bridge',
+                    'ports': [port_uuid, uuid.uuid4()],
+                },
+                {
+                    # a single port is not presented as a list
+                    'name': 'fake-peer-bridge',
+                    'ports': peer_uuid,
+                },
+            ],
+        }
+        self.patch_object(ovs.ch_ovsdb.SimpleOVSDB, 'Table')
+        self.Table.side_effect = (
+            lambda tool, table, args=None, client=None: tables[table])
+        self.assertEqual(
+            list(ovs.patch_ports_on_bridge('fake-bridge')),
+            [ovs.Patch(
+                this_end=ovs.PatchPort(
+                    bridge='fake-bridge',
+                    port='fake-port'),
+                other_end=ovs.PatchPort(
+                    bridge='fake-peer-bridge',
+                    port='fake-peer'))])
+        # each table was read once
+        self.assertEqual(
+            sorted(c[0][1] for c in self.Table.call_args_list),
+            ['bridge', 'interface', 'port'])
+        # every call reads the tables again
+        tables['port'] = tables['port'][:1]
         with self.assertRaises(ValueError):
             for patch in ovs.patch_ports_on_bridge('fake-bridge'):
                 pass
-        ovsdb.interface.find.return_value = []
+        tables['interface'] = []
         for patch in ovs.patch_ports_on_bridge('fake-bridge'):
             assert 0, 'Expected generator to provide empty iterator'
         self.assertTrue(isinstance(
@@ -147,3 +147,58 @@ class TestSimpleOVSDB(test_utils.BaseTestCase):
         self._run.assert_called_once_with(
             'ovs-vsctl', 'set', 'interface',
             '1e21ba48-61ff-4b32-b35e-cb80411da351', 'external_ids:other=value')
+
+    def test_snapshot(self):
+        self.target = ovsdb.SimpleOVSDB('ovs-vsctl')
+        self.patch_object(ovsdb.utils, '_run')
+        self._run.return_value = VSCTL_BRIDGE_TBL
+        snapshot = self.target.snapshot()
+        self.assertEqual(len(snapshot.bridge), 2)
+        self.assertEqual(len(snapshot.bridge), 2)
+        self._run.assert_called_once_with(
+            'ovs-vsctl', '-f', 'json', 'find', 'bridge')
+        self.maxDiff = None
+        self.assertEqual(snapshot.bridge.by_name('br-test'),
+                         VSCTL_BRIDGE_TBL_DESERIALIZED)
+        self.assertIsNone(snapshot.bridge.by_name('br-ex'))
+        self.assertEqual(
+            snapshot.bridge['1e21ba48-61ff-4b32-b35e-cb80411da351']['name'],
+            'br-test')
+        self.assertEqual(
+            snapshot.bridge[
+                uuid.UUID('bb685b0f-a383-40a1-b7a5-b5c2066bfa42')]['name'],
+            'br-int')
+        with self.assertRaises(KeyError):
+            snapshot.bridge[uuid.uuid4()]
+        self.assertEqual(
+            [br['name'] for br in snapshot.bridge.lookup(
+                'ports',
+                uuid.UUID('8bbd2441-866f-4317-a284-09491702776c'))],
+            ['br-int'])
+        self.assertEqual(
+            [br['name'] for br in snapshot.bridge.find_by_external_id(
+                'charm-ovn-chassis', 'managed')],
+            ['br-test'])
+        self.assertEqual(
+            [br['name'] for br in snapshot.bridge.lookup(
+                'fail_mode', 'secure')],
+            ['br-int'])
+        self.assertEqual(self._run.call_count, 1)
+        with self.assertRaises(AttributeError):
+            snapshot.unknown_table
+        snapshot.refresh()
+        list(snapshot.bridge)
+        self.assertEqual(self._run.call_count, 2)
+
+    def test_shared_snapshot(self):
+        self.patch_object(ovsdb.utils, '_run')
+        self._run.return_value = VSCTL_BRIDGE_TBL
+        self.addCleanup(ovsdb.invalidate_snapshots)
+        snapshot = ovsdb.snapshot('ovs-vsctl')
+        self.assertIs(ovsdb.snapshot('ovs-vsctl'), snapshot)
+        self.assertIsNot(ovsdb.snapshot('ovs-vsctl', args=['--db=x']),
+                         snapshot)
+        # changes made through the module drop the snapshots
+        ovsdb.SimpleOVSDB('ovs-vsctl').bridge.set(
+            'br-test', 'external_ids:charm', 'managed')
+        self.assertIsNot(ovsdb.snapshot('ovs-vsctl'), snapshot)
@@ -237,6 +237,93 @@ class IPTest(unittest.TestCase):
                                           'fd2d:dec4:cf59:3c16::/64',
                                           fatal=False)
 
+    @patch.object(netifaces, 'ifaddresses')
+    @patch.object(netifaces, 'interfaces')
+    def test_get_address_index(self, _interfaces, _ifaddresses):
+        _interfaces.return_value = sorted(DUMMY_ADDRESSES)
+        _ifaddresses.side_effect = DUMMY_ADDRESSES.__getitem__
+        self.addCleanup(net_ip.get_address_index.cache_clear)
+        index = net_ip.get_address_index()
+        self.assertIs(net_ip.get_address_index(), index)
+        self.assertEqual(
+            net_ip.get_iface_for_address('10.5.1.1', index=index), 'eth1')
+        self.assertEqual(
+            net_ip.get_address_in_network('192.168.10.0/24', index=index),
+            '192.168.10.58')
+        self.assertEqual(
+            net_ip.get_iface_from_addr('10.6.0.2', index=index), 'eth1')
+        self.assertEqual(_interfaces.call_count, 1)
+        # without an index netifaces is read on every call
+        _interfaces.return_value = ['eth0']
+        self.assertIsNone(net_ip.get_iface_for_address('10.5.1.1'))
+        self.assertEqual(
+            net_ip.get_iface_for_address('10.5.1.1', index=index), 'eth1')
+        net_ip.get_address_index.cache_clear()
+        self.assertIsNot(net_ip.get_address_index(), index)
+
+    @patch.object(netifaces, 'ifaddresses')
+    @patch.object(netifaces, 'interfaces')
+    def test_address_index_matches_netifaces(self, _interfaces,
+                                             _ifaddresses):
+        _interfaces.return_value = sorted(DUMMY_ADDRESSES)
+        _ifaddresses.side_effect = DUMMY_ADDRESSES.__getitem__
+        index = net_ip.AddressIndex()
+        for network in ('192.168.1.0/24', '192.168.11.0/24 192.168.10.0/24',
+                        '10.6.0.0/24', '2a01:348:2f4::/64', '172.16.0.0/16',
+                        'fd2d:dec4:cf59:3c16::/64'):
+            self.assertEqual(
+                net_ip.get_address_in_network(network, index=index),
+                net_ip.get_address_in_network(network))
+        for address in ('10.5.1.1', '192.168.1.1', '192.168.10.1',
+                        '2a01:348:2f4:0::1', '172.16.0.1'):
+            for key in ('iface', 'netmask'):
+                self.assertEqual(
+                    net_ip._get_for_address(address, key, index=index),
+                    net_ip._get_for_address(address, key))
+        for address in ('10.6.0.2', '192.168.1.56', 'fe80::3e97:eff:fe8b:1cf7',
+                        '2a01:348:2f4:0:685e:5748:ae62:209f'):
+            self.assertEqual(
+                net_ip.get_iface_from_addr(address, index=index),
+                net_ip.get_iface_from_addr(address))
+
+    @patch.object(netifaces, 'ifaddresses')
+    @patch.object(netifaces, 'interfaces')
+    def test_address_index_first_interface_wins(self, _interfaces,
+                                                _ifaddresses):
+        addresses = {
+            'br0': {netifaces.AF_INET: [
+                {'addr': '10.0.0.1', 'netmask': '255.255.0.0'}]},
+            'eth0': {netifaces.AF_INET: [
+                {'addr': '10.0.1.1', 'netmask': '255.255.255.0'}]},
+            'eth1': {netifaces.AF_INET: [
+                {'addr': '10.1.0.1', 'netmask': '255.255.255.0'},
+                {'addr': '10.0.1.2', 'netmask': '255.255.255.0'}]},
+        }
+        _interfaces.return_value = ['eth1', 'eth0', 'br0']
+        _ifaddresses.side_effect = addresses.__getitem__
+        index = net_ip.AddressIndex()
+        # only the first IPv4 address of an interface is looked at.
+        self.assertEqual(index.find_network('10.0.1.5')['iface'], 'eth0')
+        self.assertEqual(index.find_network('10.0.2.5')['iface'], 'br0')
+        self.assertIsNone(index.find_network('10.2.0.1'))
+        self.assertEqual(
+            str(index.find_address(net_ip.netaddr.IPNetwork('10.0.1.0/24'))),
+            '10.0.1.2/24')
+        self.assertIsNone(
+            index.find_address(net_ip.netaddr.IPNetwork('10.0.0.0/24')))
+        self.assertEqual(index.iface_for_address('10.0.1.2'), 'eth1')
+
+    def test_is_address_in_network_not_a_string(self):
+        self.assertTrue(net_ip.is_address_in_network(
+            net_ip.netaddr.IPNetwork('192.168.1.0/24'), '192.168.1.1'))
+        self.assertTrue(net_ip.is_address_in_network(
+            (3232235776, 24), '192.168.1.1'))
+        # unhashable input is handed to netaddr, not to the cache
+        with patch.object(net_ip.netaddr, 'IPNetwork',
+                          side_effect=net_ip.netaddr.AddrFormatError):
+            self.assertRaises(ValueError, net_ip.is_address_in_network,
+                              ['192.168.1.0/24'], '192.168.1.1')
+
     def test_is_address_in_network(self):
         self.assertTrue(
             net_ip.is_address_in_network(
@@ -293,24 +293,24 @@ class DeferredCharmServiceEventsTestCase(tests.utils.BaseTestCase):
             call('svcA', ['stop', 'restart', 'try-restart']),
             call('svcB', ['stop', 'restart', 'try-restart'])])
 
-    @patch.object(deferred_events.subprocess, 'check_output')
-    def test_get_service_start_time(self, check_output):
-        check_output.return_value = (
-            b'ActiveEnterTimestamp=Tue 2021-02-02 13:19:55 UTC')
+    @patch.object(deferred_events.host, 'services_state')
+    def test_get_service_start_time(self, services_state):
         expect = datetime.datetime.strptime(
             'Tue 2021-02-02 13:19:55 UTC',
             '%a %Y-%m-%d %H:%M:%S %Z')
+        services_state.return_value = {
+            'svcA': deferred_events.host.ServiceState(
+                'active', 'running', expect, None)}
         self.assertEqual(
             deferred_events.get_service_start_time('svcA'),
             expect)
-        check_output.assert_called_once_with(
-            ['systemctl', 'show', 'svcA', '--property=ActiveEnterTimestamp'])
+        services_state.assert_called_once_with(['svcA'])
 
     @patch.object(deferred_events, 'get_deferred_restarts')
     @patch.object(deferred_events, 'clear_deferred_restarts')
     @patch.object(deferred_events.hookenv, 'log')
-    @patch.object(deferred_events, 'get_service_start_time')
-    def test_check_restart_timestamps(self, get_service_start_time, log,
+    @patch.object(deferred_events.host, 'services_state')
+    def test_check_restart_timestamps(self, services_state, log,
                                       clear_deferred_restarts,
                                       get_deferred_restarts):
         request_time = '2021-02-02 10:19:55'
@@ -324,16 +324,22 @@ class DeferredCharmServiceEventsTestCase(tests.utils.BaseTestCase):
                 reason='ReasonA',
                 action='restart')]
         get_deferred_restarts.return_value = deferred_restarts
-        get_service_start_time.return_value = datetime.datetime.strptime(
-            'Tue 2021-02-02 13:19:55 UTC',
-            '%a %Y-%m-%d %H:%M:%S %Z')
+
+        def started_at(time):
+            return {'svcA': deferred_events.host.ServiceState(
+                'active', 'running',
+                datetime.datetime.strptime(time, '%a %Y-%m-%d %H:%M:%S %Z'),
+                None)}
+
+        services_state.return_value = started_at(
+            'Tue 2021-02-02 13:19:55 UTC')
         deferred_events.check_restart_timestamps()
         clear_deferred_restarts.assert_called_once_with(['svcA'])
+        services_state.assert_called_once_with(['svcA'])
 
         clear_deferred_restarts.reset_mock()
-        get_service_start_time.return_value = datetime.datetime.strptime(
-            'Tue 2021-02-02 10:10:55 UTC',
-            '%a %Y-%m-%d %H:%M:%S %Z')
+        services_state.return_value = started_at(
+            'Tue 2021-02-02 10:10:55 UTC')
         deferred_events.check_restart_timestamps()
         self.assertFalse(clear_deferred_restarts.called)
         log.assert_called_once_with(
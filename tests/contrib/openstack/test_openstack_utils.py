@@ -989,7 +989,7 @@ class OpenStackHelpersTestCase(TestCase):
         self.assertTrue(actual_parm1 == 'blocked')
         self.assertTrue(actual_parm2 == expected1 or actual_parm2 == expected2)
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -997,7 +997,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=False)
     def test_set_os_workload_status_complete_with_services_list(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1005,13 +1005,13 @@ class OpenStackHelpersTestCase(TestCase):
         services = ['database', 'identity']
         # Assume that the service and ports are open.
         port_has_listener.return_value = True
-        service_running.return_value = True
+        services_running.side_effect = lambda s: [True] * len(s)
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
         status_set.assert_called_with('active', 'Unit is ready')
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -1019,7 +1019,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=False)
     def test_set_os_workload_status_complete_services_list_not_running(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1027,7 +1027,7 @@ class OpenStackHelpersTestCase(TestCase):
         services = ['database', 'identity']
         port_has_listener.return_value = True
         # Fail the identity service
-        service_running.side_effect = [True, False]
+        services_running.return_value = [True, False]
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
@@ -1035,7 +1035,7 @@ class OpenStackHelpersTestCase(TestCase):
             'blocked',
             'Services not running that should be: identity')
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -1043,7 +1043,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=False)
     def test_set_os_workload_status_complete_with_services(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1054,13 +1054,13 @@ class OpenStackHelpersTestCase(TestCase):
         ]
         # Assume that the service and ports are open.
         port_has_listener.return_value = True
-        service_running.return_value = True
+        services_running.side_effect = lambda s: [True] * len(s)
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
         status_set.assert_called_with('active', 'Unit is ready')
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -1068,7 +1068,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=False)
     def test_set_os_workload_status_complete_service_not_running(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1079,7 +1079,7 @@ class OpenStackHelpersTestCase(TestCase):
         ]
         port_has_listener.return_value = True
         # Fail the identity service
-        service_running.side_effect = [True, False]
+        services_running.return_value = [True, False]
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
@@ -1087,7 +1087,7 @@ class OpenStackHelpersTestCase(TestCase):
             'blocked',
             'Services not running that should be: identity')
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -1095,7 +1095,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=False)
     def test_set_os_workload_status_complete_port_not_open(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1106,7 +1106,7 @@ class OpenStackHelpersTestCase(TestCase):
         ]
         port_has_listener.side_effect = [True, False, True]
         # Fail the identity service
-        service_running.return_value = True
+        services_running.side_effect = lambda s: [True] * len(s)
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
@@ -1150,7 +1150,7 @@ class OpenStackHelpersTestCase(TestCase):
             'maintenance',
             "Paused. Use 'resume' action to resume normal service.")
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -1158,7 +1158,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=True)
     def test_set_os_workload_status_paused_services_check(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1168,7 +1168,7 @@ class OpenStackHelpersTestCase(TestCase):
             {'service': 'identity', 'ports': [30]},
         ]
         port_has_listener.return_value = False
-        service_running.side_effect = [False, False]
+        services_running.return_value = [False, False]
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
@@ -1176,7 +1176,7 @@ class OpenStackHelpersTestCase(TestCase):
             'maintenance',
             "Paused. Use 'resume' action to resume normal service.")
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -1184,7 +1184,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=True)
     def test_set_os_workload_status_paused_services_fail(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1195,7 +1195,7 @@ class OpenStackHelpersTestCase(TestCase):
         ]
         port_has_listener.return_value = False
         # Fail the identity service
-        service_running.side_effect = [False, True]
+        services_running.return_value = [False, True]
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
@@ -1203,7 +1203,7 @@ class OpenStackHelpersTestCase(TestCase):
             'blocked',
             "Services should be paused but these services running: identity")
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     @patch.object(openstack, 'juju_log')
     @patch('charmhelpers.contrib.openstack.utils.status_set')
@@ -1211,7 +1211,7 @@ class OpenStackHelpersTestCase(TestCase):
            return_value=True)
     def test_set_os_workload_status_paused_services_ports_fail(
             self, is_unit_paused_set, status_set, log,
-            port_has_listener, service_running):
+            port_has_listener, services_running):
         configs = MagicMock()
         configs.complete_contexts.return_value = []
         required_interfaces = {}
@@ -1222,7 +1222,7 @@ class OpenStackHelpersTestCase(TestCase):
         ]
         # make the service 20 port be still listening.
         port_has_listener.side_effect = [False, True, False]
-        service_running.return_value = False
+        services_running.side_effect = lambda s: [False] * len(s)
 
         openstack.set_os_workload_status(
             configs, required_interfaces, services=services)
@@ -1275,26 +1275,26 @@ class OpenStackHelpersTestCase(TestCase):
             "Services should be paused but "
             "these ports which should be closed, but are open: 70")
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     def test_check_actually_paused_simple_services(
-            self, port_has_listener, service_running):
+            self, port_has_listener, services_running):
         services = ['database', 'identity']
         port_has_listener.return_value = False
-        service_running.return_value = False
+        services_running.side_effect = lambda s: [False] * len(s)
 
         state, message = openstack.check_actually_paused(
             services)
         self.assertEqual(state, None)
         self.assertEqual(message, None)
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     def test_check_actually_paused_simple_services_fail(
-            self, port_has_listener, service_running):
+            self, port_has_listener, services_running):
         services = ['database', 'identity']
         port_has_listener.return_value = False
-        service_running.side_effect = [False, True]
+        services_running.return_value = [False, True]
 
         state, message = openstack.check_actually_paused(
             services)
@@ -1303,34 +1303,34 @@ class OpenStackHelpersTestCase(TestCase):
             message,
             "Services should be paused but these services running: identity")
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     def test_check_actually_paused_services_dict(
-            self, port_has_listener, service_running):
+            self, port_has_listener, services_running):
         services = [
             {'service': 'database', 'ports': [10, 20]},
             {'service': 'identity', 'ports': [30]},
         ]
         # Assume that the service and ports are open.
         port_has_listener.return_value = False
-        service_running.return_value = False
+        services_running.side_effect = lambda s: [False] * len(s)
 
         state, message = openstack.check_actually_paused(
             services)
         self.assertEqual(state, None)
         self.assertEqual(message, None)
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     def test_check_actually_paused_services_dict_fail(
-            self, port_has_listener, service_running):
+            self, port_has_listener, services_running):
         services = [
             {'service': 'database', 'ports': [10, 20]},
             {'service': 'identity', 'ports': [30]},
         ]
         # Assume that the service and ports are open.
         port_has_listener.return_value = False
-        service_running.side_effect = [False, True]
+        services_running.return_value = [False, True]
 
         state, message = openstack.check_actually_paused(
             services)
@@ -1339,17 +1339,17 @@ class OpenStackHelpersTestCase(TestCase):
             message,
             "Services should be paused but these services running: identity")
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     def test_check_actually_paused_services_dict_ports_fail(
-            self, port_has_listener, service_running):
+            self, port_has_listener, services_running):
         services = [
             {'service': 'database', 'ports': [10, 20]},
             {'service': 'identity', 'ports': [30]},
         ]
         # Assume that the service and ports are open.
         port_has_listener.side_effect = [False, True, False]
-        service_running.return_value = False
+        services_running.side_effect = lambda s: [False] * len(s)
 
         state, message = openstack.check_actually_paused(
             services)
@@ -1358,12 +1358,12 @@ class OpenStackHelpersTestCase(TestCase):
                           'Services should be paused but these service:ports'
                           ' are open: database: [20]')
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     def test_check_actually_paused_ports_okay(
-            self, port_has_listener, service_running):
+            self, port_has_listener, services_running):
         port_has_listener.side_effect = [False, False, False]
-        service_running.return_value = False
+        services_running.side_effect = lambda s: [False] * len(s)
         ports = [50, 60, 70]
 
         state, message = openstack.check_actually_paused(
@@ -1371,12 +1371,12 @@ class OpenStackHelpersTestCase(TestCase):
         self.assertEqual(state, None)
         self.assertEqual(state, None)
 
-    @patch('charmhelpers.contrib.openstack.utils.service_running')
+    @patch('charmhelpers.contrib.openstack.utils.services_running')
     @patch('charmhelpers.contrib.openstack.utils.port_has_listener')
     def test_check_actually_paused_ports_fail(
-            self, port_has_listener, service_running):
+            self, port_has_listener, services_running):
         port_has_listener.side_effect = [False, True, False]
-        service_running.return_value = False
+        services_running.side_effect = lambda s: [False] * len(s)
         ports = [50, 60, 70]
 
         state, message = openstack.check_actually_paused(
@@ -5021,6 +5021,26 @@ class ContextTests(unittest.TestCase):
             ctx_object.parse_ovs_use_veth()
             _bool_from_string.assert_called_with("Invalid")
 
+    def test_volatile(self):
+        # contexts reading local state must never be skipped by
+        # OSConfigRenderer dependency tracking
+        for ctxt in (context.WorkerConfigContext(),
+                     context.HostInfoContext(),
+                     context.DataPortContext(),
+                     context.PhyNICMTUContext(),
+                     context.DHCPAgentContext(),
+                     context.OVSDPDKDeviceContext(),
+                     context.SharedDBContext(),
+                     context.AMQPContext(ssl_dir='/etc/nova'),
+                     context.VolumeAPIContext('nova-common')):
+            self.assertTrue(ctxt.volatile, ctxt)
+        for ctxt in (context.LogLevelContext(),
+                     context.SyslogContext(),
+                     context.OSConfigFlagContext(),
+                     context.AMQPContext(),
+                     context.InternalEndpointContext()):
+            self.assertFalse(ctxt.volatile, ctxt)
+
 
 class MockPCIDevice(object):
     """Simple wrapper to mock pci.PCINetDevice class"""
@@ -1,10 +1,13 @@
 
 import os
+import shutil
+import tempfile
 import unittest
 
 from mock import patch, call, MagicMock
 
 import charmhelpers.contrib.openstack.templating as templating
+from charmhelpers.core import hookenv, unitdata
 
 from jinja2.exceptions import TemplateNotFound
 
@@ -186,6 +189,304 @@ class TemplatingTests(unittest.TestCase):
             self.assertEqual(sorted(ex_calls), sorted(_write.call_args_list))
             pass
 
+    def test_write_all_returns_written_files(self):
+        self.context.set(interfaces=['fooservice'], context={'foo': 'bar'})
+        self.renderer.register('/tmp/foo', [self.context])
+        self.renderer.register('/tmp/bar', [self.context])
+        with patch.object(self.renderer, 'write') as _write:
+            _write.side_effect = lambda f: f == '/tmp/foo'
+            self.assertEqual(self.renderer.write_all(), {'/tmp/foo'})
+
+    def test_incremental_write_skips_unchanged(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        config_file = os.path.join(tmpdir, 'foo.conf')
+        other_file = os.path.join(tmpdir, 'bar.conf')
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom', incremental=True)
+        self.context.set(interfaces=['fooservice'], context={'foo': 'bar'})
+        renderer.register(config_file, [self.context])
+        renderer.register(other_file, [self.context])
+        output = {config_file: 'foo', other_file: 'bar'}
+        with patch.object(renderer, 'render') as _render:
+            _render.side_effect = lambda f: output[f]
+            self.assertEqual(renderer.write_all(),
+                             {config_file, other_file})
+            os.chmod(config_file, 0o640)
+            inode = os.stat(config_file).st_ino
+
+            self.assertEqual(renderer.write_all(), set())
+            self.assertEqual(os.stat(config_file).st_ino, inode)
+
+            output[config_file] = 'baz'
+            self.assertEqual(renderer.write_all(), {config_file})
+        with open(config_file) as f:
+            self.assertEqual(f.read(), 'baz')
+        self.assertNotEqual(os.stat(config_file).st_ino, inode)
+        self.assertEqual(os.stat(config_file).st_mode & 0o777, 0o640)
+        self.assertEqual(sorted(os.listdir(tmpdir)),
+                         ['bar.conf', 'foo.conf'])
+
+    def test_incremental_write_follows_symlink(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        os.mkdir(os.path.join(tmpdir, 'etc'))
+        os.mkdir(os.path.join(tmpdir, 'shared'))
+        target = os.path.join(tmpdir, 'shared', 'foo.conf')
+        config_file = os.path.join(tmpdir, 'etc', 'foo.conf')
+        with open(target, 'w') as f:
+            f.write('old')
+        os.symlink(os.path.join('..', 'shared', 'foo.conf'), config_file)
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom', incremental=True)
+        self.context.set(interfaces=['fooservice'], context={'foo': 'bar'})
+        renderer.register(config_file, [self.context])
+        with patch.object(renderer, 'render') as _render:
+            _render.return_value = 'new'
+            self.assertEqual(renderer.write_all(), {config_file})
+            self.assertEqual(renderer.write_all(), set())
+        self.assertTrue(os.path.islink(config_file))
+        with open(target) as f:
+            self.assertEqual(f.read(), 'new')
+        self.assertEqual(os.listdir(os.path.join(tmpdir, 'etc')),
+                         ['foo.conf'])
+        self.assertEqual(os.listdir(os.path.join(tmpdir, 'shared')),
+                         ['foo.conf'])
+
+    def test_incremental_memoizes_context(self):
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom', incremental=True)
+        context = MagicMock(return_value={'foo': 'bar'})
+        context.interfaces = ['fooservice']
+        renderer.register('/tmp/foo', [context])
+        ostmpl = renderer.templates['/tmp/foo']
+        self.assertEqual(ostmpl.context(), {'foo': 'bar'})
+        self.assertEqual(ostmpl.context(), {'foo': 'bar'})
+        self.assertEqual(ostmpl.complete_contexts(), ['fooservice'])
+        context.assert_called_once_with()
+        renderer.reset()
+        ostmpl.context()
+        self.assertEqual(context.call_count, 2)
+
+    def test_evaluator_calls_shared_generators_once(self):
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom', incremental=True)
+        context = MagicMock(return_value={'foo': 'bar'})
+        context.interfaces = ['fooservice']
+        renderer.register('/tmp/foo', [context])
+        renderer.register('/tmp/bar', [context])
+        self.assertEqual(renderer.templates['/tmp/foo'].context(),
+                         {'foo': 'bar'})
+        self.assertEqual(renderer.templates['/tmp/bar'].context(),
+                         {'foo': 'bar'})
+        context.assert_called_once_with()
+
+    def _patch(self, *args, **kwargs):
+        patcher = patch.object(*args, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def _tracking_renderer(self, config_files, contexts,
+                           track_dependencies=True):
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom', incremental=True,
+            track_dependencies=track_dependencies)
+        for config_file in config_files:
+            renderer.register(config_file, contexts)
+
+        def render(config_file):
+            ctxt = renderer.templates[config_file].context()
+            return ','.join('{}={}'.format(k, ctxt[k]) for k in sorted(ctxt))
+        self._patch(renderer, 'render', side_effect=render)
+        return renderer
+
+    def test_track_dependencies(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        foo = os.path.join(tmpdir, 'foo.conf')
+        bar = os.path.join(tmpdir, 'bar.conf')
+        self._patch(unitdata, '_KV', unitdata.Storage(':memory:'))
+        config = {'foo': 'bar'}
+        self._patch(hookenv, '_cache_config', config)
+        calls = []
+
+        def context():
+            calls.append(1)
+            return {'foo': hookenv.config('foo')}
+        context.interfaces = []
+        context.volatile = False
+
+        # first hook renders everything, evaluating the context once
+        renderer = self._tracking_renderer([foo, bar], [context])
+        self.assertEqual(renderer.write_all(), {foo, bar})
+        self.assertEqual(len(calls), 1)
+
+        # nothing changed, nothing is evaluated or written
+        renderer = self._tracking_renderer([foo, bar], [context])
+        self.assertEqual(renderer.write_all(), set())
+        self.assertEqual(len(calls), 1)
+
+        config['foo'] = 'baz'
+        renderer = self._tracking_renderer([foo, bar], [context])
+        self.assertEqual(renderer.write_all(), {foo, bar})
+        self.assertEqual(len(calls), 2)
+        with open(foo) as f:
+            self.assertEqual(f.read(), 'foo=baz')
+
+        # a file modified behind our back is rendered again
+        with open(foo, 'w') as f:
+            f.write('junk')
+        renderer = self._tracking_renderer([foo, bar], [context])
+        self.assertEqual(renderer.write_all(), {foo})
+        self.assertEqual(len(calls), 3)
+
+        # as is everything after a release change
+        renderer = self._tracking_renderer([foo, bar], [context])
+        renderer.openstack_release = 'grizzly'
+        self.assertEqual(renderer.write_all(), set())
+        self.assertEqual(len(calls), 4)
+
+    def test_track_dependencies_volatile(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        foo = os.path.join(tmpdir, 'foo.conf')
+        self._patch(unitdata, '_KV', unitdata.Storage(':memory:'))
+        context = MagicMock(return_value={'foo': 'bar'})
+        context.interfaces = []
+        for _ in range(2):
+            renderer = self._tracking_renderer([foo], [context])
+            renderer.write_all()
+        # the context makes no Juju queries, so it is always evaluated
+        self.assertEqual(context.call_count, 2)
+
+    def test_track_dependencies_volatile_by_default(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        foo = os.path.join(tmpdir, 'foo.conf')
+        self._patch(unitdata, '_KV', unitdata.Storage(':memory:'))
+        self._patch(hookenv, '_cache_config', {'foo': 'bar'})
+        calls = []
+
+        def context():
+            calls.append(1)
+            return {'foo': hookenv.config('foo')}
+        context.interfaces = []
+
+        for _ in range(2):
+            renderer = self._tracking_renderer([foo], [context])
+            renderer.write_all()
+        # it may read local state as well, so it is never skipped
+        self.assertEqual(len(calls), 2)
+
+    def test_write_all_parallel(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        config_files = [os.path.join(tmpdir, '{}.conf'.format(i))
+                        for i in range(8)]
+        context = MagicMock(return_value={'foo': 'bar'})
+        context.interfaces = []
+        renderer = self._tracking_renderer(config_files, [context],
+                                           track_dependencies=False)
+        written = []
+        _write_rendered = renderer._write_rendered
+
+        def record(config_file, content):
+            written.append(config_file)
+            return _write_rendered(config_file, content)
+        self._patch(renderer, '_write_rendered', side_effect=record)
+
+        self.assertEqual(renderer.write_all(parallel=4), set(config_files))
+        self.assertEqual(written, config_files)
+        self.assertEqual(sorted(renderer.timings), sorted(config_files))
+        context.assert_called_once_with()
+        for config_file in config_files:
+            with open(config_file) as f:
+                self.assertEqual(f.read(), 'foo=bar')
+
+    def test_write_all_parallel_shared_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.addCleanup(hookenv.cache.clear)
+        hookenv.cache.clear()
+        calls = []
+
+        @hookenv.cached
+        def relation_query(attribute, rid):
+            calls.append((attribute, rid))
+            return '{}-{}'.format(attribute, rid)
+
+        def make_context(i):
+            def context():
+                return {'foo': relation_query('attr{}'.format(i % 4),
+                                              'db:{}'.format(i % 2))}
+            context.interfaces = []
+            return context
+
+        config_files = [os.path.join(tmpdir, '{}.conf'.format(i))
+                        for i in range(16)]
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom', incremental=True)
+        for i, config_file in enumerate(config_files):
+            renderer.register(config_file, [make_context(i)])
+
+        def render(config_file):
+            return 'foo={foo}'.format(
+                **renderer.templates[config_file].context())
+        self._patch(renderer, 'render', side_effect=render)
+
+        self.assertEqual(renderer.write_all(parallel=4), set(config_files))
+        self.assertEqual(relation_query.cache_info().currsize, 4)
+        with open(config_files[5]) as f:
+            self.assertEqual(f.read(), 'foo=attr1-db:1')
+        hookenv.flush('db:1')
+        self.assertEqual(relation_query.cache_info().currsize, 2)
+        hookenv.flush('db:0')
+        self.assertEqual(hookenv.cache, {})
+        self.assertEqual(hookenv._cache_index, {})
+        del calls[:]
+        relation_query('attr1', 'db:1')
+        self.assertEqual(calls, [('attr1', 'db:1')])
+
+    def test_write_all_parallel_error(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        config_files = [os.path.join(tmpdir, '{}.conf'.format(i))
+                        for i in range(3)]
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom', incremental=True)
+        for config_file in config_files:
+            renderer.register(config_file, [])
+
+        def render(config_file):
+            if config_file == config_files[1]:
+                raise templating.OSConfigException
+            return 'ok'
+        self._patch(renderer, 'render', side_effect=render)
+        self.assertRaises(templating.OSConfigException,
+                          renderer.write_all, parallel=3)
+        self.assertEqual(os.listdir(tmpdir), ['0.conf'])
+
+    def test_write_all_parallel_not_incremental(self):
+        context = MagicMock(return_value={'foo': 'bar'})
+        context.interfaces = []
+        renderer = templating.OSConfigRenderer(
+            templates_dir=os.path.dirname(__file__),
+            openstack_release='folsom')
+        renderer.register('/tmp/foo', [context])
+        renderer.register('/tmp/bar', [context])
+        render = self._patch(renderer, 'render')
+        # the shared context would be called by several threads at once
+        self.assertRaises(ValueError, renderer.write_all, parallel=2)
+        render.assert_not_called()
+        context.assert_not_called()
+
     @patch.object(templating, 'get_loader')
     def test_reset_template_loader_for_new_os_release(self, loader):
         self.loader.set('')
@@ -1217,6 +1217,91 @@ class CephUtilsTests(TestCase):
         self.assertTrue(ceph_utils.pool_exists('cinder', 'volumes'))
         self.assertTrue(ceph_utils.pool_exists('rgw', '.rgw.foo'))
 
+    def _fake_cluster(self):
+        osd_dump = json.loads(OSD_DUMP.decode('UTF-8'))
+        osd_dump['erasure_code_profiles'] = {
+            'default': {'k': '2', 'm': '1', 'plugin': 'jerasure'}}
+
+        def check_output(cmd):
+            if cmd[3:5] == ['osd', 'dump']:
+                return json.dumps(osd_dump).encode('UTF-8')
+            if cmd[3:5] == ['osd', 'ls']:
+                return json.dumps([0, 1, 2]).encode('UTF-8')
+            if cmd[3:6] == ['osd', 'crush', 'class']:
+                return json.dumps([1]).encode('UTF-8')
+            raise AssertionError(cmd)
+        self.check_output.side_effect = check_output
+        return osd_dump
+
+    def test_cluster_snapshot(self):
+        osd_dump = self._fake_cluster()
+        with ceph_utils.CephClusterSnapshot('admin') as snapshot:
+            self.assertTrue(ceph_utils.pool_exists('admin', 'rbd'))
+            self.assertFalse(ceph_utils.pool_exists('admin', 'foo'))
+            self.assertEqual(ceph_utils.get_cache_mode('admin', 'rbd'),
+                             'writeback')
+            self.assertIsNone(ceph_utils.get_cache_mode('admin', 'foo'))
+            self.assertTrue(ceph_utils.erasure_profile_exists('admin',
+                                                              'default'))
+            self.assertFalse(ceph_utils.erasure_profile_exists('admin',
+                                                               'other'))
+            self.assertEqual(ceph_utils.get_erasure_profile('admin',
+                                                            'default')['k'],
+                             '2')
+            for _ in range(2):
+                self.assertEqual(ceph_utils.get_osds('admin'), [0, 1, 2])
+                self.assertEqual(ceph_utils.get_osds('admin', 'ssd'), [1])
+            self.assertEqual(self.check_output.call_count, 3)
+
+            # changes made by the helpers refresh the pools
+            osd_dump['pools'].append({'pool_name': 'foo',
+                                      'cache_mode': 'none'})
+            ceph_utils.create_pool('admin', 'foo', pg_num=8)
+            self.assertTrue(ceph_utils.pool_exists('admin', 'foo'))
+            self.assertEqual(ceph_utils.get_osds('admin'), [0, 1, 2])
+            self.assertEqual(self.check_output.call_count, 4)
+
+            snapshot.refresh()
+            self.assertEqual(ceph_utils.get_osds('admin'), [0, 1, 2])
+            self.assertEqual(self.check_output.call_count, 5)
+
+            # other users are not answered from the snapshot
+            self.check_output.side_effect = None
+            self.check_output.return_value = LS_POOLS
+            self.assertFalse(ceph_utils.pool_exists('cinder', 'foo'))
+        self.assertIsNone(ceph_utils._cluster_snapshot)
+
+    def test_cluster_snapshot_errors(self):
+        self.check_output.side_effect = CalledProcessError(1, 'ceph')
+        with ceph_utils.CephClusterSnapshot('admin'):
+            self.assertFalse(ceph_utils.pool_exists('admin', 'rbd'))
+            self.assertFalse(ceph_utils.erasure_profile_exists('admin',
+                                                               'default'))
+            self.assertIsNone(ceph_utils.get_erasure_profile('admin',
+                                                             'default'))
+
+    @patch.object(ceph_utils, '_enabled_manager_modules')
+    def test_cluster_snapshot_manager_modules(self, _enabled_manager_modules):
+        _enabled_manager_modules.return_value = ['pg_autoscaler']
+        with ceph_utils.CephClusterSnapshot('admin') as snapshot:
+            for _ in range(2):
+                self.assertEqual(snapshot.enabled_manager_modules(),
+                                 ['pg_autoscaler'])
+        _enabled_manager_modules.assert_called_once_with()
+
+    def test_cluster_snapshot_pool_create(self):
+        self._fake_cluster()
+        self.test_config.set('expected-osd-count', None)
+        self.test_config.set('pgs-per-osd', None)
+        with ceph_utils.CephClusterSnapshot('admin'):
+            for name in ('rbd', 'foo', 'bar'):
+                ceph_utils.ReplicatedPool('admin', name=name).create()
+        # the osd dump is read again after a pool is created, osd ls once.
+        self.assertEqual(self.check_output.call_count, 3)
+        created = [c[0][0][-3] for c in self.check_call.call_args_list
+                   if c[0][0][3:6] == ['osd', 'pool', 'create']]
+        self.assertEqual(created, ['foo', 'bar'])
+
     def test_pool_does_not_exist(self):
         """It detects an rbd pool exists"""
         self.check_output.return_value = LS_POOLS
@@ -1,6 +1,7 @@
 import tempfile
 import os
 
+from mock import patch
 from shutil import rmtree
 from testtools import TestCase
 
@@ -61,3 +62,22 @@ class Jinja2Test(TestCase):
                         template_dir=self.templates_dir,
                         jinja_env_args=jinja_env_args)
         self.assertEqual(expected, result)
+
+    def test_cache_per_options(self):
+        charm_dir = tempfile.mkdtemp()
+        self.addCleanup(rmtree, charm_dir)
+        name = "custom_delimiters"
+        self._write_template_to_file(name, CUSTOM_DELIM_TEMPLATE)
+        context = {'not_var': 'a', 'template_var': 'b'}
+        jinja_env_args = {"variable_start_string": "<<",
+                          "variable_end_string": ">>"}
+        with patch('charmhelpers.core.hookenv.charm_dir',
+                   return_value=charm_dir):
+            for _ in range(2):
+                self.assertEqual(
+                    render(name, context, template_dir=self.templates_dir),
+                    "a << template_var >>")
+                self.assertEqual(
+                    render(name, context, template_dir=self.templates_dir,
+                           jinja_env_args=jinja_env_args),
+                    "{{ not_var }} b")
@@ -1,13 +1,17 @@
 from enum import Enum
+import functools
 import io
 import json
 import os
 from mock import call, MagicMock, mock_open, patch, sentinel
 import pickle
 import shutil
+import stat
 from subprocess import CalledProcessError
 from testtools import TestCase
 import tempfile
+import sys
+import threading
 import types
 import yaml
 
@@ -31,6 +35,7 @@ peers:
 
 def _clean_globals():
     hookenv.cache.clear()
+    hookenv.clear_relation_snapshot()
     del hookenv._atstart[:]
     del hookenv._atexit[:]
 
@@ -1500,6 +1505,163 @@ class HelpersTest(TestCase):
         self.assertEqual(cache_function(unserializable), 'qux')
         self.assertEqual(calls, ['hello', 'foo', 'baz', unserializable])
 
+    def test_cached_decorator_unhashable_args(self):
+        calls = []
+
+        @hookenv.cached
+        def cache_function(settings, keys=None):
+            calls.append(settings)
+            return len(settings)
+
+        self.assertEqual(cache_function({'a': 1}, keys=['a']), 1)
+        self.assertEqual(cache_function({'a': 1}, keys=['a']), 1)
+        self.assertEqual(cache_function({'a': 1}), 1)
+        self.assertEqual(calls, [{'a': 1}, {'a': 1}])
+
+    def test_cached_decorator_cache_info(self):
+        @hookenv.cached
+        def cache_function(attribute):
+            return attribute
+
+        cache_function('foo')
+        cache_function('foo')
+        cache_function('bar')
+        self.assertEqual(cache_function.cache_info(),
+                         hookenv.CacheInfo(hits=1, misses=2, maxsize=None,
+                                           currsize=2))
+        cache_function.cache_clear()
+        self.assertEqual(cache_function.cache_info().currsize, 0)
+
+    def test_cached_decorator_maxsize(self):
+        calls = []
+
+        @hookenv.cached(maxsize=2)
+        def cache_function(attribute):
+            calls.append(attribute)
+            return attribute
+
+        cache_function('a')
+        cache_function('b')
+        cache_function('a')
+        cache_function('c')  # evicts 'b', the least recently used
+        cache_function('a')
+        cache_function('b')
+        self.assertEqual(calls, ['a', 'b', 'c', 'b'])
+        self.assertEqual(cache_function.cache_info().currsize, 2)
+
+    def test_cache_clear_resets_index(self):
+        calls = []
+
+        @hookenv.cached(maxsize=2)
+        def cache_function(attribute):
+            calls.append(attribute)
+            return attribute
+
+        cache_function('a')
+        cache_function('b')
+        hookenv.cache.clear()
+        self.assertEqual(hookenv._cache_index, {})
+        self.assertEqual(hookenv._cache_key_tokens, {})
+        self.assertEqual(len(hookenv._cache_lru[cache_function._wrapped]), 0)
+        cache_function('c')
+        cache_function('d')
+        cache_function('c')
+        self.assertEqual(calls, ['a', 'b', 'c', 'd'])
+        self.assertEqual(cache_function.cache_info().currsize, 2)
+
+    def test_flush_only_matching_entries(self):
+        @hookenv.cached
+        def cache_function(unit=None, rid=None):
+            return (unit, rid)
+
+        @hookenv.cached
+        def other_function(unit):
+            return unit
+
+        cache_function(unit='foo/0', rid='db:1')
+        cache_function(unit='bar/0', rid='db:1')
+        cache_function(unit='foo/0', rid='db:2')
+        other_function('foo/0')
+        self.assertEqual(len(hookenv.cache), 4)
+        hookenv.flush('db:1')
+        self.assertEqual(len(hookenv.cache), 2)
+        hookenv.flush('other_function')
+        self.assertEqual(len(hookenv.cache), 1)
+        cache_function(unit='foo/0')
+        # whole names only
+        hookenv.flush('foo')
+        self.assertEqual(len(hookenv.cache), 2)
+        hookenv.flush('foo/0')
+        self.assertEqual(len(hookenv.cache), 0)
+        self.assertEqual(hookenv._cache_index, {})
+
+    def test_cached_concurrent_misses(self):
+        @hookenv.cached
+        def cache_function(unit, rid):
+            return (unit, rid)
+
+        @hookenv.cached(maxsize=8)
+        def bounded_function(unit, rid):
+            return (unit, rid)
+
+        def worker():
+            for i in range(200):
+                cache_function('foo/{}'.format(i % 30), 'db:{}'.format(i % 3))
+                bounded_function('bar/{}'.format(i % 20), 'db:1')
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache_function.cache_info().currsize, 30)
+        self.assertEqual(bounded_function.cache_info().currsize, 8)
+        self.assertEqual(set(hookenv._cache_key_tokens), set(hookenv.cache))
+        hookenv.flush('db:1')
+        self.assertEqual(len(hookenv.cache), 20)
+        for rid in ('db:0', 'db:2'):
+            hookenv.flush(rid)
+        self.assertEqual(hookenv.cache, {})
+        self.assertEqual(hookenv._cache_index, {})
+        self.assertEqual(hookenv._cache_key_tokens, {})
+
+    @patch('subprocess.check_output')
+    def test_record_inputs(self, check_output_):
+        @hookenv.cached
+        def cache_function(unit, rid=None):
+            return unit
+
+        check_output_.return_value = b'true'
+        cache_function('foo/0')
+        with hookenv.record_inputs() as inputs:
+            cache_function('foo/0')
+            cache_function('bar/0', rid='db:1')
+            hookenv.is_leader()
+        cache_function('baz/0')
+        module = cache_function.__module__
+        self.assertEqual(inputs, [
+            (module, 'cache_function', ('foo/0',), {}, 'foo/0'),
+            (module, 'cache_function', ('bar/0',), {'rid': 'db:1'}, 'bar/0'),
+            ('charmhelpers.core.hookenv', 'is_leader', (), {}, True),
+        ])
+        self.assertEqual(hookenv._input_recorders.active, [])
+
+    def test_record_inputs_nested(self):
+        @hookenv.cached
+        def cache_function(unit):
+            return unit
+
+        with hookenv.record_inputs() as outer:
+            with hookenv.record_inputs() as inner:
+                pass
+            cache_function('foo/0')
+        module = cache_function.__module__
+        self.assertEqual(inner, [])
+        self.assertEqual(outer, [
+            (module, 'cache_function', ('foo/0',), {}, 'foo/0'),
+        ])
+        self.assertEqual(hookenv._input_recorders.active, [])
+
     def test_gets_charm_dir(self):
         with patch.dict('os.environ', {}):
             self.assertEqual(hookenv.charm_dir(), None)
@@ -2019,6 +2181,41 @@ class HooksTest(TestCase):
         self.assertFalse(hookenv.has_juju_version('1.25'))
         self.assertTrue(hookenv.has_juju_version('1.18-backport6'))
 
+    def test_gather(self):
+        # Both calls must be running at the same time to pass the barrier.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        self.assertEqual(
+            hookenv.gather(functools.partial(call, 'a'),
+                           functools.partial(call, 'b')),
+            ['a', 'b'])
+        self.assertEqual(hookenv.gather(), [])
+
+    def test_gather_raises_first_failure(self):
+        calls = []
+
+        def fail(exc):
+            calls.append(exc)
+            raise exc
+
+        first, second = ValueError('first'), KeyError('second')
+        with self.assertRaises(ValueError):
+            hookenv.gather(lambda: 1, functools.partial(fail, first),
+                           functools.partial(fail, second), max_workers=1)
+        self.assertEqual(calls, [first, second])
+
+    @patch('subprocess.check_output')
+    def test_gather_hook_tools(self, check_output):
+        check_output.side_effect = lambda cmd: json.dumps(cmd[0]).encode()
+        self.assertEqual(
+            hookenv.gather(hookenv.leader_get,
+                           functools.partial(hookenv.unit_get, 'foo')),
+            ['leader-get', 'unit-get'])
+
     @patch.object(hookenv, 'relation_to_role_and_interface')
     def test_relation_to_interface(self, rtri):
         rtri.return_value = (None, 'foo')
@@ -2426,3 +2623,134 @@ ingress-addresses:
         self.assertFalse(hookenv._contains_range("192.168.1"))
         self.assertFalse(hookenv._contains_range("192.168.145"))
         self.assertFalse(hookenv._contains_range("192.16.14"))
+
+
+HOOK_TOOL_STUB = """#!{python}
+import json
+import os
+import sys
+
+tool = os.path.basename(sys.argv[0])
+args = [a for a in sys.argv[1:] if not a.startswith('--format')]
+with open(os.environ['STUB_HOOK_TOOL_LOG'], 'a') as log:
+    log.write(tool + '\\n')
+with open(os.environ['STUB_HOOK_TOOL_DATA']) as f:
+    data = json.load(f)
+if tool == 'relation-ids':
+    result = data['relation-ids'].get(args[0], [])
+elif tool == 'relation-list':
+    result = data['relation-list'][args[1]]
+else:
+    rid, attribute, unit = args[1], args[2], args[3]
+    result = data['relation-get'][rid][unit]
+    if attribute != '-':
+        result = result.get(attribute)
+print(json.dumps(result))
+"""
+
+
+class RelationSnapshotTest(TestCase):
+    """Count hook tool spawns against stub hook tools on PATH."""
+
+    def setUp(self):
+        super(RelationSnapshotTest, self).setUp()
+        _clean_globals()
+        self.addCleanup(_clean_globals)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.units = ['rabbitmq-server/{}'.format(i) for i in range(9)]
+        data = {
+            'relation-ids': {'amqp': ['amqp:1'], 'cluster': ['cluster:2']},
+            'relation-list': {'amqp:1': self.units[:3],
+                              'cluster:2': self.units[3:]},
+            'relation-get': {
+                'amqp:1': {u: {'hostname': u, 'password': 'secret'}
+                           for u in ['nova/0'] + self.units[:3]},
+                'cluster:2': {u: {'hostname': u}
+                              for u in ['nova/0'] + self.units[3:]},
+            },
+        }
+        data_path = os.path.join(self.tmpdir, 'data.json')
+        with open(data_path, 'w') as f:
+            json.dump(data, f)
+        self.log_path = os.path.join(self.tmpdir, 'spawns.log')
+        bindir = os.path.join(self.tmpdir, 'bin')
+        os.mkdir(bindir)
+        for tool in ('relation-ids', 'relation-list', 'relation-get'):
+            path = os.path.join(bindir, tool)
+            with open(path, 'w') as f:
+                f.write(HOOK_TOOL_STUB.format(python=sys.executable))
+            os.chmod(path, stat.S_IRWXU)
+        env = {
+            'PATH': '{}:{}'.format(bindir, os.environ.get('PATH', '')),
+            'STUB_HOOK_TOOL_LOG': self.log_path,
+            'STUB_HOOK_TOOL_DATA': data_path,
+            'JUJU_UNIT_NAME': 'nova/0',
+        }
+        patcher = patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(hookenv, 'relation_types',
+                               lambda: ['amqp', 'cluster'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def spawns(self):
+        if not os.path.exists(self.log_path):
+            return 0
+        with open(self.log_path) as f:
+            return len(f.readlines())
+
+    def query_all(self):
+        results = []
+        for reltype in ('amqp', 'cluster'):
+            for rid in hookenv.relation_ids(reltype):
+                for unit in hookenv.related_units(rid):
+                    for key in ('hostname', 'password', 'missing'):
+                        results.append(hookenv.relation_get(key, unit, rid))
+        return results
+
+    def test_spawns_without_snapshot(self):
+        results = self.query_all()
+        self.assertEqual(results.count('rabbitmq-server/4'), 1)
+        # 2 relation-ids, 2 relation-list, 9 units x 3 keys relation-get
+        self.assertEqual(self.spawns(), 31)
+
+    def test_spawns_with_snapshot(self):
+        hookenv.relation_snapshot()
+        results = self.query_all()
+        self.assertEqual(results.count('rabbitmq-server/4'), 1)
+        self.assertEqual(results.count('secret'), 3)
+        # 2 relation-ids, 2 relation-list, (9 + 2 local) relation-get
+        self.assertEqual(self.spawns(), 15)
+        self.assertEqual(hookenv.relation_get(rid='amqp:1', unit='nova/0'),
+                         {'hostname': 'nova/0', 'password': 'secret'})
+        self.assertEqual(self.spawns(), 15)
+
+    def test_snapshot_falls_back_for_unknown_units(self):
+        hookenv.relation_snapshot(reltypes=['amqp'])
+        self.assertEqual(self.spawns(), 6)
+        self.assertEqual(hookenv.relation_ids('cluster'), ['cluster:2'])
+        self.assertEqual(
+            hookenv.relation_get('hostname', 'rabbitmq-server/4',
+                                 'cluster:2'),
+            'rabbitmq-server/4')
+        self.assertEqual(self.spawns(), 8)
+
+    def test_snapshot_defaults_to_hook_relation(self):
+        snapshot = hookenv.relation_snapshot()
+        with patch.dict(os.environ, {'JUJU_RELATION_ID': 'amqp:1',
+                                     'JUJU_REMOTE_UNIT': self.units[1]}):
+            self.assertEqual(snapshot.relation_get('hostname'),
+                             self.units[1])
+
+    def test_snapshot_invalidate(self):
+        snapshot = hookenv.relation_snapshot()
+        snapshot.invalidate(rid='amqp:1', unit='nova/0')
+        self.assertRaises(KeyError, snapshot.relation_get,
+                          unit='nova/0', rid='amqp:1')
+        self.assertEqual(snapshot.relation_get('hostname', 'nova/0',
+                                               'cluster:2'), 'nova/0')
+        snapshot.invalidate()
+        self.assertRaises(KeyError, snapshot.relation_get,
+                          unit='nova/0', rid='cluster:2')
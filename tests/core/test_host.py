@@ -1,9 +1,12 @@
+import datetime
+import hashlib
 import os.path
 from collections import OrderedDict
 import subprocess
 from tempfile import mkdtemp
 from shutil import rmtree
 from textwrap import dedent
+import time
 
 try:
     import imp
@@ -17,6 +20,7 @@ from tests.helpers import patch_open
 from tests.helpers import mock_open as mocked_open
 
 from charmhelpers.core import host
+from charmhelpers.core import unitdata
 from charmhelpers.fetch import ubuntu_apt_pkg
 
 
@@ -51,6 +55,7 @@ CPE_NAME="cpe:/o:centos:centos:7"
 ID="centos"
 '''
 
+
 IP_LINE_ETH0 = b"""
 2: eth0: <BROADCAST,MULTICAST,SLAVE,UP,LOWER_UP> mtu 1500 qdisc mq master bond0 state UP qlen 1000
     link/ether e4:11:5b:ab:a7:3c brd ff:ff:ff:ff:ff:ff
@@ -71,8 +76,6 @@ IP_LINE_ETH1 = b"""
     link/ether e4:11:5b:ab:a7:3c brd ff:ff:ff:ff:ff:ff
 """
 
-IP_LINE_HWADDR = b"""2: eth0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc pfifo_fast state UP qlen 1000\\    link/ether e4:11:5b:ab:a7:3c brd ff:ff:ff:ff:ff:ff"""
-
 IP_LINES = IP_LINE_ETH0 + IP_LINE_ETH1 + IP_LINE_ETH0_VLAN + IP_LINE_ETH100
 
 IP_LINE_BONDS = b"""
@@ -81,6 +84,70 @@ link/ether 08:00:27:16:b9:5f brd ff:ff:ff:ff:ff:ff
 """
 
 
+def fake_sys_class_net(root, nics):
+    """Lay out a /sys/class/net like tree under root.
+
+    :param nics: list of (name, attributes) in ifindex order. The attributes
+                 may include 'virtual', 'bonding', 'bridge', 'master',
+                 'brport' (name of the bridge) and 'lower', the others are
+                 written as files, eg. 'mtu'.
+    :returns: path of the class/net directory
+    """
+    class_net = os.path.join(root, 'class', 'net')
+    os.makedirs(class_net)
+    for ifindex, (name, attributes) in enumerate(nics, 1):
+        attributes = dict(attributes)
+        if attributes.pop('virtual', False):
+            device = os.path.join(root, 'devices', 'virtual', 'net', name)
+        else:
+            device = os.path.join(root, 'devices', 'pci0000:00',
+                                  '0000:00:1c.{}'.format(ifindex), 'net',
+                                  name)
+        os.makedirs(device)
+        os.symlink(device, os.path.join(class_net, name))
+        for directory in ('bonding', 'bridge'):
+            if attributes.pop(directory, False):
+                os.mkdir(os.path.join(device, directory))
+        master = attributes.pop('master', None)
+        if master:
+            os.symlink(os.path.join(class_net, master),
+                       os.path.join(device, 'master'))
+        brport = attributes.pop('brport', None)
+        if brport:
+            os.mkdir(os.path.join(device, 'brport'))
+            os.symlink(os.path.join(class_net, brport),
+                       os.path.join(device, 'brport', 'bridge'))
+        for lower in attributes.pop('lower', ()):
+            os.symlink(os.path.join(class_net, lower),
+                       os.path.join(device, 'lower_' + lower))
+        attributes.setdefault('ifindex', ifindex)
+        attributes.setdefault('type', 1)
+        for attribute, value in attributes.items():
+            with open(os.path.join(device, attribute), 'w') as f:
+                f.write('{}\n'.format(value))
+    return class_net
+
+
+SYS_CLASS_NET = [
+    ('lo', {'virtual': True, 'mtu': 65536, 'type': 772,
+            'address': '00:00:00:00:00:00'}),
+    ('eth0', {'mtu': 1500, 'address': 'e4:11:5b:ab:a7:3c',
+              'master': 'bond0'}),
+    ('eth1', {'mtu': 1546, 'address': 'e4:11:5b:ab:a7:3c',
+              'master': 'bond0'}),
+    ('bond0', {'virtual': True, 'bonding': True, 'mtu': 1500,
+               'address': 'e4:11:5b:ab:a7:3c'}),
+    ('eth0.10', {'virtual': True, 'mtu': 1500,
+                 'address': '08:00:27:16:b9:5f', 'lower': ['eth0']}),
+    ('eth100', {'mtu': 9000, 'address': 'e4:11:5b:ab:a7:3d',
+                'brport': 'br0'}),
+    ('br0', {'virtual': True, 'bridge': True, 'mtu': 9000,
+             'address': 'e4:11:5b:ab:a7:3d'}),
+    ('bond0.10', {'virtual': True, 'mtu': 1500,
+                  'address': '08:00:27:16:b9:60', 'lower': ['bond0']}),
+]
+
+
 class HelpersTest(TestCase):
     @patch('charmhelpers.core.host.lsb_release')
     @patch('os.path')
@@ -627,6 +694,81 @@ class HelpersTest(TestCase):
         self.assertFalse(host.service_running('keystone'))
         service.assert_called_with('status', 'keystone')
 
+    @patch('subprocess.check_output')
+    def test_services_state(self, check_output):
+        check_output.return_value = (
+            'ActiveState=active\n'
+            'SubState=running\n'
+            'ExecMainStartTimestamp=Tue 2021-02-02 13:19:54 UTC\n'
+            'ActiveEnterTimestamp=Tue 2021-02-02 13:19:55 UTC\n'
+            '\n'
+            'ActiveState=inactive\n'
+            'SubState=dead\n'
+            'ExecMainStartTimestamp=\n'
+            'ActiveEnterTimestamp=\n')
+        states = host.services_state(['nova-api', 'missing'])
+        self.assertEqual(list(states), ['nova-api', 'missing'])
+        self.assertEqual(states['nova-api'], host.ServiceState(
+            active_state='active',
+            sub_state='running',
+            active_enter_time=datetime.datetime(2021, 2, 2, 13, 19, 55),
+            main_start_time=datetime.datetime(2021, 2, 2, 13, 19, 54)))
+        self.assertEqual(states['missing'], host.ServiceState(
+            'inactive', 'dead', None, None))
+        check_output.assert_called_once_with(
+            ['systemctl', 'show',
+             '--property=ActiveState,SubState,ActiveEnterTimestamp,'
+             'ExecMainStartTimestamp', 'nova-api', 'missing'],
+            universal_newlines=True)
+
+    @patch.object(host, 'init_is_systemd')
+    @patch('subprocess.check_output')
+    def test_services_state_unparsable_timestamps(self, check_output,
+                                                  systemd):
+        systemd.return_value = True
+        check_output.return_value = (
+            'ActiveState=active\n'
+            'SubState=running\n'
+            'ExecMainStartTimestamp=n/a\n'
+            'ActiveEnterTimestamp=Tue 2021-02-02 13:19:55 CET\n')
+        self.assertEqual(host.services_state(['nova-api'])['nova-api'],
+                         host.ServiceState('active', 'running', None, None))
+        self.assertEqual(host.services_running(['nova-api']), [True])
+
+    @patch('subprocess.check_output')
+    def test_services_state_no_services(self, check_output):
+        self.assertEqual(host.services_state([]), {})
+        self.assertFalse(check_output.called)
+
+    @patch.object(host, 'service_running')
+    @patch.object(host, 'services_state')
+    @patch.object(host, 'init_is_systemd')
+    def test_services_running(self, systemd, services_state,
+                              service_running):
+        systemd.side_effect = lambda service_name: service_name != 'sysv'
+        services_state.return_value = {
+            'api': host.ServiceState('active', 'running', None, None),
+            'conductor': host.ServiceState('failed', 'failed', None, None),
+        }
+        service_running.return_value = True
+        self.assertEqual(
+            host.services_running(['api', 'sysv', 'conductor']),
+            [True, True, False])
+        services_state.assert_called_once_with(['api', 'conductor'])
+        service_running.assert_called_once_with('sysv')
+
+    @patch.object(host, 'service_running')
+    @patch.object(host, 'services_state')
+    @patch.object(host, 'init_is_systemd')
+    def test_services_running_query_fails(self, systemd, services_state,
+                                          service_running):
+        systemd.return_value = True
+        services_state.side_effect = subprocess.CalledProcessError(
+            1, ['systemctl'])
+        service_running.side_effect = [True, False]
+        self.assertEqual(host.services_running(['api', 'bad name']),
+                         [True, False])
+
     @patch('subprocess.call')
     @patch.object(host, 'init_is_systemd')
     def test_service_start_with_params(self, systemd, call):
@@ -1426,7 +1568,8 @@ class HelpersTest(TestCase):
         m = md5()
         m.hexdigest.return_value = self._hash_files[filename]
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.return_value = self._hash_files[filename]
+            mock_file.read.side_effect = [
+                self._hash_files[filename], b'']
             result = host.file_hash(filename)
             self.assertEqual(result, self._hash_files[filename])
 
@@ -1447,10 +1590,119 @@ class HelpersTest(TestCase):
         m = sha1()
         m.hexdigest.return_value = self._hash_files[filename]
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.return_value = self._hash_files[filename]
+            mock_file.read.side_effect = [
+                self._hash_files[filename], b'']
             result = host.file_hash(filename, hash_type='sha1')
             self.assertEqual(result, self._hash_files[filename])
 
+    def test_file_hash_streams_chunks(self):
+        tmpdir = mkdtemp()
+        self.addCleanup(rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'big')
+        data = b'x' * (host.HASH_CHUNK_SIZE * 2 + 1)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.assertEqual(host.file_hash(path),
+                         hashlib.md5(data).hexdigest())
+        self.assertEqual(host.file_hash(path, hash_type='blake2b'),
+                         hashlib.blake2b(data).hexdigest())
+
+    def test_file_hash_short_reads(self):
+        with patch_open() as (mock_open, mock_file):
+            mock_file.read.side_effect = [b'lots of', b' nice', b' data', b'']
+            self.assertEqual(
+                host.file_hash(__file__),
+                hashlib.md5(b'lots of nice data').hexdigest())
+
+    @patch.object(host, 'file_hash')
+    def test_fingerprinted_file_hash(self, file_hash):
+        tmpdir = mkdtemp()
+        self.addCleanup(rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'conf')
+        with open(path, 'w') as f:
+            f.write('foo')
+        old = time.time_ns() - 10 * 10 ** 9
+        os.utime(path, ns=(old, old))
+        file_hash.return_value = 'hash1'
+        kv = unitdata.Storage(':memory:')
+        with patch.object(host.unitdata, 'kv', return_value=kv):
+            self.assertEqual(host.fingerprinted_file_hash(path), 'hash1')
+            self.assertEqual(host.fingerprinted_file_hash(path), 'hash1')
+            file_hash.assert_called_once_with(path, 'md5')
+            # A different digest is not answered from the fingerprint
+            host.fingerprinted_file_hash(path, 'sha256')
+            file_hash.assert_called_with(path, 'sha256')
+            # Touching the file invalidates the fingerprint
+            os.utime(path, ns=(old + 1, old + 1))
+            file_hash.return_value = 'hash2'
+            self.assertEqual(host.fingerprinted_file_hash(path), 'hash2')
+            self.assertEqual(file_hash.call_count, 3)
+
+    @patch.object(host, 'file_hash')
+    def test_fingerprinted_file_hash_recently_modified(self, file_hash):
+        tmpdir = mkdtemp()
+        self.addCleanup(rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'conf')
+        with open(path, 'w') as f:
+            f.write('foo')
+        file_hash.return_value = 'hash1'
+        kv = unitdata.Storage(':memory:')
+        with patch.object(host.unitdata, 'kv', return_value=kv):
+            host.fingerprinted_file_hash(path)
+            host.fingerprinted_file_hash(path)
+        self.assertEqual(file_hash.call_count, 2)
+
+    @patch.object(host, 'file_hash')
+    def test_fingerprinted_file_hash_missing(self, file_hash):
+        file_hash.return_value = None
+        self.assertEqual(
+            host.fingerprinted_file_hash('/does/not/exist'), None)
+        file_hash.assert_called_once_with('/does/not/exist', 'md5')
+
+    @patch.object(host, 'service')
+    def test_restart_on_change_only_hashes_changed_files(self, service):
+        tmpdir = mkdtemp()
+        self.addCleanup(rmtree, tmpdir)
+        old = time.time_ns() - 10 * 10 ** 9
+        restart_map = {}
+        for i in range(3):
+            path = os.path.join(tmpdir, 'conf{}'.format(i))
+            with open(path, 'w') as f:
+                f.write('foo')
+            os.utime(path, ns=(old, old))
+            restart_map[path] = ['svc{}'.format(i)]
+        changed = os.path.join(tmpdir, 'conf1')
+
+        @host.restart_on_change(restart_map, fingerprint=True)
+        def write_config():
+            with open(changed, 'w') as f:
+                f.write('bar')
+
+        kv = unitdata.Storage(':memory:')
+        with patch.object(host.unitdata, 'kv', return_value=kv):
+            host._pre_restart_on_change_helper(restart_map, fingerprint=True)
+            with patch.object(host, 'file_hash',
+                              wraps=host.file_hash) as file_hash:
+                write_config()
+        file_hash.assert_called_once_with(changed, host.RESTART_HASH_TYPE)
+        service.assert_called_once_with('restart', 'svc1')
+
+    @patch.object(host, 'service')
+    @patch.object(host.unitdata, 'kv')
+    def test_restart_on_change_no_fingerprint_by_default(self, kv, service):
+        tmpdir = mkdtemp()
+        self.addCleanup(rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'conf')
+
+        @host.restart_on_change({path: ['svc']})
+        def write_config():
+            with open(path, 'w') as f:
+                f.write('bar')
+
+        write_config()
+        service.assert_called_once_with('restart', 'svc')
+        self.assertFalse(kv.called)
+
     @patch.object(host, 'file_hash')
     def test_check_hash(self, file_hash):
         file_hash.return_value = 'good-hash'
@@ -1494,7 +1746,7 @@ class HelpersTest(TestCase):
 
         @host.restart_on_change(restart_map)
         def make_some_changes(mock_file):
-            mock_file.read.return_value = b"newstuff"
+            mock_file.read.side_effect = [b"newstuff", b""]
 
         with patch_open() as (mock_open, mock_file):
             make_some_changes(mock_file)
@@ -1519,7 +1771,7 @@ class HelpersTest(TestCase):
 
         with patch_open() as (mock_open, mock_file):
             with host.restart_on_change(restart_map):
-                mock_file.read.return_value = b"newstuff"
+                mock_file.read.side_effect = [b"newstuff", b""]
 
         for service_name in restart_map[file_name]:
             service.assert_called_with('restart', service_name)
@@ -1547,7 +1799,8 @@ class HelpersTest(TestCase):
             pass
 
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.side_effect = [b'exists', b'missing', b'exists2']
+            mock_file.read.side_effect = [b'exists', b'', b'missing', b'',
+                                          b'exists2', b'']
             make_some_changes()
 
         # Restart should only happen once per service
@@ -1580,7 +1833,8 @@ class HelpersTest(TestCase):
             pass
 
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.side_effect = [b'exists', b'missing', b'exists2']
+            mock_file.read.side_effect = [b'exists', b'', b'missing', b'',
+                                          b'exists2', b'']
             make_some_changes()
 
         # Restarts should happen in the order they are described in the
@@ -1610,8 +1864,8 @@ class HelpersTest(TestCase):
             pass
 
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.side_effect = [b'content', b'content2',
-                                          b'content', b'content2']
+            mock_file.read.side_effect = [b'content', b'', b'content2', b'',
+                                          b'content', b'', b'content2', b'']
             make_some_changes()
 
         self.assertEqual([], service.call_args_list)
@@ -1635,8 +1889,8 @@ class HelpersTest(TestCase):
             pass
 
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.side_effect = [b'content', b'content2',
-                                          b'changed', b'content2']
+            mock_file.read.side_effect = [b'content', b'', b'content2', b'',
+                                          b'changed', b'', b'content2', b'']
             make_some_changes()
 
         self.assertEqual([call('restart', 'service')], service.call_args_list)
@@ -1660,8 +1914,8 @@ class HelpersTest(TestCase):
             pass
 
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.side_effect = [b'exists',
-                                          b'exists', b'created']
+            mock_file.read.side_effect = [b'exists', b'',
+                                          b'exists', b'', b'created', b'']
             make_some_changes()
 
         self.assertEqual([call('restart', 'service')], service.call_args_list)
@@ -1685,8 +1939,8 @@ class HelpersTest(TestCase):
             pass
 
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.side_effect = [b'exists', b'exists2',
-                                          b'exists2']
+            mock_file.read.side_effect = [b'exists', b'', b'exists2', b'',
+                                          b'exists2', b'']
             make_some_changes()
 
         self.assertEqual([call('restart', 'service')], service.call_args_list)
@@ -1716,7 +1970,8 @@ class HelpersTest(TestCase):
             pass
 
         with patch_open() as (mock_open, mock_file):
-            mock_file.read.side_effect = [b'exists', b'missing', b'exists2']
+            mock_file.read.side_effect = [b'exists', b'', b'missing', b'',
+                                          b'exists2', b'']
             make_some_changes()
 
         self.assertEqual([call('restart', 'haproxy')], service.call_args_list)
@@ -1775,71 +2030,108 @@ class HelpersTest(TestCase):
         pw2 = host.pwgen(10)
         self.assertNotEqual(pw, pw2, 'Duplicated password')
 
-    @patch.object(host, 'glob')
-    @patch('os.path.realpath')
-    @patch('os.path.isdir')
-    def test_is_phy_iface(self, mock_isdir, mock_realpath, mock_glob):
-        mock_isdir.return_value = True
-        mock_glob.glob.return_value = ['/sys/class/net/eth0',
-                                       '/sys/class/net/veth0']
-
-        def fake_realpath(soft):
-            if soft.endswith('/eth0'):
-                hard = ('/sys/devices/pci0000:00/0000:00:1c.4'
-                        '/0000:02:00.1/net/eth0')
-            else:
-                hard = '/sys/devices/virtual/net/veth0'
-
-            return hard
+    def _fake_sys_class_net(self):
+        tmpdir = mkdtemp()
+        self.addCleanup(rmtree, tmpdir)
+        class_net = fake_sys_class_net(tmpdir, SYS_CLASS_NET)
+        patcher = patch.object(host, 'SYS_CLASS_NET', class_net)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return class_net
+
+    def test_network_inventory(self):
+        self._fake_sys_class_net()
+        inventory = host.NetworkInventory()
+        self.assertEqual(len(inventory), 8)
+        self.assertIn('eth0', inventory)
+        self.assertNotIn('eth7', inventory)
+        self.assertEqual(inventory['eth0'], host.NetworkInterface(
+            name='eth0', ifindex=2, mtu=1500, hwaddr='e4:11:5b:ab:a7:3c',
+            virtual=False, bond_master='bond0', is_bond=False, bridge=None,
+            is_bridge=False, lower=[]))
+        self.assertEqual(inventory['eth100'].bridge, 'br0')
+        self.assertTrue(inventory['br0'].is_bridge)
+        self.assertTrue(inventory['bond0'].is_bond)
+        self.assertEqual(inventory['eth0.10'].lower, ['eth0'])
+        self.assertEqual(inventory['lo'].hwaddr, '')
+        self.assertRaises(KeyError, inventory.__getitem__, 'eth7')
+        self.assertIsNone(inventory.get('eth7'))
+        # the bond wins over its slaves sharing its address.
+        self.assertEqual(inventory.by_hwaddr('E4:11:5B:AB:A7:3C').name,
+                         'bond0')
+        self.assertEqual(inventory.by_hwaddr('e4:11:5b:ab:a7:3d').name,
+                         'eth100')
+        self.assertRaises(KeyError, inventory.by_hwaddr, '00:00:00:00:00:00')
+
+    def test_network_inventory_missing_sysfs(self):
+        inventory = host.NetworkInventory('/nonexistent/class/net')
+        self.assertEqual(list(inventory), [])
 
-        mock_realpath.side_effect = fake_realpath
+    @patch('subprocess.check_output')
+    def test_is_phy_iface(self, check_output):
+        self._fake_sys_class_net()
         self.assertTrue(host.is_phy_iface('eth0'))
-        self.assertFalse(host.is_phy_iface('veth0'))
+        self.assertFalse(host.is_phy_iface('bond0'))
+        self.assertFalse(host.is_phy_iface('eth7'))
+        self.assertFalse(host.is_phy_iface(None))
+        self.assertFalse(check_output.called)
 
-    @patch('os.path.exists')
-    @patch('os.path.realpath')
-    @patch('os.path.isdir')
-    def test_get_bond_master(self, mock_isdir, mock_realpath, mock_exists):
-        mock_isdir.return_value = True
-
-        def fake_realpath(soft):
-            if soft.endswith('/eth0'):
-                return ('/sys/devices/pci0000:00/0000:00:1c.4'
-                        '/0000:02:00.1/net/eth0')
-            elif soft.endswith('/br0'):
-                return '/sys/devices/virtual/net/br0'
-            elif soft.endswith('/master'):
-                return '/sys/devices/virtual/net/bond0'
-
-            return None
-
-        def fake_exists(path):
-            return True
-
-        mock_exists.side_effect = fake_exists
-        mock_realpath.side_effect = fake_realpath
+    def test_get_bond_master(self):
+        self._fake_sys_class_net()
         self.assertEqual(host.get_bond_master('eth0'), 'bond0')
+        self.assertIsNone(host.get_bond_master('eth100'))
         self.assertIsNone(host.get_bond_master('br0'))
+        self.assertIsNone(host.get_bond_master('eth7'))
 
     @patch('subprocess.check_output')
     def test_list_nics(self, check_output):
+        self._fake_sys_class_net()
+        self.assertEqual(host.list_nics(), [
+            'lo', 'eth0', 'eth1', 'bond0', 'eth0.10', 'eth100', 'br0',
+            'bond0.10'])
+        self.assertFalse(check_output.called)
         check_output.return_value = IP_LINES
-        nics = host.list_nics()
-        self.assertEqual(nics, ['eth0', 'eth1', 'eth0.10', 'eth100'])
         nics = host.list_nics('eth')
         self.assertEqual(nics, ['eth0', 'eth1', 'eth0.10', 'eth100'])
+        check_output.assert_called_with(['ip', 'addr', 'show', 'label',
+                                         'eth*'])
         nics = host.list_nics(['eth'])
         self.assertEqual(nics, ['eth0', 'eth1', 'eth0.10', 'eth100'])
 
+    @patch('subprocess.check_output')
+    def test_list_nics_by_label(self, check_output):
+        self._fake_sys_class_net()
+        # eth0 and bond0 are in sysfs, but have no address labelled so
+        check_output.return_value = b''
+        self.assertEqual(host.list_nics(['eth', 'bond']), [])
+        check_output.assert_has_calls([
+            call(['ip', 'addr', 'show', 'label', 'eth*']),
+            call(['ip', 'addr', 'show', 'label', 'bond*'])])
+
     @patch('subprocess.check_output')
     def test_list_nics_with_bonds(self, check_output):
         check_output.return_value = IP_LINE_BONDS
         nics = host.list_nics('bond')
         self.assertEqual(nics, ['bond0.10', ])
 
-    @patch('subprocess.check_output')
-    def test_get_nic_mtu_with_bonds(self, check_output):
-        check_output.return_value = IP_LINE_BONDS
+    def test_nic_helpers_share_inventory(self):
+        class_net = self._fake_sys_class_net()
+        inventory = host.NetworkInventory(class_net)
+        with patch.object(host, 'NetworkInventory') as network_inventory:
+            self.assertEqual(host.list_nics(inventory=inventory)[:2],
+                             ['lo', 'eth0'])
+            self.assertTrue(host.is_phy_iface('eth0', inventory=inventory))
+            self.assertEqual(
+                host.get_bond_master('eth0', inventory=inventory), 'bond0')
+            self.assertEqual(host.get_nic_mtu('eth1', inventory=inventory),
+                             '1546')
+            self.assertEqual(
+                host.get_nic_hwaddr('eth0', inventory=inventory),
+                'e4:11:5b:ab:a7:3c')
+        self.assertFalse(network_inventory.called)
+
+    def test_get_nic_mtu_with_bonds(self):
+        self._fake_sys_class_net()
         nic = "bond0.10"
         mtu = host.get_nic_mtu(nic)
         self.assertEqual(mtu, '1500')
@@ -1852,26 +2144,23 @@ class HelpersTest(TestCase):
         host.set_nic_mtu(nic, mtu)
         mock_call.assert_called_with(['ip', 'link', 'set', nic, 'mtu', mtu])
 
-    @patch('subprocess.check_output')
-    def test_get_nic_mtu(self, check_output):
-        check_output.return_value = IP_LINE_ETH0
-        nic = "eth0"
-        mtu = host.get_nic_mtu(nic)
-        self.assertEqual(mtu, '1500')
+    def test_get_nic_mtu(self):
+        self._fake_sys_class_net()
+        self.assertEqual(host.get_nic_mtu('eth1'), '1546')
+        self.assertEqual(host.get_nic_mtu('eth7'), '')
 
-    @patch('subprocess.check_output')
-    def test_get_nic_mtu_vlan(self, check_output):
-        check_output.return_value = IP_LINE_ETH0_VLAN
+    def test_get_nic_mtu_vlan(self):
+        self._fake_sys_class_net()
         nic = "eth0.10"
         mtu = host.get_nic_mtu(nic)
         self.assertEqual(mtu, '1500')
 
-    @patch('subprocess.check_output')
-    def test_get_nic_hwaddr(self, check_output):
-        check_output.return_value = IP_LINE_HWADDR
+    def test_get_nic_hwaddr(self):
+        self._fake_sys_class_net()
         nic = "eth0"
         hwaddr = host.get_nic_hwaddr(nic)
         self.assertEqual(hwaddr, 'e4:11:5b:ab:a7:3c')
+        self.assertEqual(host.get_nic_hwaddr('lo'), '')
 
     @patch('charmhelpers.core.host_factory.ubuntu.lsb_release')
     def test_get_distrib_codename(self, lsb_release):
@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+
+from mock import ANY, patch
+
+from charmhelpers.core import hookenv, profiling
+
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(profiling.disable)
+        self.addCleanup(hookenv.cache.clear)
+        self.addCleanup(hookenv._atexit.clear)
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(profiling.active())
+        self.assertIs(subprocess.Popen, profiling._original_popen)
+        with profiling.span('context', 'foo'):
+            pass
+
+    def test_enable(self):
+        profiler = profiling.enable('/tmp/trace.json')
+        self.assertIs(profiling.active(), profiler)
+        self.assertIs(profiling.enable(), profiler)
+        self.assertEqual(hookenv._atexit, [
+            (profiling.report, (profiler, '/tmp/trace.json'), {})])
+        profiling.disable()
+        self.assertIsNone(profiling.active())
+        self.assertIs(subprocess.Popen, profiling._original_popen)
+
+    def test_enable_without_report(self):
+        profiler = profiling.enable(report_atexit=False)
+        self.assertIs(profiling.active(), profiler)
+        self.assertEqual(hookenv._atexit, [])
+
+    def test_records_subprocesses(self):
+        profiler = profiling.enable()
+        subprocess.check_output(['true'])
+        self.assertEqual(subprocess.call(['false']), 1)
+        self.assertRaises(OSError, subprocess.call,
+                          ['/nonexistent/command', '-v'])
+        self.assertEqual(
+            [(e.category, e.name) for e in profiler.events],
+            [('subprocess', 'true'), ('subprocess', 'false'),
+             ('subprocess', 'command')])
+        self.assertEqual(profiler.events[0].args,
+                         {'argv': ['true'], 'returncode': 0})
+        self.assertEqual(profiler.events[1].args['returncode'], 1)
+        self.assertIn('error', profiler.events[2].args)
+
+    def test_records_cache_misses(self):
+        @hookenv.cached
+        def cached_function(arg):
+            return arg
+
+        profiler = profiling.enable()
+        cached_function('a')
+        cached_function('a')
+        self.assertEqual(
+            [(e.category, e.name) for e in profiler.events],
+            [('cached', 'cached_function')])
+
+    def test_summary(self):
+        profiler = profiling.Profiler()
+        start = time.monotonic()
+        profiler.record('subprocess', 'relation-get', start, 0.5)
+        profiler.record('subprocess', 'relation-get', start, 0.25)
+        profiler.record('subprocess', 'config-get', start, 1.0)
+        profiler.record('template', '/etc/foo.conf', start, 0.125)
+        summary = profiler.summary().splitlines()
+        self.assertEqual(summary[1:], [
+            'subprocess: 3 calls, 1.750s',
+            '    config-get: 1 calls, 1.000s',
+            '    relation-get: 2 calls, 0.750s',
+            'template: 1 calls, 0.125s',
+            '    /etc/foo.conf: 1 calls, 0.125s',
+        ])
+
+    @patch.object(hookenv, 'log')
+    def test_report(self, log):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        trace_file = os.path.join(tmpdir, 'trace.json')
+        profiling.enable(trace_file)
+        with profiling.span('template', '/etc/foo.conf'):
+            pass
+        hookenv._run_atexit()
+        self.assertIsNone(profiling.active())
+        log.assert_called_once_with(ANY, level=hookenv.INFO)
+        self.assertIn('template: 1 calls', log.call_args[0][0])
+        with open(trace_file) as f:
+            trace = json.load(f)
+        self.assertEqual(len(trace['traceEvents']), 1)
+        event = trace['traceEvents'][0]
+        self.assertEqual(event['name'], '/etc/foo.conf')
+        self.assertEqual(event['cat'], 'template')
+        self.assertEqual(event['ph'], 'X')
@@ -21,9 +21,13 @@ class TestTemplating(unittest.TestCase):
                                                   'charm_dir')
         self._charm_dir_mock = self._charm_dir_patch.start()
         self._charm_dir_mock.side_effect = lambda: self.charm_dir
+        self._bytecode_cache_patch = mock.patch.object(
+            templating, 'bytecode_cache', return_value=None)
+        self._bytecode_cache_patch.start()
 
     def tearDown(self):
         self._charm_dir_patch.stop()
+        self._bytecode_cache_patch.stop()
 
     @mock.patch.object(templating.host.os, 'fchown')
     @mock.patch.object(templating.host, 'mkdir')
@@ -164,3 +168,63 @@ class TestTemplating(unittest.TestCase):
             'fake.src', 'fake.tgt', {}, templates_dir='tmpl')
         hookenv.log.assert_called_once_with(
             'Could not load template fake.src from tmpl.', level=hookenv.ERROR)
+
+
+class TestBytecodeCache(unittest.TestCase):
+    def setUp(self):
+        self.charm_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.charm_dir)
+        patcher = mock.patch.object(templating.hookenv, 'charm_dir',
+                                    return_value=self.charm_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_no_charm_dir(self):
+        with mock.patch.object(templating.hookenv, 'charm_dir',
+                               return_value=None):
+            self.assertIsNone(templating.bytecode_cache())
+
+    def test_shared(self):
+        cache = templating.bytecode_cache()
+        self.assertIsInstance(cache, jinja2.FileSystemBytecodeCache)
+        self.assertIs(templating.bytecode_cache(), cache)
+        self.assertEqual(
+            cache.directory,
+            os.path.join(self.charm_dir, templating.BYTECODE_CACHE_DIR))
+
+    def test_unwritable_dir(self):
+        with mock.patch.object(templating.os, 'makedirs',
+                               side_effect=OSError('read-only')), \
+                mock.patch.object(templating.hookenv, 'log'):
+            self.assertIsNone(templating.bytecode_cache(
+                os.path.join(self.charm_dir, 'unwritable')))
+
+    def test_env_args(self):
+        cache = templating.bytecode_cache()
+        self.assertIs(templating.bytecode_cache(
+            env_args={'bytecode_cache': None, 'auto_reload': False}), cache)
+        trimmed = templating.bytecode_cache(env_args={'trim_blocks': True})
+        self.assertEqual(os.path.dirname(trimmed.directory), cache.directory)
+        self.assertIs(templating.bytecode_cache(
+            env_args={'trim_blocks': True}), trimmed)
+        self.assertNotEqual(templating.bytecode_cache(
+            env_args={'trim_blocks': True, 'lstrip_blocks': True}).directory,
+            trimmed.directory)
+        self.assertIsNone(templating.bytecode_cache(
+            env_args={'finalize': lambda value: value}))
+
+    @mock.patch.object(templating.host, 'log')
+    def test_render_uses_cache(self, log):
+        context = {'nginx_port': 80}
+        self.assertEqual(
+            templating.render('test.conf', None, context,
+                              templates_dir=TEMPLATES_DIR),
+            templating.render('test.conf', None, context,
+                              templates_dir=TEMPLATES_DIR))
+        cache_dir = os.path.join(self.charm_dir, templating.BYTECODE_CACHE_DIR)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        # a cached template is not compiled again
+        with mock.patch.object(jinja2.Environment, 'compile',
+                               side_effect=AssertionError):
+            templating.render('test.conf', None, context,
+                              templates_dir=TEMPLATES_DIR)
@@ -10,6 +10,7 @@ try:
 except Exception:
     from io import StringIO
 
+import datetime
 import os
 import shutil
 import tempfile
@@ -17,6 +18,7 @@ import unittest
 
 from mock import patch
 
+from charmhelpers.core import unitdata
 from charmhelpers.core.unitdata import Storage, HookData, kv
 
 
@@ -237,6 +239,55 @@ class StorageTest(unittest.TestCase):
         self.assertEqual(
             kv.getrange('x_', True), {'a': False, 'b': True})
 
+    def test_update_bulk_with_revisions(self):
+        kv = Storage(':memory:', keep_revisions=True)
+        data = {'key-%d' % i: i for i in range(2000)}
+        with kv.hook_scope('install'):
+            kv.update(data, prefix='bulk.')
+        self.assertEqual(kv.getrange('bulk.', strip=True), data)
+
+        data['key-7'] = 'changed'
+        with kv.hook_scope('config-changed'):
+            kv.update(data, prefix='bulk.')
+            kv.update({'key-7': 'again'}, prefix='bulk.')
+        self.assertEqual(kv.get('bulk.key-7'), 'again')
+        history = [h[:-1] for h in kv.gethistory('bulk.key-7')]
+        self.assertEqual(history, [
+            (1, 'bulk.key-7', '7', 'install'),
+            (2, 'bulk.key-7', '"again"', 'config-changed')])
+        # Unchanged keys do not get a new revision
+        self.assertEqual(len(kv.gethistory('bulk.key-8')), 1)
+
+    def test_unsetrange_bulk(self):
+        kv = Storage(':memory:', keep_revisions=True)
+        keys = ['key-%d' % i for i in range(2000)]
+        with kv.hook_scope('install'):
+            kv.update({k: True for k in keys}, prefix='bulk.')
+        with kv.hook_scope('stop'):
+            kv.unsetrange(keys[:1500], prefix='bulk.')
+        self.assertEqual(len(kv.getrange('bulk.')), 500)
+        history = [h[:-1] for h in kv.gethistory('bulk.key-0')]
+        self.assertEqual(history[-1], (2, 'bulk.key-0', '"DELETED"', 'stop'))
+
+    def test_wal(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'state.db')
+        kv = Storage(path)
+        kv.cursor.execute('pragma journal_mode')
+        self.assertEqual(kv.cursor.fetchone()[0], 'delete')
+        kv.close()
+        with patch.dict('os.environ', {'UNIT_STATE_DB_WAL': 'yes'}):
+            kv = Storage(path)
+        kv.cursor.execute('pragma journal_mode')
+        self.assertEqual(kv.cursor.fetchone()[0], 'wal')
+        kv.cursor.execute('pragma synchronous')
+        self.assertEqual(kv.cursor.fetchone()[0], 1)  # NORMAL
+        kv.set('x', 1)
+        kv.flush()
+        kv.close()
+        self.assertEqual(Storage(path, wal=True).get('x'), 1)
+
     def test_keyrange(self):
         kv = Storage(':memory:')
         kv.set('docker.net_mtu', 1)
@@ -250,6 +301,191 @@ class StorageTest(unittest.TestCase):
             kv.getrange('docker.', True),
             {'net_mtu': 1, 'net_type': 'vxlan', 'net_nack': True})
 
+    def test_keyrange_literal_prefix(self):
+        kv = Storage(':memory:')
+        kv.update({'a_b': 1, 'axb': 2, 'A_B': 3, 'a_': 4, 'a%c': 5, 'b': 6})
+        self.assertEqual(kv.getrange('a_'), {'a_b': 1, 'a_': 4})
+        self.assertEqual(kv.getrange('a%'), {'a%c': 5})
+        self.assertEqual(len(kv.getrange('')), 6)
+        self.assertEqual(kv.getrange('c'), {})
+        kv.set('\U0010ffff', 7)
+        kv.set('\U0010ffffx', 8)
+        self.assertEqual(kv.getrange('\U0010ffff', True), {'': 7, 'x': 8})
+        kv.unsetrange(prefix='a_')
+        self.assertEqual(kv.get('a_b'), None)
+        self.assertEqual(kv.get('axb'), 2)
+
+    def test_keyrange_uses_index(self):
+        kv = Storage(':memory:')
+        where, params = unitdata._prefix_bounds('docker.')
+        self.assertEqual(params, ['docker.', 'docker/'])
+        kv.cursor.execute(
+            'explain query plan select key, data from kv%s' % where, params)
+        plan = ' '.join(str(row[-1]) for row in kv.cursor.fetchall())
+        self.assertIn('SEARCH', plan)
+
+    def test_iterrange(self):
+        kv = Storage(':memory:')
+        kv.update({'b': 2, 'a': 1, 'c': 3}, prefix='x.')
+        kv.set('y', 4)
+        rows = kv.iterrange('x.', strip=True)
+        self.assertEqual(next(rows), ('a', 1))
+        # Other queries may run while the range is being consumed
+        self.assertEqual(kv.get('y'), 4)
+        self.assertEqual(list(rows), [('b', 2), ('c', 3)])
+
+    def test_cache(self):
+        kv = Storage(':memory:', cache=True)
+        kv.set('paused', False)
+        kv.set('config', {'a': [1]})
+        statements = kv.stats['statements']
+        for _ in range(3):
+            self.assertEqual(kv.get('paused'), False)
+            self.assertEqual(kv.get('missing', 'default'), 'default')
+            self.assertEqual(kv.get('config', record=True).a, [1])
+        self.assertEqual(kv.stats['statements'], statements + 3)
+        self.assertEqual(kv.stats['cache_misses'], 3)
+        self.assertEqual(kv.stats['cache_hits'], 6)
+
+        # Cached values cannot be modified through returned values
+        kv.get('config')['a'].append(2)
+        self.assertEqual(kv.get('config'), {'a': [1]})
+
+    def test_cache_coherent_with_writes(self):
+        kv = Storage(':memory:', cache=True)
+        self.assertEqual(kv.get('a'), None)
+        kv.set('a', 1)
+        self.assertEqual(kv.get('a'), 1)
+        kv.update({'a': 2, 'b': 3})
+        self.assertEqual(kv.get('a'), 2)
+        self.assertEqual(kv.get('b'), 3)
+        kv.unset('a')
+        self.assertEqual(kv.get('a'), None)
+        kv.set('x.1', 1)
+        kv.set('x.2', 2)
+        self.assertEqual(kv.get('x.1'), 1)
+        self.assertEqual(kv.get('x.2'), 2)
+        kv.unsetrange(['1'], prefix='x.')
+        self.assertEqual(kv.get('x.1'), None)
+        kv.unsetrange(prefix='x.')
+        self.assertEqual(kv.get('x.2'), None)
+
+    def test_cache_dropped_on_rollback(self):
+        kv = Storage(':memory:', cache=True)
+        kv.set('a', 1)
+        kv.flush()
+        kv.set('a', 2)
+        self.assertEqual(kv.get('a'), 2)
+        kv.flush(False)
+        self.assertEqual(kv.get('a'), 1)
+        try:
+            with kv.hook_scope('install'):
+                kv.set('a', 3)
+                self.assertEqual(kv.get('a'), 3)
+                raise RuntimeError('x')
+        except RuntimeError:
+            self.assertEqual(kv.get('a'), 1)
+
+    def test_cache_disabled_by_default(self):
+        kv = Storage(':memory:', stats=True)
+        statements = kv.stats['statements']
+        kv.get('a')
+        kv.get('a')
+        self.assertEqual(kv.stats['cache_hits'], 0)
+        self.assertEqual(kv.stats['statements'], statements + 2)
+        with patch.dict('os.environ', {'UNIT_STATE_DB_CACHE': 'yes'}):
+            kv = Storage(':memory:')
+        kv.get('a')
+        kv.get('a')
+        self.assertEqual(kv.stats['cache_hits'], 1)
+
+    def test_stats_statements(self):
+        kv = Storage(':memory:')
+        kv.get('a')
+        self.assertEqual(kv.stats['statements'], 0)
+        kv = Storage(':memory:', stats=True)
+        statements = kv.stats['statements']
+        kv.get('a')
+        self.assertEqual(kv.stats['statements'], statements + 1)
+        kv = Storage(':memory:', cache=True, stats=False)
+        kv.get('a')
+        self.assertEqual(kv.stats['statements'], 0)
+        self.assertEqual(kv.stats['cache_misses'], 1)
+
+    def _history_kv(self, hooks=5):
+        kv = Storage(':memory:', keep_revisions=True)
+        for i in range(hooks):
+            kv.revision = None
+            with kv.hook_scope('hook-{}'.format(i)):
+                kv.set('a', i)
+                kv.set('cfg', {'big': 'x' * 200, 'n': i})
+        return kv
+
+    def test_compact_keep(self):
+        kv = self._history_kv()
+        self.assertEqual(kv.compact(keep=2), 6)
+        self.assertEqual(
+            [h[0] for h in kv.gethistory('a')], [4, 5])
+        self.assertEqual(kv.get('a'), 4)
+        self.assertEqual(kv.compact(keep=0), 4)
+        self.assertEqual(kv.gethistory('cfg'), [])
+        self.assertEqual(kv.get('cfg'), {'big': 'x' * 200, 'n': 4})
+
+    def test_compact_keep_more_than_history(self):
+        kv = self._history_kv(hooks=3)
+        self.assertEqual(kv.compact(keep=5), 0)
+        self.assertEqual([h[0] for h in kv.gethistory('a')], [1, 2, 3])
+
+    def test_compact_max_age(self):
+        kv = self._history_kv(hooks=3)
+        kv.cursor.execute(
+            "update hooks set date='2000-01-01T00:00:00' where version < 3")
+        self.assertEqual(kv.compact(max_age=datetime.timedelta(days=1)), 4)
+        self.assertEqual([h[0] for h in kv.gethistory('a')], [3])
+        kv.cursor.execute('select version from hooks')
+        self.assertEqual(kv.cursor.fetchall(), [(3,)])
+
+    def test_compact_delta(self):
+        kv = self._history_kv()
+        expected = list(kv.gethistory('cfg', deserialize=True))
+        self.assertEqual(kv.compact(), 0)
+        kv.cursor.execute(
+            "select data from kv_revisions where key='cfg' order by revision")
+        stored = [r[0] for r in kv.cursor.fetchall()]
+        self.assertFalse(stored[0].startswith('~'))
+        self.assertTrue(all(d.startswith('~') for d in stored[1:]))
+        self.assertEqual(
+            list(kv.gethistory('cfg', deserialize=True)), expected)
+
+        # Dropping the oldest revisions keeps the rest decodable
+        kv.compact(keep=2)
+        self.assertEqual(
+            list(kv.gethistory('cfg', deserialize=True)), expected[-2:])
+        kv.compact(delta=False)
+        kv.cursor.execute("select data from kv_revisions where key='cfg'")
+        self.assertFalse(
+            any(r[0].startswith('~') for r in kv.cursor.fetchall()))
+
+        # New revisions written after compaction are stored in full
+        kv.revision = None
+        with kv.hook_scope('later'):
+            kv.set('cfg', {'n': 10})
+        self.assertEqual(
+            list(kv.gethistory('cfg', deserialize=True))[-1][2], {'n': 10})
+
+    def test_compact_vacuum(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            kv = Storage(fh.name, keep_revisions=True)
+            for i in range(3):
+                kv.revision = None
+                with kv.hook_scope('hook'):
+                    kv.set('a', 'x' * 10000 + str(i))
+            size = os.stat(fh.name).st_size
+            kv.compact(keep=1, vacuum=True)
+            self.assertLess(os.stat(fh.name).st_size, size)
+            self.assertEqual(kv.get('a'), 'x' * 10000 + '2')
+            kv.close()
+
     def test_get_set_unset(self):
         kv = Storage(':memory:')
         kv.hook_scope('test')
@@ -1109,6 +1109,23 @@ class AptTests(TestCase):
         _run_apt_command(["some", "command"], fatal=True)
         self.assertTrue(sleep.called)
 
+    @patch('charmhelpers.fetch.ubuntu.log')
+    @patch.object(fetch.ubuntu_apt_pkg, 'invalidate_package_index')
+    @patch('subprocess.call')
+    def test_run_apt_command_invalidates_package_index(self, call,
+                                                       invalidate, log):
+        fetch.apt_install(['vim'])
+        invalidate.assert_called_once_with()
+        call.side_effect = OSError
+        self.assertRaises(OSError, fetch.apt_purge, ['vim'])
+        self.assertEqual(invalidate.call_count, 2)
+
+    @patch("charmhelpers.fetch.ubuntu.log")
+    @patch.object(fetch, 'apt_cache')
+    def test_filter_packages_prefetches(self, cache, log):
+        fetch.filter_installed_packages(['vim', 'emacs'])
+        cache.return_value.prefetch.assert_called_once_with(['vim', 'emacs'])
+
     @patch.object(fetch, 'apt_cache')
     def test_get_upstream_version(self, cache):
         cache.side_effect = fake_apt_cache
@@ -1,5 +1,8 @@
 import mock
+import os
+import shutil
 import subprocess
+import tempfile
 import unittest
 
 from charmhelpers.fetch import ubuntu_apt_pkg as apt_pkg
@@ -10,6 +13,9 @@ class Test_apt_pkg_Cache(unittest.TestCase):
     def setUp(self):
         self._patches = {}
         self._patches_start = {}
+        # Have Cache.dpkg_list run dpkg-query
+        self.patch_object(apt_pkg, 'dpkg_status',
+                          return_value=apt_pkg.DpkgStatus('/nonexistent'))
 
     def tearDown(self):
         for k, v in self._patches.items():
@@ -194,6 +200,199 @@ class Test_apt_pkg_Cache(unittest.TestCase):
         with self.assertRaises(subprocess.CalledProcessError):
             pkg = apt_cache['system-error-occurs-while-making-apt-inquiry']
 
+    def test_prefetch(self):
+        self.patch_object(apt_pkg.subprocess, 'check_output')
+        self.patch_object(apt_pkg, '_dpkg_fingerprint')
+        self._dpkg_fingerprint.return_value = ['status', 'lists']
+        self.addCleanup(apt_pkg.invalidate_package_index)
+        apt_cache = apt_pkg.Cache()
+        self.check_output.side_effect = [
+            ('Package: dpkg\n'
+             'Version: 1.19.0.6ubuntu0\n'
+             '\n'
+             'Package: lsof\n'
+             'Architecture: amd64\n'
+             'Version: 4.91+dfsg-1ubuntu1\n'
+             '\n'),
+            ('ii \tdpkg\t1.19.0.5ubuntu2.1\tamd64\tDebian package '
+             'management system\n'
+             'dpkg-query: no packages found matching lsof\n'),
+        ]
+        apt_cache.prefetch(['dpkg', 'lsof', 'nonexistent'])
+        self.check_output.assert_has_calls([
+            mock.call(['apt-cache', 'show', '--no-all-versions',
+                       'dpkg', 'lsof', 'nonexistent'],
+                      stderr=subprocess.STDOUT, universal_newlines=True),
+            mock.call(['dpkg-query', '--show', '--showformat', mock.ANY,
+                       'dpkg', 'lsof'],
+                      stderr=subprocess.STDOUT, universal_newlines=True),
+        ])
+        self.check_output.reset_mock()
+        for _ in range(2):
+            pkg = apt_cache['dpkg']
+            self.assertEqual(pkg.name, 'dpkg')
+            self.assertEqual(pkg.current_ver.ver_str, '1.19.0.5ubuntu2.1')
+            self.assertEqual(pkg.architecture, 'amd64')
+            self.assertIsNone(apt_cache['lsof'].current_ver)
+            self.assertNotIn('nonexistent', apt_cache)
+        apt_pkg.Cache().prefetch(['dpkg', 'lsof'])
+        self.assertFalse(self.check_output.called)
+
+    def test_prefetch_invalidated(self):
+        self.patch_object(apt_pkg.subprocess, 'check_output')
+        self.patch_object(apt_pkg, '_dpkg_fingerprint')
+        self._dpkg_fingerprint.return_value = ['status', 'lists']
+        self.addCleanup(apt_pkg.invalidate_package_index)
+        apt_cache = apt_pkg.Cache()
+        self.check_output.side_effect = [
+            'Package: lsof\nVersion: 4.91\n\n',
+            'dpkg-query: no packages found matching lsof\n',
+            'Package: lsof\nVersion: 4.91\n\n',
+            'ii \tlsof\t4.91\tamd64\tutility to list open files\n',
+            'Package: lsof\nVersion: 4.91\n\n',
+            'dpkg-query: no packages found matching lsof\n',
+        ]
+        apt_cache.prefetch(['lsof'])
+        self.assertIsNone(apt_cache['lsof'].current_ver)
+        # The dpkg database changed behind our back
+        self._dpkg_fingerprint.return_value = ['status2', 'lists']
+        self.assertEqual(apt_cache['lsof'].current_ver.ver_str, '4.91')
+        self.assertEqual(self.check_output.call_count, 4)
+        apt_cache.prefetch(['lsof'])
+        self.assertEqual(self.check_output.call_count, 6)
+        apt_pkg.invalidate_package_index()
+        self.assertEqual(apt_pkg._package_index, {})
+
+
+DPKG_STATUS = """Package: dpkg
+Status: install ok installed
+Architecture: amd64
+Version: 1.19.0.5ubuntu2.1
+Description: Debian package management system
+ Multiline description
+
+Package: linux-image-4.15.0-42-generic
+Status: deinstall ok config-files
+Architecture: amd64
+Version: 4.15.0-42.45
+Description: Signed kernel image generic
+
+Package: libc6
+Status: hold ok installed
+Architecture: i386
+Version: 2.27-3ubuntu1
+Description: GNU C Library: Shared libraries
+
+
+Package: lsof
+Status: install ok installed
+Priority: standard
+Architecture: amd64
+Version: 4.91+dfsg-1ubuntu1
+Description: utility to list open files
+"""
+
+
+class Test_apt_pkg_DpkgStatus(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'status')
+        with open(self.path, 'w') as f:
+            f.write(DPKG_STATUS)
+        self.status = apt_pkg.DpkgStatus(self.path)
+
+    def test_stanzas(self):
+        self.assertEqual(sorted(self.status.names()),
+                         ['dpkg', 'libc6', 'linux-image-4.15.0-42-generic',
+                          'lsof'])
+        self.assertIn('lsof', self.status)
+        self.assertNotIn('vim', self.status)
+        self.assertEqual(self.status.get('dpkg'), {
+            'package': 'dpkg',
+            'status': 'install ok installed',
+            'architecture': 'amd64',
+            'version': '1.19.0.5ubuntu2.1',
+            'description': ('Debian package management system' +
+                            os.linesep + 'Multiline description'),
+        })
+        self.assertEqual(self.status.get('lsof')['priority'], 'standard')
+        self.assertIsNone(self.status.get('vim'))
+
+    def test_dpkg_list(self):
+        self.assertEqual(
+            self.status.dpkg_list(['dpkg', 'linux-image-*', 'libc6', 'vim']),
+            {'dpkg': {'name': 'dpkg',
+                      'version': '1.19.0.5ubuntu2.1',
+                      'architecture': 'amd64',
+                      'description': 'Debian package management system'},
+             'libc6': {'name': 'libc6',
+                       'version': '2.27-3ubuntu1',
+                       'architecture': 'i386',
+                       'description': 'GNU C Library: Shared libraries'}})
+
+    def test_refresh_on_change(self):
+        self.assertIn('lsof', self.status)
+        with open(self.path, 'w') as f:
+            f.write(DPKG_STATUS.replace('lsof', 'vim'))
+        self.assertNotIn('lsof', self.status)
+        self.assertIn('vim', self.status)
+
+    def test_dpkg_list_arch(self):
+        self.assertEqual(
+            list(self.status.dpkg_list(['libc6:i386', 'dpkg:i386'])),
+            ['libc6'])
+
+    def test_missing_and_empty_file(self):
+        self.assertEqual(apt_pkg.DpkgStatus('/nonexistent').names(), [])
+        self.assertFalse(apt_pkg.DpkgStatus('/nonexistent').readable())
+        open(self.path, 'w').close()
+        self.assertEqual(self.status.dpkg_list(['dpkg']), {})
+        self.assertFalse(self.status.readable())
+
+    @mock.patch.object(apt_pkg.subprocess, 'check_output')
+    def test_cache_dpkg_list(self, check_output):
+        check_output.return_value = (
+            'ii \tvim\t2:8.0\tamd64\tVi IMproved\n')
+        with mock.patch.object(apt_pkg, 'dpkg_status',
+                               return_value=self.status):
+            self.assertEqual(
+                list(apt_pkg.Cache().dpkg_list(['dpkg', 'lsof', 'vim'])),
+                ['dpkg', 'lsof'])
+            self.assertFalse(check_output.called)
+            # an interrupted dpkg run left a journal entry
+            os.mkdir(os.path.join(self.tmpdir, 'updates'))
+            open(os.path.join(self.tmpdir, 'updates', 'tmp.i'), 'w').close()
+            self.assertTrue(self.status.readable())
+            open(os.path.join(self.tmpdir, 'updates', '0000'), 'w').close()
+            self.assertEqual(
+                list(apt_pkg.Cache().dpkg_list(['dpkg', 'lsof', 'vim'])),
+                ['vim'])
+            self.assertTrue(check_output.called)
+
+    def test_apt_packages_lists(self):
+        for suffix, version in (('focal_main', '1.0'),
+                                ('focal-updates_main', '1.1')):
+            path = os.path.join(self.tmpdir, 'archive_{}_Packages'
+                                .format(suffix))
+            with open(path, 'w') as f:
+                f.write('Package: lsof\nVersion: {}\n'.format(version))
+        lists = apt_pkg.AptPackagesLists(
+            os.path.join(self.tmpdir, '*_Packages'))
+        self.assertEqual([s['version'] for s in lists.stanzas('lsof')],
+                         ['1.1', '1.0'])
+        self.assertEqual(lists.stanzas('vim'), [])
+
+    @unittest.skipUnless(shutil.which('dpkg-query') and
+                         os.path.exists(apt_pkg.DPKG_STATUS),
+                         'requires a dpkg based system')
+    def test_dpkg_list_matches_dpkg_query(self):
+        status = apt_pkg.DpkgStatus()
+        names = status.names()
+        self.assertEqual(status.dpkg_list(names),
+                         apt_pkg.Cache()._dpkg_query(names))
+
 
 class Test_apt_pkg_PkgVersion(unittest.TestCase):
 
@@ -0,0 +1,116 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+import sys
+import types
+import unittest
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import charmhelpers
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """Import module in a fresh interpreter with ``python -X importtime``.
+
+    :returns: dict of the modules imported to their cumulative import time
+              in microseconds.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [REPO_DIR] + [p for p in env.get('PYTHONPATH', '').split(os.pathsep)
+                      if p])
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE, universal_newlines=True, env=env,
+        check=True).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    """Guard against heavy imports creeping back into hook start up."""
+
+    def assertNotImported(self, module, unwanted):
+        times = import_times(module)
+        self.assertIn(module, times)
+        imported = sorted(name for name in times
+                          if name.split('.')[0] in unwanted or
+                          name in unwanted)
+        self.assertEqual(imported, [],
+                         'importing {} took {}ms'.format(
+                             module, times[module] // 1000))
+
+    def test_hookenv(self):
+        self.assertNotImported('charmhelpers.core.hookenv',
+                               ['distutils', 'looseversion', 'setuptools'])
+
+    def test_fetch(self):
+        self.assertNotImported('charmhelpers.fetch',
+                               ['charmhelpers.fetch.ubuntu',
+                                'charmhelpers.fetch.centos',
+                                'charmhelpers.fetch.ubuntu_apt_pkg',
+                                'charmhelpers.core.host'])
+
+    def test_packages(self):
+        self.assertNotImported('charmhelpers.contrib.openstack',
+                               ['charmhelpers.contrib.openstack.utils',
+                                'charmhelpers.contrib.openstack.context'])
+        self.assertNotImported('charmhelpers.contrib.storage.linux',
+                               ['charmhelpers.contrib.storage.linux.ceph'])
+
+    def test_openstack_utils(self):
+        self.assertNotImported('charmhelpers.contrib.openstack.utils',
+                               ['charmhelpers.contrib.openstack.context',
+                                'charmhelpers.contrib.openstack.templating',
+                                'charmhelpers.contrib.storage.linux.ceph',
+                                'distutils', 'jinja2'])
+
+
+class TestLazyAttributes(unittest.TestCase):
+
+    def setUp(self):
+        self.module = types.ModuleType('lazy_test')
+        self.module.__getattr__ = charmhelpers.lazy_attributes(
+            'lazy_test', {'path': 'os.path', 'join': 'os.path:join'})
+        sys.modules['lazy_test'] = self.module
+        self.addCleanup(sys.modules.pop, 'lazy_test')
+
+    def test_attributes(self):
+        self.assertIs(self.module.path, os.path)
+        self.assertIs(self.module.join, os.path.join)
+        from lazy_test import join
+        self.assertIs(join, os.path.join)
+
+    def test_missing(self):
+        with self.assertRaises(AttributeError) as e:
+            self.module.missing
+        self.assertEqual(str(e.exception),
+                         "module 'lazy_test' has no attribute 'missing'")
+
+    def test_patch(self):
+        with mock.patch('lazy_test.join') as join:
+            self.assertIs(self.module.join, join)
+        self.assertIs(self.module.join, os.path.join)
@@ -0,0 +1,39 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Micro benchmarks for charm-helpers.
+
+Each module can be run directly, e.g.::
+
+    python3 -m tools.benchmarks.dpkg_status
+"""
+
+import time
+
+
+def best_of(func, repeat=5):
+    """Run func repeat times and return the fastest wall time in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(rows):
+    """Print (label, seconds) rows as an aligned table."""
+    width = max(len(label) for label, _ in rows)
+    for label, seconds in rows:
+        print('{}  {:10.2f} ms'.format(label.ljust(width), seconds * 1000))
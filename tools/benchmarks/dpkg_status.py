@@ -0,0 +1,68 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare installed package lookups via dpkg-query and DpkgStatus.
+
+Must be run on a dpkg based system::
+
+    python3 -m tools.benchmarks.dpkg_status --packages 60
+"""
+
+import argparse
+
+from charmhelpers.fetch import ubuntu_apt_pkg
+
+from tools.benchmarks import best_of, report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--packages', type=int, default=60,
+                        help='number of installed packages to look up')
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args(args)
+
+    names = sorted(ubuntu_apt_pkg.DpkgStatus().names())[:options.packages]
+    cache = ubuntu_apt_pkg.Cache()
+
+    def dpkg_query_each():
+        for name in names:
+            cache.dpkg_list([name])
+
+    def dpkg_query_batch():
+        cache.dpkg_list(names)
+
+    def dpkg_status_cold():
+        status = ubuntu_apt_pkg.DpkgStatus()
+        for name in names:
+            status.dpkg_list([name])
+
+    warm = ubuntu_apt_pkg.DpkgStatus()
+    warm.dpkg_list(names)
+
+    def dpkg_status_warm():
+        for name in names:
+            warm.dpkg_list([name])
+
+    print('Looking up {} packages'.format(len(names)))
+    report([
+        ('dpkg-query per package', best_of(dpkg_query_each, options.repeat)),
+        ('dpkg-query batched', best_of(dpkg_query_batch, options.repeat)),
+        ('DpkgStatus cold', best_of(dpkg_status_cold, options.repeat)),
+        ('DpkgStatus warm', best_of(dpkg_status_warm, options.repeat)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fake Juju hook tools and system commands answering from a JSON fixture.
+
+The executables written by :class:`tools.benchmarks.replay.ReplayEnvironment`
+call :func:`main` with the name of the tool they stand in for.  The fixture
+is read from ``$FAKE_JUJU_FIXTURE`` and every invocation is appended to
+``$FAKE_JUJU_CALLS`` as a JSON line with the argv and the time it took.
+
+Only the standard library may be imported here, to keep the start up time
+of the fake tools close to that of the real ones.
+"""
+
+import json
+import os
+import sys
+import time
+
+
+def _options(argv, flags=(), valued=()):
+    """Split argv into (options, positional arguments)."""
+    options = {}
+    positional = []
+    args = iter(argv)
+    for arg in args:
+        if arg in valued:
+            options[arg] = next(args, None)
+        elif arg in flags or arg.startswith('--format'):
+            options[arg] = True
+        else:
+            positional.append(arg)
+    return options, positional
+
+
+def _json(value):
+    sys.stdout.write(json.dumps(value) + '\n')
+
+
+def _relation(fixture, rid):
+    for relations in fixture.get('relations', {}).values():
+        if rid in relations:
+            return relations[rid]
+    return {}
+
+
+def config_get(fixture, argv):
+    _, args = _options(argv, flags=('--all',))
+    config = fixture.get('config', {})
+    _json(config.get(args[0]) if args else config)
+
+
+def relation_ids(fixture, argv):
+    _, args = _options(argv)
+    name = args[0] if args else os.environ.get('JUJU_RELATION', '')
+    _json(sorted(fixture.get('relations', {}).get(name, {})))
+
+
+def relation_list(fixture, argv):
+    options, _ = _options(argv, valued=('-r',))
+    rid = options.get('-r') or os.environ.get('JUJU_RELATION_ID')
+    local = os.environ.get('JUJU_UNIT_NAME')
+    _json(sorted(unit for unit in _relation(fixture, rid)
+                 if unit != local and '/' in unit))
+
+
+def relation_get(fixture, argv):
+    options, args = _options(argv, flags=('--app',), valued=('-r',))
+    rid = options.get('-r') or os.environ.get('JUJU_RELATION_ID')
+    attribute = args[0] if args else '-'
+    unit = args[1] if len(args) > 1 else os.environ.get('JUJU_REMOTE_UNIT')
+    settings = _relation(fixture, rid).get(unit, {})
+    _json(settings if attribute == '-' else settings.get(attribute))
+
+
+def leader_get(fixture, argv):
+    _, args = _options(argv)
+    settings = fixture.get('leader-settings', {})
+    _json(settings if not args or args[0] == '-' else settings.get(args[0]))
+
+
+def is_leader(fixture, argv):
+    _json(fixture.get('leader', False))
+
+
+def unit_get(fixture, argv):
+    _, args = _options(argv)
+    _json(fixture.get('unit', {}).get(args[0]))
+
+
+def network_get(fixture, argv):
+    options, args = _options(
+        argv, flags=('--primary-address', '--ingress-address'),
+        valued=('-r',))
+    network = fixture.get('network', {})
+    info = network.get(args[0] if args else '', network.get('default', {}))
+    if '--primary-address' in options or '--ingress-address' in options:
+        _json(info.get('ingress-addresses', [None])[0])
+    else:
+        _json(info)
+
+
+def dpkg_query(fixture, argv):
+    _, names = _options(argv, valued=('--showformat',))
+    packages = fixture.get('packages', {})
+    missing = False
+    for name in names:
+        if name in packages:
+            sys.stdout.write('ii \t{}\t{}\tamd64\t{} package\n'.format(
+                name, packages[name], name))
+        else:
+            sys.stderr.write(
+                'dpkg-query: no packages found matching {}\n'.format(name))
+            missing = True
+    return 1 if missing else 0
+
+
+def apt_cache(fixture, argv):
+    _, names = _options(argv, flags=('show', '--no-all-versions'))
+    candidates = dict(fixture.get('packages', {}))
+    candidates.update(fixture.get('candidates', {}))
+    found = False
+    for name in names:
+        if name in candidates:
+            found = True
+            sys.stdout.write('Package: {}\nVersion: {}\nArchitecture: amd64\n'
+                             'Description: {} package\n\n'.format(
+                                 name, candidates[name], name))
+    return 0 if found or not names else 100
+
+
+def ovs_vsctl(fixture, argv):
+    _, args = _options(argv, valued=('--timeout', '--db'))
+    bridges = fixture.get('ovs', {}).get('bridges', {})
+    while args and args[0] == '--':
+        args = args[1:]
+    if not args:
+        return 0
+    if args[0] == 'list-br':
+        sys.stdout.write(''.join(b + '\n' for b in sorted(bridges)))
+    elif args[0] == 'list-ports':
+        sys.stdout.write(''.join(
+            p + '\n' for p in bridges.get(args[1], [])))
+    elif args[0] == 'br-exists':
+        return 0 if args[1] in bridges else 2
+    return 0
+
+
+def ceph(fixture, argv):
+    _, args = _options(argv, valued=('--id', '--name', '-n', '--format',
+                                     '-f', '--cluster', '--conf', '-c'))
+    responses = fixture.get('ceph', {})
+    # the longest recorded command prefix wins.
+    for length in range(len(args), 0, -1):
+        response = responses.get(' '.join(args[:length]))
+        if response is not None:
+            sys.stdout.write(response if isinstance(response, str)
+                             else json.dumps(response))
+            return 0
+    return 0
+
+
+def no_output(fixture, argv):
+    return 0
+
+
+TOOLS = {
+    'config-get': config_get,
+    'relation-ids': relation_ids,
+    'relation-list': relation_list,
+    'relation-get': relation_get,
+    'relation-set': no_output,
+    'leader-get': leader_get,
+    'leader-set': no_output,
+    'is-leader': is_leader,
+    'unit-get': unit_get,
+    'network-get': network_get,
+    'juju-log': no_output,
+    'status-set': no_output,
+    'application-version-set': no_output,
+    'open-port': no_output,
+    'close-port': no_output,
+    'dpkg-query': dpkg_query,
+    'apt-cache': apt_cache,
+    'ovs-vsctl': ovs_vsctl,
+    'ceph': ceph,
+}
+
+
+def main(tool):
+    start = time.perf_counter()
+    with open(os.environ['FAKE_JUJU_FIXTURE']) as f:
+        fixture = json.load(f)
+    try:
+        status = TOOLS[tool](fixture, sys.argv[1:]) or 0
+    finally:
+        sys.stdout.flush()
+        record = json.dumps({'tool': tool, 'argv': sys.argv[1:],
+                             'duration': time.perf_counter() - start})
+        fd = os.open(os.environ['FAKE_JUJU_CALLS'],
+                     os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, (record + '\n').encode('UTF-8'))
+        finally:
+            os.close(fd)
+    sys.exit(status)
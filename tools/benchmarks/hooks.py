@@ -0,0 +1,268 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Time representative hook flows against a replayed hook environment.
+
+Every scenario runs as if in a fresh hook: the charmhelpers caches are
+dropped before each run.  Besides the wall time, the number of processes
+spawned and the time spent waiting for them are reported, and can be saved
+to compare across commits::
+
+    python3 -m tools.benchmarks.hooks --output before.json
+    git checkout my-branch
+    python3 -m tools.benchmarks.hooks --baseline before.json
+
+Must be run on Ubuntu, as the OpenStack helpers read /etc/lsb-release.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+
+from charmhelpers.core import host, profiling
+from charmhelpers.contrib.network import ovs
+from charmhelpers.contrib.openstack import context, templating
+from charmhelpers.contrib.storage.linux import ceph
+from charmhelpers.fetch import filter_installed_packages
+
+from tools.benchmarks.replay import (
+    ReplayEnvironment,
+    load_fixture,
+    reset_caches,
+)
+
+NOVA_CONF = '''[DEFAULT]
+debug = {{ debug }}
+use_syslog = {{ use_syslog }}
+transport_url = {{ transport_url }}
+osapi_compute_workers = {{ workers }}
+{% if use_internal_endpoints -%}
+cinder_catalog_info = {{ volume_catalog_info }}
+{% endif -%}
+{% for key, value in (user_config_flags or {}).items() -%}
+{{ key }} = {{ value }}
+{% endfor %}
+[database]
+connection = {{ database_type }}://{{ database_user }}:{{ database_password }}@{{ database_host }}/{{ database }}
+
+{% include "section-keystone-authtoken" %}
+
+{% include "section-oslo-messaging-rabbit" %}
+
+{% include "section-oslo-cache" %}
+'''
+
+API_PASTE_INI = '''[composite:osapi_compute]
+use = call:nova.api.openstack.urlmap:urlmap_factory
+/v2.1 = openstack_compute_api_v21
+{% if auth_host -%}
+[filter:authtoken]
+paste.filter_factory = keystonemiddleware.auth_token:filter_factory
+www_authenticate_uri = {{ service_protocol }}://{{ service_host }}:{{ service_port }}
+{% endif -%}
+'''
+
+
+def os_config_renderer(templates_dir, target_dir, files=6, **kwargs):
+    """An OSConfigRenderer shaped like nova-cloud-controller's."""
+    with open(os.path.join(templates_dir, 'nova.conf'), 'w') as f:
+        f.write(NOVA_CONF)
+    with open(os.path.join(templates_dir, 'api-paste.ini'), 'w') as f:
+        f.write(API_PASTE_INI)
+    shared = [
+        context.SharedDBContext(database='nova', user='nova',
+                                relation_prefix='nova'),
+        context.AMQPContext(),
+        context.IdentityServiceContext(),
+        context.SyslogContext(),
+        context.LogLevelContext(),
+        context.WorkerConfigContext(),
+        context.OSConfigFlagContext(),
+        context.MemcacheContext(),
+        context.InternalEndpointContext(),
+        context.VolumeAPIContext('nova-common'),
+    ]
+    configs = templating.OSConfigRenderer(templates_dir=templates_dir,
+                                          openstack_release='yoga', **kwargs)
+    for i in range(files):
+        template = 'api-paste.ini' if i % 2 else 'nova.conf'
+        configs.register(
+            os.path.join(target_dir, str(i), template),
+            shared if template == 'nova.conf' else shared[2:3])
+    return configs
+
+
+def scenarios(env):
+    """Yield (name, function) pairs, the functions running the scenarios."""
+    templates_dir = os.path.join(env.tmpdir, 'templates')
+    target_dir = os.path.join(env.tmpdir, 'etc')
+    os.mkdir(templates_dir)
+    for i in range(6):
+        os.makedirs(os.path.join(target_dir, str(i)))
+
+    def write_all(parallel=None, **kwargs):
+        def run():
+            os_config_renderer(templates_dir, target_dir,
+                               **kwargs).write_all(parallel=parallel)
+        return run
+
+    yield 'OSConfigRenderer.write_all', write_all()
+    yield 'OSConfigRenderer.write_all incremental', write_all(
+        incremental=True)
+    yield 'OSConfigRenderer.write_all parallel=4', write_all(
+        incremental=True, parallel=4)
+    # the first run records the inputs, later ones should skip rendering.
+    yield 'OSConfigRenderer.write_all tracked', write_all(
+        track_dependencies=True)
+
+    restart_dir = os.path.join(env.tmpdir, 'restart')
+    os.mkdir(restart_dir)
+    restart_map = OrderedDict()
+    for i in range(50):
+        path = os.path.join(restart_dir, 'file{}.conf'.format(i))
+        with open(path, 'w') as f:
+            f.write('option = {}\n'.format(i) * 200)
+        restart_map[path] = ['service{}'.format(i % 5)]
+
+    def restart_on_change():
+        restarted = []
+
+        @host.restart_on_change(
+            restart_map,
+            restart_functions={'service{}'.format(i): restarted.append
+                               for i in range(5)})
+        def hook():
+            pass
+        hook()
+    yield 'restart_on_change (50 files)', restart_on_change
+
+    packages = sorted(env.fixture['packages']) + sorted(
+        env.fixture['candidates'])
+    packages = (packages * 4)[:60]
+    yield 'filter_installed_packages (60)', lambda: filter_installed_packages(
+        packages)
+
+    def ovs_bridges():
+        for i in range(20):
+            bridge = 'br-data{}'.format(i)
+            ovs.add_bridge(bridge, brdata={'external-ids': {'charm': 'x'}})
+            ovs.add_bridge_port(bridge, 'eth{}'.format(i), linkup=False,
+                                promisc=None)
+    yield 'ovs add_bridge/add_bridge_port (20)', ovs_bridges
+
+    def ovs_bridges_transaction():
+        with ovs.OVSTransaction():
+            ovs_bridges()
+    yield 'ovs add_bridge/add_bridge_port (20) OVSTransaction', \
+        ovs_bridges_transaction
+
+    rq = ceph.CephBrokerRq()
+    for i in range(20):
+        rq.add_op_create_replicated_pool(name='pool{}'.format(i),
+                                         replica_count=3, weight=5)
+    rsp_key = ceph.get_broker_rsp_key()
+    rsp = json.dumps({'exit-code': 0, 'request-id': rq.request_id})
+    relation = env.fixture['relations']['ceph']['ceph:13']
+    relation[os.environ['JUJU_UNIT_NAME']] = {'broker_req': rq.request}
+    for unit in relation:
+        if unit.startswith('ceph-mon/'):
+            relation[unit][rsp_key] = rsp
+    env.write_fixture()
+
+    def ceph_broker():
+        ceph.is_request_complete(rq)
+        ceph.send_request_if_needed(rq)
+    yield 'CephBrokerRq complete check (20 pools)', ceph_broker
+
+
+def measure(env, func, repeat):
+    """
+    Run func repeat times, each time as a fresh hook.
+
+    :returns: dict with the best wall time, and the subprocess count and
+        total subprocess time of that run.
+    """
+    best = None
+    for _ in range(repeat):
+        reset_caches()
+        profiler = profiling.enable(report_atexit=False)
+        try:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        finally:
+            profiling.disable()
+        spawned = [e for e in profiler.events if e.category == 'subprocess']
+        result = {
+            'seconds': elapsed,
+            'subprocesses': len(spawned),
+            'subprocess_seconds': sum(e.duration for e in spawned),
+        }
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def print_results(results, baseline=None):
+    width = max(len(name) for name in results)
+    print('{}  {:>10}  {:>6}  {:>10}'.format(
+        'scenario'.ljust(width), 'wall ms', 'procs', 'procs ms'))
+    for name, result in results.items():
+        line = '{}  {:10.2f}  {:6d}  {:10.2f}'.format(
+            name.ljust(width), result['seconds'] * 1000,
+            result['subprocesses'], result['subprocess_seconds'] * 1000)
+        if baseline and name in baseline:
+            before = baseline[name]
+            line += '  ({:+.1f}%, {:+d} procs)'.format(
+                (result['seconds'] / before['seconds'] - 1) * 100,
+                result['subprocesses'] - before['subprocesses'])
+        print(line)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', default='openstack',
+                        help='fixture in tools/benchmarks/fixtures to replay')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scenario', action='append',
+                        help='only run scenarios whose name contains this')
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--baseline',
+                        help='JSON results of an earlier run to compare to')
+    options = parser.parse_args(args)
+
+    results = OrderedDict()
+    with ReplayEnvironment(load_fixture(options.fixture)) as env:
+        for name, func in scenarios(env):
+            if options.scenario and not any(s in name
+                                            for s in options.scenario):
+                continue
+            results[name] = measure(env, func, options.repeat)
+
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
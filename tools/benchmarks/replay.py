@@ -0,0 +1,149 @@
+# Copyright 2026 Canonical Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Replay a recorded hook environment with fake hook tools.
+
+A fixture is a JSON document describing what the hook tools and system
+commands answer::
+
+    {
+        "env": {"JUJU_UNIT_NAME": "nova-cloud-controller/0"},
+        "config": {"debug": false},
+        "leader": true,
+        "leader-settings": {},
+        "unit": {"private-address": "10.5.0.10"},
+        "network": {"default": {"ingress-addresses": ["10.5.0.10"]}},
+        "relations": {
+            "shared-db": {
+                "shared-db:3": {"mysql/0": {"db_host": "10.5.0.20"}}
+            }
+        },
+        "packages": {"nova-common": "2:25.0.0-0ubuntu1"},
+        "candidates": {"nova-api": "2:25.0.0-0ubuntu1"},
+        "ovs": {"bridges": {"br-ex": ["eth1"]}},
+        "ceph": {"osd pool ls": "glance\\nnova\\n"}
+    }
+
+See :mod:`tools.benchmarks.fake_tools` for the commands understood.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from charmhelpers.core import hookenv, unitdata
+from charmhelpers.fetch import ubuntu_apt_pkg
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+_TOOL_SCRIPT = '''#!{python} -S
+import sys
+sys.path.insert(0, {repo!r})
+from tools.benchmarks.fake_tools import main
+main({tool!r})
+'''
+
+
+def load_fixture(name):
+    """Load a fixture shipped in tools/benchmarks/fixtures."""
+    with open(os.path.join(FIXTURES_DIR, name + '.json')) as f:
+        return json.load(f)
+
+
+def reset_caches():
+    """
+    Commit the unit state and drop the per-hook state of charmhelpers, as
+    if a new hook started.
+    """
+    hookenv.cache.clear()
+    hookenv._cache_index.clear()
+    hookenv._cache_key_tokens.clear()
+    hookenv._cache_config = None
+    hookenv.clear_relation_snapshot()
+    ubuntu_apt_pkg.invalidate_package_index()
+    if unitdata._KV is not None:
+        unitdata._KV.flush()
+        unitdata._KV.close()
+    unitdata._KV = None
+
+
+class ReplayEnvironment(object):
+    """
+    Context manager putting fake hook tools answering from fixture first
+    in $PATH, with a scratch $CHARM_DIR and unit state database.
+
+    :param fixture: fixture data, see the module documentation
+    :type fixture: dict
+    """
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.tmpdir = None
+        self._environ = None
+
+    def __enter__(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='charmhelpers-replay-')
+        bin_dir = os.path.join(self.tmpdir, 'bin')
+        self.charm_dir = os.path.join(self.tmpdir, 'charm')
+        os.mkdir(bin_dir)
+        os.mkdir(self.charm_dir)
+        from tools.benchmarks import fake_tools
+        for tool in fake_tools.TOOLS:
+            path = os.path.join(bin_dir, tool)
+            with open(path, 'w') as f:
+                f.write(_TOOL_SCRIPT.format(python=sys.executable,
+                                            repo=REPO_DIR, tool=tool))
+            os.chmod(path, 0o755)
+        self.fixture_path = os.path.join(self.tmpdir, 'fixture.json')
+        self.calls_path = os.path.join(self.tmpdir, 'calls.jsonl')
+        self.write_fixture()
+
+        self._environ = dict(os.environ)
+        os.environ.update({
+            'PATH': bin_dir + os.pathsep + os.environ.get('PATH', ''),
+            'CHARM_DIR': self.charm_dir,
+            'UNIT_STATE_DB': os.path.join(self.tmpdir, 'unit-state.db'),
+            'FAKE_JUJU_FIXTURE': self.fixture_path,
+            'FAKE_JUJU_CALLS': self.calls_path,
+        })
+        os.environ.update(self.fixture.get('env', {}))
+        reset_caches()
+        return self
+
+    def __exit__(self, *exc_info):
+        reset_caches()
+        os.environ.clear()
+        os.environ.update(self._environ)
+        shutil.rmtree(self.tmpdir)
+
+    def write_fixture(self):
+        """Make the fake tools use the current content of self.fixture."""
+        with open(self.fixture_path, 'w') as f:
+            json.dump(self.fixture, f)
+
+    def calls(self):
+        """:returns: list of the fake tool invocations, oldest first."""
+        try:
+            with open(self.calls_path) as f:
+                return [json.loads(line) for line in f]
+        except IOError:
+            return []
+
+    def clear_calls(self):
+        if os.path.exists(self.calls_path):
+            os.unlink(self.calls_path)